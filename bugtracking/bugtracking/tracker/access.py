@@ -0,0 +1,234 @@
+# stdlib imports
+import threading
+import time
+from contextlib import contextmanager
+
+# core django imports
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# third party imports
+
+# my internal imports
+from bugtracking.utils import metrics
+from .changes import bump_team_change_version
+
+
+# Bumped by the signals in `signals.py`. Every AccessContext remembers the generation it was built at
+# and is rebuilt the next time it's asked for if anything has changed since.
+_generation = 0
+
+
+def invalidate_access():
+    """Marks every AccessContext in this process as stale."""
+    global _generation
+    _generation += 1
+
+
+# SHARED ROLE CACHE
+# A user's roles within a team are kept in CACHES["default"] (Redis in production) so that every worker can answer
+# permission checks without going to Postgres. Each entry is stamped with its team's access version, which the
+# signals bump whenever a membership, a project or a project's manager changes; entries stamped with an older
+# version are ignored and rebuilt. With django-redis' IGNORE_EXCEPTIONS on, an unreachable Redis just looks like
+# a cache miss: reads return nothing, writes are dropped, and the roles come straight from the database.
+
+def _version_key(team_id):
+    return f'tracker:access:team:{team_id}:version'
+
+
+def _roles_key(team_id, user_id):
+    return f'tracker:access:team:{team_id}:user:{user_id}:capabilities'
+
+
+def _team_slug_key(team_slug):
+    return f'tracker:access:team-slug:{team_slug}'
+
+
+def _new_version():
+    # seeded from the clock rather than 0, so a version key that was evicted can't come back with
+    # a number that matches entries cached before it went
+    return time.time_ns()
+
+
+def _bump_version(team_id):
+    key = _version_key(team_id)
+    try:
+        cache.incr(key)
+    except ValueError:  # no version yet (or it was evicted)
+        cache.set(key, _new_version(), None)
+
+
+def bump_team_access_version(team_id):
+    """
+    Invalidates every cached role map for the team, in this process and on every other worker.
+    The version is bumped straight away and again once the transaction commits, so a worker that re-reads the
+    old rows in between can't leave them cached under the current version.
+    """
+    invalidate_access()
+    if team_id is None:
+        return
+    _bump_version(team_id)
+    transaction.on_commit(lambda: _bump_version(team_id))
+
+
+_batching = threading.local()
+
+
+@contextmanager
+def batched_access_changes(team_id):
+    """
+    For set-based membership changes: the per-row signals inside the block skip their version bumps, and the team's
+    access and change versions are bumped once on the way out instead. Without it, deleting N memberships costs N
+    signal lookups.
+    """
+    _batching.depth = getattr(_batching, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _batching.depth -= 1
+        bump_team_access_version(team_id)
+        bump_team_change_version(team_id)
+
+
+def access_changes_batched():
+    return getattr(_batching, 'depth', 0) > 0
+
+
+def forget_team_slug(team_slug):
+    cache.delete(_team_slug_key(team_slug))
+
+
+def _load_team_roles(team_ids, user_id):
+    """
+    One user's roles within each of `team_ids`, by team id: a single cache round trip on a hit, two queries for all
+    the misses together. Project access is read from the maintained ProjectAccess table rather than worked out from
+    the memberships.
+    """
+    from .models import TeamMembership, ProjectAccess
+    keys = {team_id: (_version_key(team_id), _roles_key(team_id, user_id)) for team_id in team_ids}
+    cached = cache.get_many([key for pair in keys.values() for key in pair])
+    loaded, missing = {}, []
+    for team_id, (version_key, roles_key) in keys.items():
+        version, roles = cached.get(version_key), cached.get(roles_key)
+        if version is not None and roles is not None and roles['version'] == version:
+            metrics.count_cache_lookup('team_roles', True)
+            loaded[team_id] = roles
+        else:
+            metrics.count_cache_lookup('team_roles', False)
+            missing.append(team_id)
+    if not missing:
+        return loaded
+    versions = {}
+    for team_id in missing:
+        version_key = keys[team_id][0]
+        version = cached.get(version_key)
+        if version is None:
+            # taken before the rows are read, so a change committed while they're read bumps it past the stamp;
+            # add() rather than set() so two workers starting the same team agree on one version
+            cache.add(version_key, _new_version(), None)
+            version = cache.get(version_key)
+        versions[team_id] = version
+        loaded[team_id] = {'team_role': None, 'capabilities': {}, 'project_slugs': {}}
+    team_roles = TeamMembership.objects.filter(team_id__in=missing, user_id=user_id).values_list('team_id', 'role')
+    for team_id, role in team_roles:
+        loaded[team_id]['team_role'] = role
+    project_rows = ProjectAccess.objects.filter(user_id=user_id, team_id__in=missing).values_list(
+        'project_id', 'project__slug', 'capabilities', 'team_id'
+    )
+    for project_id, slug, capabilities, team_id in project_rows:
+        loaded[team_id]['capabilities'][project_id] = capabilities
+        if capabilities & ProjectAccess.VIEW:
+            loaded[team_id]['project_slugs'][slug] = project_id
+    for team_id in missing:
+        if versions[team_id] is not None:  # None here means the cache is unreachable; don't bother writing
+            loaded[team_id]['version'] = versions[team_id]
+            cache.set(keys[team_id][1], loaded[team_id], settings.TRACKER_ACCESS_CACHE_TIMEOUT)
+    return loaded
+
+
+class AccessContext:
+    """
+    Everything the permission checks need to know about one user's roles, loaded a team at a time from the shared
+    role cache (or the database on a miss) and kept for the rest of the request.
+    Team admins, project access and so on are then answered from these dicts instead of re-querying
+    `Team.get_admins()` or `Project.members.all()` for every check.
+    Don't build this directly; use `get_access(user)`.
+    """
+    def __init__(self, user):
+        self.user_id = user.pk if user is not None and user.is_authenticated else None
+        self.generation = _generation
+        self._teams = {}
+        self._team_slugs = {}
+
+    def team_roles(self, team_id):
+        """
+        The user's roles within a team: `team_role` (None if not a member), `capabilities` ({project_id: the
+        ProjectAccess bitmask}) and `project_slugs` (of the projects the user can see).
+        """
+        if team_id not in self._teams:
+            if self.user_id is None or team_id is None:
+                self._teams[team_id] = {'team_role': None, 'capabilities': {}, 'project_slugs': {}}
+            else:
+                self._teams.update(_load_team_roles([team_id], self.user_id))
+        return self._teams[team_id]
+
+    def load_teams(self, team_ids):
+        """Loads the user's roles within every one of `team_ids` not loaded yet at once, e.g. for a list of teams."""
+        missing = [team_id for team_id in set(team_ids) if team_id not in self._teams]
+        if self.user_id is not None and missing:
+            self._teams.update(_load_team_roles(missing, self.user_id))
+
+    def is_user(self, user_id):
+        """True if `user_id` (e.g. a ticket's developer_id or a project's manager_id) is this user."""
+        return self.user_id is not None and self.user_id == user_id
+
+    def team_id_for_slug(self, team_slug):
+        """
+        The id of the team with that slug, or None if there isn't one. Team slugs never change, so they're cached too.
+        """
+        from .models import Team
+        if team_slug not in self._team_slugs:
+            team_id = cache.get(_team_slug_key(team_slug))
+            if team_id is None:
+                team_id = Team.objects.filter(slug=team_slug).values_list('pk', flat=True).first()
+                if team_id is not None:
+                    cache.set(_team_slug_key(team_slug), team_id, None)
+            self._team_slugs[team_slug] = team_id
+        return self._team_slugs[team_slug]
+
+    def project_id_for_slug(self, team_id, project_slug):
+        """The id of a project within a team, or None if there isn't one the user can see."""
+        return self.team_roles(team_id)['project_slugs'].get(project_slug)
+
+    def is_team_member(self, team_id):
+        return self.team_roles(team_id)['team_role'] is not None
+
+    def is_team_admin(self, team_id):
+        from .models import TeamMembership
+        return self.team_roles(team_id)['team_role'] == TeamMembership.Roles.ADMIN
+
+    def capabilities(self, project):
+        """The user's ProjectAccess bitmask for a project; 0 if they have no access to it."""
+        return self.team_roles(project.team_id)['capabilities'].get(project.pk, 0)
+
+    def can(self, project, capability):
+        return self.capabilities(project) & capability == capability
+
+    def is_project_member(self, project):
+        from .models import ProjectAccess
+        return self.can(project, ProjectAccess.MEMBER)
+
+
+def get_access(user):
+    """
+    Returns the AccessContext for `user`. The context is cached on the user instance, and since DRF keeps the same
+    user object on the request for its whole lifetime, every permission class, serializer and model check made
+    during one request shares one context. It is rebuilt if any membership has changed since it was built.
+    """
+    access = getattr(user, '_tracker_access', None)
+    if access is None or access.generation != _generation:
+        access = AccessContext(user)
+        if user is not None:
+            user._tracker_access = access
+    return access
@@ -4,5 +4,5 @@ from . import models
 # Register your models here.
 admin.site.register(
     [models.Team, models.TeamMembership, models.Project, models.ProjectMembership, models.Ticket, models.Comment,
-     models.TeamInvitation]
+     models.TeamInvitation, models.OutgoingEmail]
 )
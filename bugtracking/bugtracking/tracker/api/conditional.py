@@ -0,0 +1,134 @@
+# stdlib imports
+import hashlib
+
+# core django imports
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+# third party imports
+from rest_framework.response import Response
+
+# my internal imports
+from bugtracking.utils import metrics
+from ..access import get_access
+from ..changes import team_change_version, team_change_versions
+from .utils import get_sparse_fieldset
+
+
+class ConditionalRetrieveMixin:
+    """
+    Adds a strong ETag and Last-Modified to a viewset's retrieve responses, and answers a matching If-None-Match or
+    If-Modified-Since with 304 Not Modified before the serializer runs. The object is still fetched and the object
+    permissions still checked; only serialization is skipped.
+
+    Viewsets list what their representation depends on in `get_etag_parts(instance)` and give its last change in
+    `get_last_modified(instance)`, including the usernames it embeds, so a renamed user shows up without tying
+    the ETag to every other change in the team. Every ETag also covers the requesting user, the team's access version
+    (so role and membership changes show up in `user_permissions` and `memberships`) and the sparse fieldset asked for.
+    """
+    def get_etag_parts(self, instance):
+        raise NotImplementedError
+
+    def get_last_modified(self, instance):
+        return instance.modified
+
+    def get_team_id(self, instance):
+        raise NotImplementedError
+
+    def get_etag(self, instance):
+        access_version = get_access(self.request.user).team_roles(self.get_team_id(instance)).get('version')
+        if access_version is None:  # shared cache unreachable: there is nothing reliable to validate against
+            return None
+        fields, omit = get_sparse_fieldset(self.request)
+        parts = [
+            self.basename, instance.pk, self.request.user.pk, access_version, self.request.get_host(),
+            sorted(fields) if fields is not None else None, sorted(omit), *self.get_etag_parts(instance),
+        ]
+        return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = self.get_etag(instance)
+        last_modified = self.get_last_modified(instance)
+        timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+        conditional = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if conditional is not None:  # 304, or 412 for a failed If-Match / If-Unmodified-Since
+            response = Response(status=conditional.status_code)
+        else:
+            response = Response(self.get_serializer(instance).data)
+        if etag is not None:
+            response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return private_revalidated(response)
+
+
+def private_revalidated(response):
+    # responses differ per user, so only the client's own cache may keep them, and it must revalidate each time
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization', 'Cookie'])
+    return response
+
+
+class TeamVersionedMixin:
+    """
+    Ties a team-scoped viewset to its team's change version (see `changes.py`):
+
+    - every response carries the version in an X-Team-Version header;
+    - list responses get an ETag built from the version(s), the user and the full URL, so a client that sends it back
+      in If-None-Match gets a 304 until something in the team changes;
+    - list responses are kept in the shared cache under that same ETag for TRACKER_LIST_CACHE_TIMEOUT seconds, so
+      other requests for the same list by the same user are answered without running the queryset or serializer.
+
+    Permissions are checked before any of this, as usual. Without a reachable cache, lists are served as normal.
+    """
+    team_slug_kwarg = 'team_slug'
+
+    def get_version_team_id(self):
+        """The team whose version goes in the header, or None."""
+        team_slug = self.kwargs.get(self.team_slug_kwarg)
+        if team_slug is None:
+            return None
+        return get_access(self.request.user).team_id_for_slug(team_slug)
+
+    def get_list_team_ids(self):
+        """The teams whose changes can show up in this list."""
+        team_id = self.get_version_team_id()
+        return [] if team_id is None else [team_id]
+
+    def list(self, request, *args, **kwargs):
+        versions = team_change_versions(self.get_list_team_ids())
+        if not versions or None in versions.values():
+            return super().list(request, *args, **kwargs)
+        digest = hashlib.sha1(repr([
+            self.basename, request.user.pk, request.get_host(), request.get_full_path(), sorted(versions.items()),
+        ]).encode()).hexdigest()
+        etag = quote_etag(digest)
+        conditional = get_conditional_response(request, etag=etag)
+        if conditional is not None:
+            response = Response(status=conditional.status_code)
+        else:
+            key = f'tracker:list:{digest}'
+            data = cache.get(key)
+            metrics.count_cache_lookup('list', data is not None)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = super().list(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response.data, settings.TRACKER_LIST_CACHE_TIMEOUT)
+        response['ETag'] = etag
+        return private_revalidated(response)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code >= 400:  # nothing to tell someone who may not even belong to the team
+            return response
+        team_id = self.get_version_team_id()
+        if team_id is not None:
+            version = team_change_version(team_id)
+            if version is not None:
+                response['X-Team-Version'] = str(version)
+        return response
@@ -0,0 +1,82 @@
+# stdlib imports
+
+# core django imports
+from django.contrib.auth import get_user_model
+
+# third party imports
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from rest_framework.serializers import ValidationError as SerializerValidationError
+
+# my internal imports
+from ..models import Ticket
+
+User = get_user_model()
+
+
+class TicketFilter(BaseFilterBackend):
+    """
+    Narrows a project's tickets by query parameters, all optional and combined with AND:
+    ?is_open=true|false, ?priority=3 (or several, ?priority=2,3), ?developer=<username> and ?user=<username> (the
+    ticket's creator). `developer=` with no username means unassigned tickets.
+    Usernames are resolved to ids up front so the ticket query filters on the indexed foreign key columns alone.
+    """
+    boolean_values = {'true': True, '1': True, 'false': False, '0': False}
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        if 'is_open' in params:
+            is_open = self.boolean_values.get(params['is_open'].lower())
+            if is_open is None:
+                raise SerializerValidationError({'errors': 'is_open must be true or false.'})
+            queryset = queryset.filter(is_open=is_open)
+        if 'priority' in params:
+            priorities = self.parse_priorities(params['priority'])
+            if len(priorities) > 1:
+                queryset = queryset.filter(priority__in=priorities)
+            else:
+                queryset = queryset.filter(priority=priorities[0])
+        for param in ('developer', 'user'):
+            if param in params:
+                username = params[param].strip()
+                if not username:
+                    queryset = queryset.filter(**{f'{param}__isnull': True})
+                    continue
+                user_id = User.objects.filter(username=username).values_list('pk', flat=True).first()
+                if user_id is None:
+                    return queryset.none()
+                queryset = queryset.filter(**{f'{param}_id': user_id})
+        return queryset
+
+    def parse_priorities(self, value):
+        valid = {str(priority) for priority in Ticket.Priorities.values}
+        priorities = [priority.strip() for priority in value.split(',') if priority.strip()]
+        if not priorities or not valid.issuperset(priorities):
+            raise SerializerValidationError(
+                {'errors': f'priority must be one or more of {", ".join(sorted(valid))}, separated by commas.'}
+            )
+        return [int(priority) for priority in dict.fromkeys(priorities)]
+
+
+class TicketOrderingFilter(OrderingFilter):
+    """
+    ?ordering=priority, -priority, modified, -modified, created or -created (the default is newest first).
+    Creation time and id are always appended as tie-breakers, so tickets sharing a priority come out in a stable
+    order, and TicketCursorPagination keeps its position on all three fields so paging never repeats or skips one.
+    """
+    ordering_fields = ['created', 'modified', 'priority']
+    tie_breakers = ('created', 'id')
+
+    def get_default_ordering(self, view):
+        return ['-created']
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+        # one client-chosen field, so the cursor's position always has the same shape
+        ordering = ordering[:1]
+        direction = '-' if ordering[0].startswith('-') else ''
+        for name in self.tie_breakers:
+            if name != ordering[0].lstrip('-'):
+                # tie-breakers follow the direction of the requested field, so the (project, ..., created) indexes
+                # can be read in one direction
+                ordering.append(f'{direction}{name}')
+        return ordering
@@ -0,0 +1,133 @@
+# stdlib imports
+import json
+
+# core django imports
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+
+# third party imports
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+# my internal imports
+
+
+class TicketCursorPagination(CursorPagination):
+    """
+    Opaque cursor (keyset) pagination for a project's tickets, newest first unless TicketOrderingFilter says otherwise.
+    The cursor keeps its position on every ordering field, the client-chosen one plus the `created` and `id`
+    tie-breakers, so the position is unique. A page is fetched with a keyset comparison against it, e.g.
+    `(created, id) < (<created>, <id>)` against the (project, created, id) index on Ticket. Every page is then a range
+    scan no matter how deep the client has paged. Tickets that tie on priority never need DRF's offset, which
+    offset_cutoff would stop.
+    A cursor issued under one ?ordering= is rejected (404) under another, because it marks a place in another sequence.
+    Page size defaults to settings.TICKETS_PAGE_SIZE and can be lowered or raised (up to settings.TICKETS_MAX_PAGE_SIZE)
+    with ?page_size=.
+    """
+    ordering = ('-created', '-id')
+    page_size = settings.TICKETS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.TICKETS_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # CursorPagination.paginate_queryset, except that the position filter covers the whole ordering rather than
+        # its first field
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        if reverse:
+            queryset = queryset.order_by(*[
+                order[1:] if order.startswith('-') else f'-{order}' for order in self.ordering
+            ])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self.keyset_filter(self.position_values(current_position), reverse))
+            except (ValueError, DjangoValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following_position = len(results) > len(self.page)
+        following_position = None
+        if has_following_position:
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def keyset_filter(self, values, reverse):
+        """
+        Tickets after `values` in self.ordering (before them when paging backwards), spelled out as
+        `a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)`. The bound on the first field is repeated outside
+        the OR so the database can still start a range scan on the index.
+        """
+        keyset, equal = Q(), Q()
+        for order, value in zip(self.ordering, values):
+            name = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            keyset |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first = self.ordering[0]
+        bound = 'lte' if first.startswith('-') != reverse else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & keyset
+
+    def position_values(self, position):
+        """The values of an encoded position, if it was taken under the current ordering."""
+        try:
+            orders, values = zip(*json.loads(position))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if list(orders) != list(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is not None:
+            self.position_values(cursor.position)
+        return cursor
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = [instance[order.lstrip('-')] if isinstance(instance, dict) else getattr(instance, order.lstrip('-'))
+                  for order in ordering]
+        return json.dumps([[order, str(value)] for order, value in zip(ordering, values)], separators=(',', ':'))
+
+
+class CommentCursorPagination(CursorPagination):
+    """Cursor pagination for a ticket's comments, newest first (Comment's default ordering)."""
+    ordering = '-created'
+    page_size = settings.COMMENTS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.TICKETS_MAX_PAGE_SIZE
+
+
+class TicketSearchPagination(PageNumberPagination):
+    """
+    Numbered pages for ticket search results. Results are ordered by rank rather than by a column, so they can't be
+    cursor paginated like the tickets list.
+    """
+    page_size = settings.TICKET_SEARCH_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.TICKETS_MAX_PAGE_SIZE
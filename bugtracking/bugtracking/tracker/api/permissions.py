@@ -6,7 +6,8 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 # my internal imports
-from ..models import Team, Project, Ticket
+from ..access import get_access
+from .routes import resolve_route
 
 class TeamPermissions(BasePermission):
     """
@@ -17,15 +18,16 @@ class TeamPermissions(BasePermission):
     message = {'errors': 'Permission denied.'} # this is just a fallback; message will be customized in permission checks
 
     def has_object_permission(self, request, view, obj):
+        access = get_access(request.user)
         if request.method in SAFE_METHODS:
-            return request.user in obj.members.all()
+            return access.is_team_member(obj.pk)
         elif request.method == 'DELETE':
             self.message['errors'] = 'Teams cannot be deleted.'
             return False
         if 'title' in request.data:
             self.message['errors'] = 'Team titles cannot be changed after creation.'
             return False
-        return request.user in obj.get_admins()
+        return access.is_team_admin(obj.pk)
 
 class LeavingTeamPermissions(BasePermission):
     """
@@ -34,10 +36,11 @@ class LeavingTeamPermissions(BasePermission):
     message = {'errors': 'Something went wrong. Please try again.'}
 
     def has_object_permission(self, request, view, obj):
-        if request.user in obj.get_admins():
+        access = get_access(request.user)
+        if access.is_team_admin(obj.pk):
             self.message['errors'] = 'Administrators cannot leave teams.'
             return False
-        if request.user in obj.members.all():
+        if access.is_team_member(obj.pk):
             return True
         return False
 
@@ -49,7 +52,7 @@ class TeamInvitePermissionsForAction(BasePermission):
     message = {'errors': 'Permission denied.'}
 
     def has_object_permission(self, request, view, obj):
-        if request.user in obj.get_admins():
+        if get_access(request.user).is_team_admin(obj.pk):
             return True
         self.message['errors'] = 'Only team administrators may invite new members.'
         return False
@@ -60,14 +63,14 @@ class TeamAdminsOnly(BasePermission):
     message = {'errors': 'Only team administrators may perform that action.'}
 
     def has_permission(self, request, view):
-        team_slug = view.kwargs['slug']
-        team = Team.objects.get(slug=team_slug)
-        if request.user in team.get_admins():
+        access = get_access(request.user)
+        team_id = access.team_id_for_slug(view.kwargs['slug'])
+        if access.is_team_admin(team_id):
             return True
         return False
 
     def has_object_permission(self, request, view, obj):
-        if request.user in obj.get_admins():
+        if get_access(request.user).is_team_admin(obj.pk):
             return True
         return False
 
@@ -79,14 +82,15 @@ class TeamInvitePermissions(BasePermission):
     message = {'errors': 'Permission denied.'}
 
     def has_permission(self, request, view):
-        team = Team.objects.get(slug=view.kwargs['team_slug'])
-        if request.user in team.get_admins():
+        access = get_access(request.user)
+        team_id = access.team_id_for_slug(view.kwargs['team_slug'])
+        if access.is_team_admin(team_id):
             return True
         self.message['errors'] = "Only a team administrator may view or manage team invitations."
         return False
 
     def has_object_permission(self, request, view, obj):
-        if request.user in obj.team.get_admins():
+        if get_access(request.user).is_team_admin(obj.team_id):
             return True
         self.message['errors'] = "Only a team administrator may view or manage team invitations."
         return False
@@ -116,20 +120,21 @@ class ProjectPermissions(BasePermission):
     message = {'errors': 'Permission denied.'} # this is just a fallback; message will be customized in permission checks
 
     def has_permission(self, request, view):
-        team = Team.objects.get(slug=view.kwargs['team_slug'])
+        access = get_access(request.user)
+        team_id = access.team_id_for_slug(view.kwargs['team_slug'])
         if request.method == 'POST':
-            if request.user in team.get_admins():
+            if access.is_team_admin(team_id):
                 return True
             else:
                 self.message['errors'] = "Only a team admin may post a new project."
                 return False
-        return request.user in team.members.all()
+        return access.is_team_member(team_id)
 
     def has_object_permission(self, request, view, obj):
         if request.method in SAFE_METHODS:
             return obj.can_user_view(request.user)
         elif request.method == 'CREATE':
-            return request.user in obj.team.get_admins()
+            return get_access(request.user).is_team_admin(obj.team_id)
         if 'manager' in request.data and not obj.can_user_update_manager(request.user):
             self.message['errors'] = "Only a team admin may change the manager of a project."
             return False
@@ -154,15 +159,19 @@ class TicketPermissions(BasePermission):
     message = {'errors': 'Permission denied.'}
 
     def has_permission(self, request, view):
-        team = Team.objects.get(slug=view.kwargs['team_slug'])
-        project = Project.objects.get(slug=view.kwargs['project_slug'])
+        access = get_access(request.user)
+        team_id = access.team_id_for_slug(view.kwargs['team_slug'])
+        project_id = access.project_id_for_slug(team_id, view.kwargs['project_slug'])
+        # project members and team admins may both view and submit tickets; the slugs are of the projects the user can
+        # see, and a team admin is let through to a missing project so it 404s rather than 403s
+        can_access_project = project_id is not None or access.is_team_admin(team_id)
         if request.method == 'POST':
-            if project.can_user_create_tickets(request.user):
+            if can_access_project:
                 return True
             else:
                 self.message['errors'] = "Only project members may submit tickets to a project."
                 return False
-        return request.user in project.members.all() or request.user in team.get_admins()
+        return can_access_project
 
     def has_object_permission(self, request, view, obj):
         if request.method in SAFE_METHODS:
@@ -186,7 +195,9 @@ class CommentPermissions(BasePermission):
     message = {'errors': 'Permission denied.'}
 
     def has_permission(self, request, view):
-        ticket = Ticket.objects.get(slug=view.kwargs['slug'])
+        # `ticket_slug` on the nested comments route, `slug` on the tickets route's create_comment action
+        ticket_slug = view.kwargs.get('ticket_slug', view.kwargs.get('slug'))
+        ticket = resolve_route(request, view.kwargs['team_slug'], view.kwargs['project_slug'], ticket_slug).ticket
         return ticket.can_user_view(request.user)
 
     def has_object_permission(self, request, view, obj):
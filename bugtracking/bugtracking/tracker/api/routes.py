@@ -0,0 +1,52 @@
+# stdlib imports
+from collections import namedtuple
+
+# core django imports
+from django.http import Http404
+
+# third party imports
+
+# my internal imports
+from ..models import Team, Project, Ticket
+
+
+Route = namedtuple('Route', ['team', 'project', 'ticket'])
+
+
+def resolve_route(request, team_slug, project_slug=None, ticket_slug=None):
+    """
+    Loads the team, project and ticket named by a nested URL (/teams/<team>/projects/<project>/tickets/<ticket>/...)
+    in one joined query, each scoped by its parent, and returns them as a Route (unused levels are None).
+    Raises Http404 if any of them doesn't exist.
+
+    The result is cached on the request, along with every shallower route it contains, so the permission classes,
+    get_queryset, get_serializer_context and perform_create of one request all share the same instances.
+    Resolve the deepest route the request needs first; a shallower route resolved earlier doesn't help a deeper one.
+    """
+    routes = getattr(request, '_tracker_routes', None)
+    if routes is None:
+        routes = request._tracker_routes = {}
+    key = (team_slug, project_slug, ticket_slug)
+    if key in routes:
+        return routes[key]
+    if ticket_slug is not None:
+        ticket = Ticket.objects.select_related('project__team').filter(
+            slug=ticket_slug, project__slug=project_slug, project__team__slug=team_slug
+        ).first()
+        if ticket is None:
+            raise Http404('Ticket not found.')
+        route = Route(ticket.project.team, ticket.project, ticket)
+    elif project_slug is not None:
+        project = Project.objects.select_related('team').filter(slug=project_slug, team__slug=team_slug).first()
+        if project is None:
+            raise Http404('Project not found.')
+        route = Route(project.team, project, None)
+    else:
+        team = Team.objects.filter(slug=team_slug).first()
+        if team is None:
+            raise Http404('Team not found.')
+        route = Route(team, None, None)
+    routes[key] = route
+    routes.setdefault((team_slug, project_slug, None), route._replace(ticket=None))
+    routes.setdefault((team_slug, None, None), Route(route.team, None, None))
+    return route
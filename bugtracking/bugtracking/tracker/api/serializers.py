@@ -1,7 +1,9 @@
 # stdlib imports
 
 # core django imports
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Manager, prefetch_related_objects
 from django.urls import reverse, reverse_lazy
 
 # third party imports
@@ -9,12 +11,41 @@ from rest_framework import serializers
 from rest_framework.fields import CurrentUserDefault
 
 # my internal imports
+from ..access import get_access
 from ..models import Team, TeamMembership, Project, ProjectMembership, Ticket, Comment, TeamInvitation
 from bugtracking.users.api.serializers import UserSerializer
+from .utils import is_field_requested
 
 User = get_user_model()
 
 
+class SparseFieldsetsMixin:
+    """
+    Lets GET requests ask for a subset of a serializer's fields with ?fields=title,slug or drop some with ?omit=comments.
+    Unrequested fields are removed before serialization, so the SerializerMethodFields and model properties behind them
+    are never computed. Only applies to the top-level serializer (or the child of a top-level list), not nested ones.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        is_top_level = self.parent is None or (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None)
+        if request is None or not is_top_level:
+            return fields
+        return {name: field for name, field in fields.items() if is_field_requested(request, name)}
+
+
+class MembershipListSerializer(serializers.ListSerializer):
+    """
+    For a team's or project's nested `memberships`: loads them along with their users in one go if the viewset
+    didn't prefetch them, as happens after an update, where DRF drops the instance's prefetched objects before
+    serializing the response.
+    """
+    def to_representation(self, data):
+        if isinstance(data, Manager):
+            prefetch_related_objects([data.instance], f'{self.source}__user')
+        return super().to_representation(data)
+
+
 # TEAMS-RELATED SERIALIZERS
 class TeamMembershipSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField()
@@ -23,9 +54,19 @@ class TeamMembershipSerializer(serializers.ModelSerializer):
         model = TeamMembership
         fields = ['user', 'role', 'role_name']
         read_only_fields = ['user', 'role', ]
+        list_serializer_class = MembershipListSerializer
 
 
-class TeamCreateRetrieveSerializer(serializers.ModelSerializer):
+class TeamListSerializer(serializers.ListSerializer):
+    """Loads the user's roles in every team in the list at once for `user_is_admin`, rather than a team at a time."""
+    def to_representation(self, data):
+        teams = list(data.all() if isinstance(data, Manager) else data)
+        if 'user_is_admin' in self.child.fields:
+            get_access(self.context.get('request').user).load_teams([team.pk for team in teams])
+        return super().to_representation(teams)
+
+
+class TeamCreateRetrieveSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     memberships = TeamMembershipSerializer(read_only=True, many=True)
     # members = UserSerializer(many=True)
     projects_list = serializers.SerializerMethodField()
@@ -35,6 +76,7 @@ class TeamCreateRetrieveSerializer(serializers.ModelSerializer):
         model = Team
         fields = ['title', 'slug', 'description', 'memberships', 'created', 'url', 'projects_list', 'user_is_admin', 'admins']
         read_only_fields = ['slug', 'created', 'memberships', 'url', 'projects_list', 'user_is_admin', 'admins']
+        list_serializer_class = TeamListSerializer
         extra_kwargs = {
             "url": {"view_name": "api:teams-detail", "lookup_field": "slug"},
         }
@@ -93,6 +135,13 @@ class TeamInvitationSerializer(serializers.ModelSerializer):
         return invitation
 
 
+class TeamInvitationBulkSerializer(serializers.Serializer):
+    """Input for the bulk invitation action: just the addresses; each is validated (and reported on) individually."""
+    emails = serializers.ListField(
+        child=serializers.CharField(max_length=254), allow_empty=False, max_length=settings.TEAM_BULK_INVITE_MAX
+    )
+
+
 # PROJECT-RELATED SERIALIZERS
 class ProjectMembershipSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
@@ -101,6 +150,20 @@ class ProjectMembershipSerializer(serializers.ModelSerializer):
         model = ProjectMembership
         fields = ['user', 'role', 'role_name']
         read_only_fields = ['user', 'role']
+        list_serializer_class = MembershipListSerializer
+
+class ProjectListSerializer(serializers.ListSerializer):
+    """
+    Works out `user_permissions` for every project in the list in one pass before serializing the rows, and keeps
+    them in the context under 'project_permissions', by pk.
+    """
+    def to_representation(self, data):
+        projects = list(data.all() if isinstance(data, Manager) else data)
+        if 'user_permissions' in self.child.fields:
+            user = self.context.get('request').user
+            self.context['project_permissions'] = Project.get_user_project_permissions_for(projects, user)
+        return super().to_representation(projects)
+
 
 class ManagerSlugField(serializers.SlugRelatedField):
     def get_queryset(self):
@@ -115,7 +178,7 @@ class ManagerSlugField(serializers.SlugRelatedField):
             return User.objects.all().prefetch_related('project_memberships')
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """The ForAdmins serializer allows editing of the manager field. Other users' serializers do not.
     Serializer class is determined in the viewset."""
     memberships = ProjectMembershipSerializer(read_only=True, many=True)
@@ -130,6 +193,7 @@ class ProjectSerializer(serializers.ModelSerializer):
         model = Project
         fields = ['title', 'slug', 'description', 'team', 'is_archived', 'manager', 'memberships', 'created', 'modified', 'url', 'tickets_list',  'open_tickets', 'user_permissions',]
         read_only_fields = ['slug', 'created', 'modified', 'team', 'memberships', 'url', 'tickets_list',  'open_tickets',]
+        list_serializer_class = ProjectListSerializer
 
     def get_url(self, project):
         request = self.context.get('request', None)
@@ -140,6 +204,9 @@ class ProjectSerializer(serializers.ModelSerializer):
         return path
 
     def get_user_permissions(self, project):
+        batched = self.context.get('project_permissions')
+        if batched is not None and project.pk in batched:
+            return batched[project.pk]
         user = self.context.get('request').user
         return project.get_user_project_permissions(user)
 
@@ -184,17 +251,30 @@ class CommentSerializer(serializers.ModelSerializer):
         return Comment.objects.create_new(**validated_data)
 
 
-class TicketSerializer(serializers.ModelSerializer):
+class TicketListSerializer(serializers.ListSerializer):
+    """Like ProjectListSerializer, for tickets: the batch is kept in the context under 'ticket_permissions'."""
+    def to_representation(self, data):
+        tickets = list(data.all() if isinstance(data, Manager) else data)
+        if 'user_permissions' in self.child.fields:
+            user = self.context.get('request').user
+            self.context['ticket_permissions'] = Ticket.get_user_ticket_permissions_for(tickets, user)
+        return super().to_representation(tickets)
+
+
+class TicketSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
     developer = DeveloperSlugField(slug_field='username', required=False, allow_null=True)
-    comments = CommentSerializer(read_only=True, many=True)
+    comments = serializers.SerializerMethodField()
+    comment_count = serializers.SerializerMethodField()
+    comments_list = serializers.SerializerMethodField()
     user = serializers.StringRelatedField(read_only=True)
     user_permissions = serializers.SerializerMethodField()
 
     class Meta:
         model = Ticket
-        fields = ['title', 'slug', 'description', 'priority', 'user', 'project', 'resolution', 'developer', 'is_open', 'created', 'modified', 'url', 'comments', 'user_permissions']
-        read_only_fields = ['slug', 'user', 'project', 'created', 'modified', 'url',]
+        fields = ['title', 'slug', 'description', 'priority', 'user', 'project', 'resolution', 'developer', 'is_open', 'created', 'modified', 'url', 'comments', 'comment_count', 'comments_list', 'user_permissions']
+        read_only_fields = ['slug', 'user', 'project', 'created', 'modified', 'url', 'comments', 'comment_count', 'comments_list',]
+        list_serializer_class = TicketListSerializer
 
     def get_url(self, ticket): # speculative so far; don't know how the nested routers will work
         request = self.context.get('request', None)
@@ -206,9 +286,70 @@ class TicketSerializer(serializers.ModelSerializer):
             return url
         return path
 
+    def get_comments(self, ticket):
+        """Only the newest few comments; the rest are paged through `comments_list`."""
+        return CommentSerializer(ticket.get_recent_comments(), many=True).data
+
+    def get_comment_count(self, ticket):
+        return ticket.get_comment_count()
+
+    def get_comments_list(self, ticket):
+        path = reverse('api:comments-list', kwargs={
+            'team_slug': ticket.project.team.slug, 'project_slug': ticket.project.slug, 'ticket_slug': ticket.slug
+        })
+        request = self.context.get('request')
+        return request.build_absolute_uri(path)
+
     def get_user_permissions(self, ticket):
+        batched = self.context.get('ticket_permissions')
+        if batched is not None and ticket.pk in batched:
+            return batched[ticket.pk]
         user = self.context.get('request').user
         return ticket.get_user_ticket_permissions(user)
 
     def create(self, validated_data):
         return Ticket.objects.create_new(**validated_data)
+
+
+class TicketSearchResultSerializer(serializers.ModelSerializer):
+    """A compact ticket for search results, with the project it belongs to and how well it matched."""
+    project = serializers.SlugRelatedField(slug_field='slug', read_only=True)
+    url = serializers.SerializerMethodField()
+    rank = serializers.FloatField(source='search_rank', read_only=True)
+
+    class Meta:
+        model = Ticket
+        fields = ['title', 'slug', 'project', 'priority', 'is_open', 'created', 'modified', 'url', 'rank']
+        read_only_fields = fields
+
+    def get_url(self, ticket):
+        path = reverse('api:tickets-detail', kwargs={
+            'team_slug': ticket.project.team.slug, 'project_slug': ticket.project.slug, 'slug': ticket.slug
+        })
+        return self.context['request'].build_absolute_uri(path)
+
+
+class ProjectMemberSlugField(serializers.SlugRelatedField):
+    """A username that must belong to a member of the project in the serializer context."""
+    def get_queryset(self):
+        return self.context['project'].members.all()
+
+
+class TicketBulkChangesSerializer(serializers.Serializer):
+    """The change set applied to every ticket in a bulk update; at least one field is required."""
+    is_open = serializers.BooleanField(required=False)
+    priority = serializers.ChoiceField(choices=Ticket.Priorities.choices, required=False)
+    resolution = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    developer = ProjectMemberSlugField(slug_field='username', required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError('No changes submitted.')
+        return attrs
+
+
+class TicketBulkUpdateSerializer(serializers.Serializer):
+    slugs = serializers.ListField(
+        child=serializers.SlugField(), allow_empty=False, max_length=settings.TICKETS_BULK_UPDATE_MAX
+    )
+    changes = TicketBulkChangesSerializer()
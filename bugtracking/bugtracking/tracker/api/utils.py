@@ -21,3 +21,24 @@ def custom_exception_handler(exc, context):
         )
 
     return response
+
+
+def get_sparse_fieldset(request):
+    """
+    Reads ?fields=a,b and ?omit=c,d off a GET request.
+    Returns (fields, omit): `fields` is the set of requested field names, or None if the client didn't restrict them,
+    and `omit` is the set of field names to leave out.
+    """
+    if request is None or request.method != 'GET':
+        return None, set()
+    fields = request.query_params.get('fields')
+    omit = request.query_params.get('omit')
+    fields = {name.strip() for name in fields.split(',') if name.strip()} if fields else None
+    omit = {name.strip() for name in omit.split(',') if name.strip()} if omit else set()
+    return fields, omit
+
+
+def is_field_requested(request, name):
+    """Whether the response to `request` will include the top-level field `name`; see get_sparse_fieldset()."""
+    fields, omit = get_sparse_fieldset(request)
+    return (fields is None or name in fields) and name not in omit
@@ -3,13 +3,16 @@ import datetime as dt
 
 # core django imports
 from django.conf import settings
+from django.db import transaction
 from django.db.utils import IntegrityError
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 # third party imports
 from rest_framework import viewsets
+from rest_framework import mixins
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
@@ -17,22 +20,41 @@ from rest_framework.response import Response
 from rest_framework.serializers import ValidationError as SerializerValidationError
 
 # my internal imports
-from ..models import Team, TeamMembership, Project, Ticket, TeamInvitation
+from ..models import Team, TeamMembership, Project, ProjectAccess, Ticket, Comment, TeamInvitation
+from ..search import search_tickets
+from ..access import get_access
 from . import serializers
 from . import permissions
+from .pagination import TicketCursorPagination, CommentCursorPagination, TicketSearchPagination
+from .filters import TicketFilter, TicketOrderingFilter
+from .routes import resolve_route
+from .conditional import ConditionalRetrieveMixin, TeamVersionedMixin
+from .utils import is_field_requested
 
 User = get_user_model()
 
 
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(TeamVersionedMixin, viewsets.ModelViewSet):
     # serializer_class = serializers.TeamCreateRetrieveSerializer
     # serializer_class = serializers.TeamUpdateSerializer
     permission_classes = [IsAuthenticated, permissions.TeamPermissions]
     lookup_field = 'slug'
+    team_slug_kwarg = 'slug'
 
     def get_queryset(self):
         user = self.request.user
-        return Team.objects.all_users_teams(user)
+        teams = Team.objects.all_users_teams(user)
+        if is_field_requested(self.request, 'memberships'):
+            teams = teams.prefetch_related('memberships__user')
+        if self.action == 'list' and is_field_requested(self.request, 'admins'):
+            # one query for the whole page; a single team's admins cost one query either way
+            teams = teams.with_admins()
+        if not is_field_requested(self.request, 'description'):
+            teams = teams.defer('description')
+        return teams
+
+    def get_list_team_ids(self):
+        return list(TeamMembership.objects.filter(user=self.request.user).values_list('team_id', flat=True))
 
     def get_serializer_class(self):
         """
@@ -54,6 +76,22 @@ class TeamViewSet(viewsets.ModelViewSet):
         user = self.request.user
         serializer.save(creator=user)
 
+    @action(detail=True, methods=['get'])
+    def search(self, request, **kwargs):
+        """
+        Full-text search over the titles, descriptions, resolutions and comments of the team's tickets that the user
+        can see, best match first: ?q=<words>. Every word has to match.
+        """
+        team = self.get_object()
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'errors': 'A search query (?q=) is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        tickets = Ticket.objects.filter_for_team_and_user(team_slug=team.slug, user=request.user).select_related('project__team')
+        paginator = TicketSearchPagination()
+        page = paginator.paginate_queryset(search_tickets(tickets, query), request, view=self)
+        serializer = serializers.TicketSearchResultSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=['get'],
@@ -62,8 +100,7 @@ class TeamViewSet(viewsets.ModelViewSet):
     def accept_invitation(self, request, **kwargs):
         try:
             invitation_id = self.request.GET.get('invitation')
-            team_slug = kwargs.get('slug')
-            team = Team.objects.get(slug=team_slug)
+            team = resolve_route(request, kwargs.get('slug')).team
             invitation = TeamInvitation.objects.get(team=team, id=invitation_id, invitee_email=request.user.email)
             invitation.accept_invite(user=request.user)
             return Response({'status': 'Invitation accepted.'})
@@ -78,8 +115,7 @@ class TeamViewSet(viewsets.ModelViewSet):
     def decline_invitation(self, request, **kwargs):
         try:
             invitation_id = self.request.GET.get('invitation')
-            team_slug = kwargs.get('slug')
-            team = Team.objects.get(slug=team_slug)
+            team = resolve_route(request, kwargs.get('slug')).team
             invitation = TeamInvitation.objects.get(team=team, id=invitation_id, invitee_email=request.user.email)
             invitation.decline_invite(user=request.user)
             return Response({'status': 'Invitation declined.'})
@@ -93,8 +129,7 @@ class TeamViewSet(viewsets.ModelViewSet):
     )
     def step_down_as_admin(self, request, **kwargs):
         try:
-            team_slug = kwargs.get('slug')
-            team = Team.objects.get(slug=team_slug)
+            team = resolve_route(request, kwargs.get('slug')).team
             team.remove_self_as_admin(user=request.user)
             return Response({'status': 'You have successfully stepped down as team admin.'})
         except ValidationError as e:
@@ -140,16 +175,15 @@ class TeamMembershipViewSet(viewsets.ModelViewSet):
         return TeamMembership.objects.filter(user=user)
 
 
-class TeamInvitationViewSet(viewsets.ModelViewSet):
+class TeamInvitationViewSet(TeamVersionedMixin, viewsets.ModelViewSet):
     serializer_class = serializers.TeamInvitationSerializer
     permission_classes = [IsAuthenticated, permissions.TeamInvitePermissions]
     lookup_field = 'id'
     http_method_names = ['get', 'post', 'delete', 'head', 'options']
 
     def get_queryset(self):
-        team_slug = self.kwargs.get('team_slug')
-        team = Team.objects.get(slug=team_slug)
-        return TeamInvitation.objects.filter(team=team)
+        team = resolve_route(self.request, self.kwargs.get('team_slug')).team
+        return TeamInvitation.objects.filter(team=team).select_related('team', 'inviter', 'invitee')
 
     # def get_queryset(self):
     #     return TeamInvitation.objects.filter(invitee_email=self.request.user)
@@ -159,8 +193,7 @@ class TeamInvitationViewSet(viewsets.ModelViewSet):
             invitee_email = self.request.data.get('invitee_email')
             if serializer.is_valid():
                 inviter = self.request.user
-                team_slug = self.kwargs.get('team_slug', None)
-                team = Team.objects.get(slug=team_slug)
+                team = resolve_route(self.request, self.kwargs.get('team_slug')).team
                 already_a_member = team.members.filter(email=invitee_email)
                 if already_a_member:
                     raise SerializerValidationError({'errors': 'User is already a member of this team.'})
@@ -180,6 +213,25 @@ class TeamInvitationViewSet(viewsets.ModelViewSet):
             content = {'errors': 'Someone at that email address has already been invited to this team.'}
             raise SerializerValidationError(content)
 
+    @action(detail=False, methods=['post'], serializer_class=serializers.TeamInvitationBulkSerializer)
+    def bulk(self, request, *args, **kwargs):
+        """
+        Invites a list of addresses at once: {"emails": [...]}. Returns a status for every address
+        (invited, already_member, already_invited, duplicate or invalid); only the invited ones get an email.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        team = resolve_route(request, self.kwargs.get('team_slug')).team
+        try:
+            with transaction.atomic():
+                results = TeamInvitation.objects.bulk_invite(team, request.user, serializer.validated_data['emails'])
+        except IntegrityError:
+            # another request invited one of these addresses in the meantime
+            content = {'errors': 'Someone at one of those email addresses has just been invited to this team. Please try again.'}
+            raise SerializerValidationError(content)
+        invited = sum(1 for result in results if result['status'] == 'invited')
+        return Response({'invited': invited, 'results': results})
+
     @action(
         detail=True,
         methods=['get'],
@@ -191,13 +243,15 @@ class TeamInvitationViewSet(viewsets.ModelViewSet):
         return Response({'status': 'Invitation email sent successfully.'})
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
-    def my_invitations(self, request):
-        invitations = TeamInvitation.objects.filter(invitee_email=request.user.email, status=TeamInvitation.Status.PENDING).order_by('-created')
+    def my_invitations(self, request, **kwargs):
+        invitations = TeamInvitation.objects.filter(
+            invitee_email=request.user.email, status=TeamInvitation.Status.PENDING
+        ).select_related('team', 'inviter', 'invitee').order_by('-created')
         serializer = self.get_serializer(invitations, many=True)
         return Response(serializer.data)
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(TeamVersionedMixin, ConditionalRetrieveMixin, viewsets.ModelViewSet):
     serializer_class = serializers.ProjectSerializer
     permission_classes = [IsAuthenticated, permissions.ProjectPermissions]
     lookup_field = 'slug'
@@ -205,19 +259,35 @@ class ProjectViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         team_slug = self.kwargs['team_slug']
-        return Project.objects.filter_for_team_and_user(team_slug=team_slug, user=user)
+        projects = Project.objects.filter_for_team_and_user(team_slug=team_slug, user=user).select_related('team', 'manager')
+        if is_field_requested(self.request, 'memberships'):
+            projects = projects.prefetch_related('memberships__user')
+        if not is_field_requested(self.request, 'description'):
+            projects = projects.defer('description')
+        return projects
+
+    def get_team_id(self, project):
+        return project.team_id
+
+    def get_etag_parts(self, project):
+        # memberships and the manager's role come in through the team's access version; the members' usernames are
+        # only there when memberships were asked for, and are prefetched then
+        members = None
+        if is_field_requested(self.request, 'memberships'):
+            members = [membership.user.username for membership in project.memberships.all()]
+        return [
+            project.modified, project.manager_id, getattr(project.manager, 'username', None), members,
+            project.open_tickets_count, project.closed_tickets_count,
+        ]
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        team_slug = self.kwargs['team_slug']
-        team = Team.objects.get(slug=team_slug)
-        context['team'] = team
+        context['team'] = resolve_route(self.request, self.kwargs['team_slug']).team
         # context['request'] = self.request
         return context
 
     def perform_create(self, serializer):
-        team_slug = self.kwargs['team_slug']
-        team = Team.objects.get(slug=team_slug)
+        team = resolve_route(self.request, self.kwargs['team_slug']).team
         serializer.save(team=team)
 
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
@@ -241,36 +311,55 @@ class ProjectViewSet(viewsets.ModelViewSet):
         return Response({'status': 'User removed.'}, status=status.HTTP_200_OK)
 
 
-class TicketViewSet(viewsets.ModelViewSet):
+class TicketViewSet(TeamVersionedMixin, ConditionalRetrieveMixin, viewsets.ModelViewSet):
     serializer_class = serializers.TicketSerializer
     permission_classes = [IsAuthenticated, permissions.TicketPermissions]
+    pagination_class = TicketCursorPagination
+    filter_backends = [TicketOrderingFilter, TicketFilter]
     lookup_field = 'slug'
 
+    def get_route(self):
+        return resolve_route(self.request, self.kwargs['team_slug'], self.kwargs['project_slug'])
+
     def get_queryset(self):
-        user = self.request.user
-        team_slug = self.kwargs['team_slug']
-        team = Team.objects.get(slug=team_slug)
-        project_slug = self.kwargs['project_slug']
-        project = Project.objects.get(slug=project_slug, team=team)
-        return project.tickets.filter_for_team_and_user(user=user, team_slug=team_slug)
+        team, project, _ticket = self.get_route()
+        access = get_access(self.request.user)
+        tickets = project.tickets.select_related('user', 'developer', 'project__team')
+        # the same tickets filter_for_team_and_user would give, from the access context rather than another join:
+        # team admins and project members see every ticket in the project, anyone else none
+        if not access.can(project, ProjectAccess.VIEW):
+            tickets = tickets.none()
+        if is_field_requested(self.request, 'comments') or is_field_requested(self.request, 'comment_count'):
+            tickets = tickets.with_comment_summary()
+        deferred = [name for name in ('description', 'resolution') if not is_field_requested(self.request, name)]
+        if deferred:
+            tickets = tickets.defer(*deferred)
+        return tickets
+
+    def get_team_id(self, ticket):
+        return ticket.project.team_id
+
+    def get_etag_parts(self, ticket):
+        # comment_count, comments_modified and the recent comments are only there (and only matter) when comments
+        # were asked for; the usernames are all select_related or prefetched already
+        return [
+            ticket.modified, ticket.project_id, ticket.developer_id, ticket.user_id, ticket.project.manager_id,
+            getattr(ticket.user, 'username', None), getattr(ticket.developer, 'username', None),
+            getattr(ticket, 'comment_count', None), getattr(ticket, 'comments_modified', None),
+            [getattr(comment.user, 'username', None) for comment in getattr(ticket, 'recent_comments', [])],
+        ]
+
+    def get_last_modified(self, ticket):
+        return max(filter(None, [ticket.modified, getattr(ticket, 'comments_modified', None)]))
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        team_slug = self.kwargs['team_slug']
-        team = Team.objects.get(slug=team_slug)
-        context['team'] = team
-        project_slug = self.kwargs['project_slug']
-        project = Project.objects.get(slug=project_slug, team=team)
-        context['project'] = project
+        context['team'], context['project'], _ticket = self.get_route()
         context['user'] = self.request.user
         return context
 
     def perform_create(self, serializer):
-        team_slug = self.kwargs['team_slug']
-        team = Team.objects.get(slug=team_slug)
-        project_slug = self.kwargs['project_slug']
-        project = Project.objects.get(slug=project_slug, team=team)
-        serializer.save(project=project, user=self.request.user)
+        serializer.save(project=self.get_route().project, user=self.request.user)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, permissions.CommentPermissions])
     def create_comment(self, request, **kwargs):
@@ -290,7 +379,49 @@ class TicketViewSet(viewsets.ModelViewSet):
         user = request.user
         return Response(ticket.get_user_ticket_permissions(user), status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], serializer_class=serializers.TicketBulkUpdateSerializer)
+    def bulk(self, request, **kwargs):
+        """
+        Applies one change set to many of the project's tickets: {"slugs": [...], "changes": {"is_open": false, ...}}.
+        `changes` may hold is_open, priority, resolution and developer. Permissions are those of a single update
+        (changing the developer needs a team admin or the project manager, anything else also the ticket's developer),
+        worked out for the whole set at once. Tickets the user may change are updated together; every slug gets a
+        status of updated, forbidden or not_found.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        slugs = serializer.validated_data['slugs']
+        changes = serializer.validated_data['changes']
+        project = serializer.context['project']
+        tickets = {ticket.slug: ticket for ticket in project.tickets.filter(slug__in=slugs).select_related('project')}
+        user_permissions = Ticket.get_user_ticket_permissions_for(tickets.values(), request.user)
+        needed = 'change_developer' if 'developer' in changes else 'edit'
+        results, allowed = [], []
+        for slug in dict.fromkeys(slugs):
+            ticket = tickets.get(slug)
+            if ticket is None:
+                results.append({'slug': slug, 'status': 'not_found'})
+            elif not user_permissions[ticket.pk][needed]:
+                results.append({'slug': slug, 'status': 'forbidden'})
+            else:
+                results.append({'slug': slug, 'status': 'updated'})
+                allowed.append(ticket.pk)
+        if allowed:
+            Ticket.objects.filter(pk__in=allowed).update(**changes, modified=timezone.now())
+        return Response({'updated': len(allowed), 'results': results})
 
-class CommentViewset(viewsets.ModelViewSet):
+
+class CommentViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
+    """A ticket's full comment history, cursor-paginated newest first. Tickets themselves only embed the newest few."""
     serializer_class = serializers.CommentSerializer
-    permission_classes = [IsAuthenticated, ]
+    permission_classes = [IsAuthenticated, permissions.CommentPermissions]
+    pagination_class = CommentCursorPagination
+
+    def get_ticket(self):
+        return resolve_route(self.request, self.kwargs['team_slug'], self.kwargs['project_slug'], self.kwargs['ticket_slug']).ticket
+
+    def get_queryset(self):
+        return Comment.objects.filter(ticket=self.get_ticket()).select_related('user', 'ticket')
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user, ticket=self.get_ticket())
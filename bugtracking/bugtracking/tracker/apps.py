@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TrackerConfig(AppConfig):
     name = 'bugtracking.tracker'
+
+    def ready(self):
+        import bugtracking.tracker.signals  # noqa F401
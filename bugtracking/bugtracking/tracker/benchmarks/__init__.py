@@ -0,0 +1,8 @@
+"""
+Endpoint benchmarks: every route in config/api_router.py is requested over small, medium and large datasets, and
+each one's query count and p50/p95 latency are compared with the baselines kept in `baselines.json`.
+Run by tests_tracker/test_benchmarks.py; see there for the environment variables that choose datasets, tolerances
+and whether to record new baselines.
+
+`loadtest.py` drives a running server over HTTP instead, with concurrent virtual users; see `manage.py loadtest`.
+"""
@@ -0,0 +1,115 @@
+# stdlib imports
+from collections import namedtuple
+
+# core django imports
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+# third party imports
+
+# my internal imports
+from ..models import Team, TeamMembership, Project, ProjectMembership, Ticket, Comment, TeamInvitation
+from ..project_access import sync_project_access
+from ..search import index_tickets
+
+User = get_user_model()
+
+
+DatasetSize = namedtuple('DatasetSize', [
+    'members',  # members of the benchmarked team, besides its named users
+    'other_teams',  # other teams the admin belongs to (what the teams list pages through)
+    'projects',  # projects in the team
+    'tickets',  # tickets per project
+    'comments',  # comments per ticket
+    'invitations',  # pending invitations to the team
+])
+
+SIZES = {
+    'small': DatasetSize(members=5, other_teams=2, projects=3, tickets=20, comments=2, invitations=3),
+    'medium': DatasetSize(members=25, other_teams=10, projects=8, tickets=200, comments=5, invitations=20),
+    'large': DatasetSize(members=100, other_teams=40, projects=20, tickets=1000, comments=10, invitations=100),
+}
+
+# the objects the benchmark scenarios act on; everything else is there to make the queries realistic
+Dataset = namedtuple('Dataset', [
+    'team', 'project', 'ticket', 'invitation',
+    'admin',  # team admin, and the creator of every ticket
+    'co_admin',  # a second admin, so the first can step down
+    'manager',  # manager of `project`
+    'developer',  # developer of `ticket`
+    'member',  # a plain team and project member, who can leave or be removed
+    'outsider',  # a team member outside `project`, who can be added to it
+    'invitee',  # not in the team, with a pending `invitation`
+])
+
+
+def _users(prefix, count):
+    User.objects.bulk_create([
+        User(username=f'{prefix}-{i}', email=f'{prefix}-{i}@example.com', name=f'{prefix} {i}') for i in range(count)
+    ])
+    return list(User.objects.filter(username__startswith=f'{prefix}-').order_by('pk'))
+
+
+def build_dataset(size):
+    """Creates the dataset for a size in SIZES and returns its Dataset. Rows are bulk inserted wherever possible."""
+    spec = SIZES[size]
+    admin, co_admin, manager, developer, member, outsider, invitee = named = [
+        User.objects.create_user(username=f'bench-{role}', email=f'bench-{role}@example.com', password='password')
+        for role in ('admin', 'co_admin', 'manager', 'developer', 'member', 'outsider', 'invitee')
+    ]
+    others = _users('bench-user', spec.members)
+
+    team = Team.objects.create_new(
+        title='Benchmark team', description='The team the benchmarks run against.', creator=admin,
+    )
+    team_members = [co_admin, manager, developer, member, outsider] + others
+    TeamMembership.objects.bulk_create([
+        TeamMembership(
+            team=team, user=user, role=TeamMembership.Roles.ADMIN if user == co_admin else TeamMembership.Roles.MEMBER,
+        )
+        for user in team_members
+    ])
+    for i in range(spec.other_teams):
+        Team.objects.create_new(title=f'Benchmark other team {i}', creator=admin)
+
+    projects = [
+        Project.objects.create_new(
+            team=team, title=f'Benchmark project {i}', description='Benchmarked.', manager=manager,
+        )
+        for i in range(spec.projects)
+    ]
+    project_members = [developer, member] + others
+    ProjectMembership.objects.bulk_create([
+        ProjectMembership(project=project, user=user) for project in projects for user in project_members
+    ])
+    sync_project_access(team.projects.all())  # bulk_create skipped the membership signals
+
+    developers = [developer] + others
+    Ticket.objects.bulk_create([
+        Ticket(
+            project=project, user=admin, developer=developers[i % len(developers)] if i % 4 else None,
+            title=f'Benchmark ticket {p}-{i}', description=f'Ticket {i} of project {p}, about widget {i % 7}.',
+            priority=Ticket.Priorities.values[i % len(Ticket.Priorities.values)], is_open=bool(i % 3),
+        )
+        for p, project in enumerate(projects) for i in range(spec.tickets)
+    ], batch_size=settings.BULK_INSERT_BATCH_SIZE)
+    ticket_ids = list(Ticket.objects.filter(project__team=team).values_list('pk', flat=True))
+    Comment.objects.bulk_create([
+        Comment(
+            ticket_id=ticket_id, user=developers[(ticket_id + i) % len(developers)],
+            text=f'Comment {i} about widget {i % 7}.',
+        )
+        for ticket_id in ticket_ids for i in range(spec.comments)
+    ], batch_size=settings.BULK_INSERT_BATCH_SIZE)
+    index_tickets(ticket_ids)  # again, now that the comments are in
+
+    TeamInvitation.objects.bulk_create([
+        TeamInvitation(team=team, inviter=admin, invitee_email=f'bench-invited-{i}@example.com', message_text='')
+        for i in range(spec.invitations - 1)
+    ], batch_size=settings.BULK_INSERT_BATCH_SIZE)
+    invitation = TeamInvitation.objects.create(team=team, inviter=admin, invitee_email=invitee.email, message_text='')
+
+    project = projects[0]
+    project.refresh_from_db()
+    ticket = project.tickets.filter(developer=developer).order_by('pk').first()
+    return Dataset(team, project, ticket, invitation, *named)
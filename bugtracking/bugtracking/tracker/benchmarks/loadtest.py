@@ -0,0 +1,260 @@
+# stdlib imports
+import random
+import threading
+import time
+from collections import defaultdict, namedtuple
+from urllib.parse import urlsplit
+
+# core django imports
+from django.contrib.auth import get_user_model
+from django.shortcuts import reverse
+from django.urls import resolve, Resolver404
+
+# third party imports
+import requests
+
+# my internal imports
+from ..models import TeamMembership, Project, ProjectMembership, Ticket
+from .runner import percentile
+
+User = get_user_model()
+
+# HTTP LOAD TESTS
+# Virtual users, each a thread with its own keep-alive session, sign in with tokens from the local Firebase stand-in
+# (users.firebase.LocalTokenIssuer) and run the scenarios below against a running server, picked at random by weight,
+# until the run is over. Every request is recorded under its method and URL name, e.g. "GET tickets-list".
+# Each virtual user gets its own Random seeded from the run's seed, and the users and objects it works on are picked
+# from the database (a dataset made by `manage.py generate_dataset`) the same way every time, so two runs over the
+# same data make the same mix of requests; only how many they get through differs.
+# Driven by `manage.py loadtest`.
+
+SAMPLED_TICKETS = 20  # tickets per project a virtual user may open, comment on or triage
+
+Plan = namedtuple('Plan', [
+    'username', 'email',
+    'teams',  # slugs of the user's teams
+    'projects',  # [(team slug, project slug, [ticket slugs])] the user can see
+    'editable',  # the subset of `projects` whose tickets the user may edit (as team admin or manager)
+])
+
+Sample = namedtuple('Sample', ['route', 'started', 'elapsed', 'status'])
+
+
+def plan_for(user, rng):
+    """What a virtual user signed in as `user` will browse: the teams, projects and tickets it can see."""
+    memberships = list(TeamMembership.objects.filter(user=user).select_related('team').order_by('team_id'))
+    admin_teams = {m.team_id for m in memberships if m.role == TeamMembership.Roles.ADMIN}
+    member_of = set(ProjectMembership.objects.filter(user=user).values_list('project_id', flat=True))
+    projects, editable = [], []
+    visible = Project.objects.filter(team__in=[m.team_id for m in memberships]).select_related('team').order_by('pk')
+    for project in visible:
+        if project.team_id not in admin_teams and project.pk not in member_of:
+            continue
+        tickets = Ticket.objects.filter(project=project).order_by('pk')
+        slugs = list(tickets.values_list('slug', flat=True)[:SAMPLED_TICKETS * 5])
+        entry = (project.team.slug, project.slug, rng.sample(slugs, min(len(slugs), SAMPLED_TICKETS)))
+        projects.append(entry)
+        if entry[2] and (project.team_id in admin_teams or project.manager_id == user.pk):
+            editable.append(entry)
+    return Plan(user.username, user.email, [m.team.slug for m in memberships], projects, editable)
+
+
+def make_plans(prefix, count, seed):
+    """Plans for `count` virtual users, drawn from the dataset's users who can see at least one ticket."""
+    rng = random.Random(seed)
+    users = list(User.objects.filter(username__startswith=f'{prefix}-user-').order_by('pk'))
+    rng.shuffle(users)
+    plans = []
+    for user in users:
+        plan = plan_for(user, rng)
+        if any(tickets for _team, _project, tickets in plan.projects):
+            plans.append(plan)
+        if len(plans) == count:
+            break
+    if not plans:
+        raise ValueError(
+            f'No users named "{prefix}-user-*" can see any tickets; run `manage.py generate_dataset` first.'
+        )
+    # more virtual users than suitable users: some sign in as the same user, as people do with several tabs open
+    return [plans[i % len(plans)] for i in range(count)]
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, base_url, plan, token, seed, mix, think_time, start_at, deadline):
+        super().__init__(daemon=True)
+        self.base_url = base_url.rstrip('/')
+        self.plan = plan
+        self.rng = random.Random(seed)
+        self.mix = {name: weight for name, weight in mix.items() if name != 'triage' or plan.editable}
+        self.think_time = think_time
+        self.start_at = start_at
+        self.deadline = deadline
+        self.samples = []
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'JWT {token}'
+
+    def request(self, method, path, **kwargs):
+        """Makes and records one request; returns its JSON body, or None if it failed."""
+        try:
+            route = f'{method.upper()} {resolve(urlsplit(path).path).url_name}'
+        except Resolver404:
+            route = f'{method.upper()} {path}'
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=30, **kwargs)
+            status = response.status_code
+        except requests.RequestException as exc:
+            response, status = None, type(exc).__name__
+        self.samples.append(Sample(route, started, time.monotonic() - started, status))
+        if response is None or not 200 <= response.status_code < 300 or not response.content:
+            return None
+        return response.json()
+
+    def project(self, editable=False):
+        projects = self.plan.editable if editable else [entry for entry in self.plan.projects if entry[2]]
+        return self.rng.choice(projects)
+
+    def run(self):
+        time.sleep(max(0, self.start_at - time.monotonic()))
+        names, weights = list(self.mix), list(self.mix.values())
+        while time.monotonic() < self.deadline:
+            SCENARIOS[self.rng.choices(names, weights)[0]](self)
+            if self.think_time:
+                time.sleep(self.rng.expovariate(1 / self.think_time))
+        self.session.close()
+
+
+# SCENARIOS
+
+def browse_team(vu):
+    vu.request('get', reverse('api:teams-list'))
+    team_slug = vu.rng.choice(vu.plan.teams)
+    vu.request('get', reverse('api:teams-detail', kwargs={'slug': team_slug}))
+    vu.request('get', reverse('api:projects-list', kwargs={'team_slug': team_slug}))
+
+
+def list_tickets(vu):
+    team_slug, project_slug, _tickets = vu.project()
+    query = vu.rng.choice(['', '?is_open=true', '?is_open=true&ordering=-priority', '?ordering=-modified'])
+    kwargs = {'team_slug': team_slug, 'project_slug': project_slug}
+    page = vu.request('get', reverse('api:tickets-list', kwargs=kwargs) + query)
+    if page and page.get('next') and vu.rng.random() < 0.5:
+        next_url = urlsplit(page['next'])
+        vu.request('get', f'{next_url.path}?{next_url.query}')
+
+
+def open_ticket(vu):
+    team_slug, project_slug, tickets = vu.project()
+    kwargs = {'team_slug': team_slug, 'project_slug': project_slug}
+    slug = vu.rng.choice(tickets)
+    vu.request('get', reverse('api:tickets-detail', kwargs={**kwargs, 'slug': slug}))
+    vu.request('get', reverse('api:comments-list', kwargs={**kwargs, 'ticket_slug': slug}))
+
+
+def comment(vu):
+    team_slug, project_slug, tickets = vu.project()
+    kwargs = {'team_slug': team_slug, 'project_slug': project_slug, 'ticket_slug': vu.rng.choice(tickets)}
+    vu.request('post', reverse('api:comments-list', kwargs=kwargs), json={'text': 'Load test comment.'})
+
+
+def triage(vu):
+    team_slug, project_slug, tickets = vu.project(editable=True)
+    kwargs = {'team_slug': team_slug, 'project_slug': project_slug}
+    vu.request('get', reverse('api:tickets-list', kwargs=kwargs) + '?is_open=true&ordering=-priority')
+    changes = vu.rng.choice([
+        {'priority': vu.rng.choice(Ticket.Priorities.values)}, {'is_open': False}, {'is_open': True},
+    ])
+    vu.request('patch', reverse('api:tickets-detail', kwargs={**kwargs, 'slug': vu.rng.choice(tickets)}), json=changes)
+
+
+SCENARIOS = {
+    'browse_team': browse_team,
+    'list_tickets': list_tickets,
+    'open_ticket': open_ticket,
+    'comment': comment,
+    'triage': triage,
+}
+
+DEFAULT_MIX = {'browse_team': 3, 'list_tickets': 3, 'open_ticket': 3, 'comment': 1, 'triage': 1}
+
+
+def run(base_url, plans, issuer, seed, mix, duration, warmup=0, ramp_up=0, think_time=0):
+    """
+    Runs one virtual user per plan for `warmup + duration` seconds, starting them evenly over `ramp_up`, and returns
+    the samples taken after the warm-up and before the end.
+    """
+    start = time.monotonic()
+    measured_from, deadline = start + warmup, start + warmup + duration
+    lifetime = int(warmup + duration + 600)
+    users = [
+        VirtualUser(
+            base_url, plan, issuer.issue(plan.username, email=plan.email, lifetime=lifetime), seed=f'{seed}-{i}',
+            mix=mix, think_time=think_time, start_at=start + ramp_up * i / len(plans), deadline=deadline,
+        )
+        for i, plan in enumerate(plans)
+    ]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    samples = [
+        sample for user in users for sample in user.samples
+        if measured_from <= sample.started < deadline
+    ]
+    return samples
+
+
+def summarize(samples, duration):
+    """{route: stats} and the same stats over every request, as {'routes': ..., 'total': ...}."""
+    by_route = defaultdict(list)
+    for sample in samples:
+        by_route[sample.route].append(sample)
+
+    def stats(group):
+        timings = [sample.elapsed for sample in group]
+        errors = defaultdict(int)
+        for sample in group:
+            if not isinstance(sample.status, int) or sample.status >= 400:
+                errors[str(sample.status)] += 1
+        return {
+            'requests': len(group),
+            'rps': round(len(group) / duration, 2),
+            'errors': sum(errors.values()),
+            'error_rate': round(sum(errors.values()) / len(group), 4),
+            'statuses': dict(errors),
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+            'max_ms': round(max(timings) * 1000, 2),
+        }
+
+    return {
+        'routes': {route: stats(group) for route, group in sorted(by_route.items())},
+        'total': stats(samples) if samples else None,
+    }
+
+
+def format_report(summary, baseline=None):
+    """A table of the summary; with a baseline summary, each figure is followed by its change from the baseline."""
+    columns = ['requests', 'rps', 'error_rate', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+    rows = list(summary['routes'].items()) + [('TOTAL', summary['total'])]
+    width = max(len(name) for name, _stats in rows)
+    cell_width = 10 if baseline is None else 18
+    lines = [f'{"route":<{width}}  ' + '  '.join(f'{column:>{cell_width}}' for column in columns)]
+    for name, stats in rows:
+        if stats is None:
+            continue
+        before = None
+        if baseline is not None:
+            before = baseline['total'] if name == 'TOTAL' else baseline['routes'].get(name)
+        cells = []
+        for column in columns:
+            cell = f'{stats[column]}'
+            if before is not None and before[column]:
+                cell += f' ({(stats[column] - before[column]) / before[column]:+.0%})'
+            cells.append(f'{cell:>{cell_width}}')
+        lines.append(f'{name:<{width}}  ' + '  '.join(cells))
+        if stats['statuses']:
+            errors = ', '.join(f'{status} x{count}' for status, count in stats['statuses'].items())
+            lines.append(f'{"":<{width}}  errors: {errors}')
+    return '\n'.join(lines)
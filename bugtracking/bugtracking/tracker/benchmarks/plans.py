@@ -0,0 +1,100 @@
+# stdlib imports
+import time
+
+# core django imports
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+# third party imports
+
+# my internal imports
+from ..models import Team, Project, Ticket
+from .runner import percentile
+
+# VISIBILITY QUERY PLANS
+# The team, project and ticket visibility filters (TeamQueryset.all_users_teams and the querysets'
+# filter_for_team_and_user) check team memberships with an IN subquery and project access with a join on
+# ProjectAccess. They used to join through the membership tables and call .distinct(), after first loading the team
+# and its admins to pick the filter. The old forms are kept here so the two can be checked for the same results and
+# their plans and timings compared on a benchmark dataset.
+
+
+def distinct_join_teams(user, team_slug):
+    return Team.objects.filter(memberships__user=user).distinct()
+
+
+def distinct_join_projects(user, team_slug):
+    team = Team.objects.get(slug=team_slug)
+    if user in team.get_admins():
+        return Project.objects.filter(team__slug=team_slug).distinct()
+    return Project.objects.filter(members=user, team__slug=team_slug).distinct()
+
+
+def distinct_join_tickets(user, team_slug):
+    team = Team.objects.get(slug=team_slug)
+    if user in team.get_admins():
+        return Ticket.objects.filter(project__team__slug=team_slug).distinct()
+    return Ticket.objects.filter(project__members=user, project__team__slug=team_slug).distinct()
+
+
+def current_teams(user, team_slug):
+    return Team.objects.all_users_teams(user)
+
+
+def current_projects(user, team_slug):
+    return Project.objects.filter_for_team_and_user(team_slug, user)
+
+
+def current_tickets(user, team_slug):
+    return Ticket.objects.filter_for_team_and_user(team_slug, user)
+
+
+VISIBILITY_FILTERS = {
+    'teams': (distinct_join_teams, current_teams),
+    'projects': (distinct_join_projects, current_projects),
+    'tickets': (distinct_join_tickets, current_tickets),
+}
+
+
+def visible_pks(user, team_slug):
+    """{name: (pks from the DISTINCT join, pks from the current filter)}, which should be the same."""
+    return {
+        name: tuple(set(make(user, team_slug).values_list('pk', flat=True)) for make in forms)
+        for name, forms in VISIBILITY_FILTERS.items()
+    }
+
+
+def measure(make, user, team_slug, iterations):
+    """
+    The median time to build the queryset (whatever queries that takes) and fetch its rows, in ms, without turning
+    them into model instances; the number of queries; and the plan of the queryset's own query.
+    """
+    timings = []
+    for _ in range(iterations):
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            queryset = make(user, team_slug)
+            with connection.cursor() as cursor:
+                cursor.execute(*queryset.query.sql_with_params())
+                cursor.fetchall()
+            timings.append(time.perf_counter() - started)
+    return {'p50_ms': round(percentile(timings, 0.5) * 1000, 2), 'queries': len(queries), 'plan': queryset.explain()}
+
+
+def compare_plans(user, team_slug, iterations=5):
+    """{name: {'distinct': measurement, 'current': measurement}} for `user` in the team with `team_slug`."""
+    return {
+        name: dict(zip(('distinct', 'current'), (measure(make, user, team_slug, iterations) for make in forms)))
+        for name, forms in VISIBILITY_FILTERS.items()
+    }
+
+
+def format_plans(comparison):
+    lines = []
+    for name, forms in comparison.items():
+        lines.append(f'== {name}')
+        for form, measurement in forms.items():
+            lines.append(f'-- {form}: {measurement["p50_ms"]}ms in {measurement["queries"]} queries')
+            lines.append(measurement['plan'])
+    return '\n'.join(lines)
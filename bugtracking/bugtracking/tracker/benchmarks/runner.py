@@ -0,0 +1,206 @@
+# stdlib imports
+import gc
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+# core django imports
+from django.core.cache import cache
+from django.db import connection, reset_queries, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, resolve
+
+# third party imports
+
+# my internal imports
+from bugtracking.utils.timing import get_budget, view_label
+from ..access import invalidate_access
+from ..search import flush_comment_index
+from .scenarios import SCENARIOS, UNBENCHMARKED
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def reset_caches():
+    # every run starts cold, so query counts don't depend on what ran before (and no cached state outlives a rollback)
+    cache.clear()
+    invalidate_access()
+
+
+def run_scenario(client, dataset, scenario, iterations):
+    """
+    Makes the scenario's request `iterations` times (plus one uncounted warm-up run), each in a transaction that is
+    rolled back afterwards, so writes can be repeated and later scenarios see the same data. The garbage collector is
+    kept out of the timed requests, as timeit does: a full collection landing in one of them is a 50ms outlier.
+    ATOMIC_REQUESTS is switched off for the runs, whatever the settings say: the rolled-back transaction stands in for
+    the one the app wraps each request in, and leaving it on would add a savepoint production never makes.
+    Returns {'queries': the most any run took, 'p50_ms', 'p95_ms'}.
+    """
+    client.force_authenticate(getattr(dataset, scenario.user))
+    path = scenario.path(dataset)
+    extra = {}
+    if scenario.method != 'get':
+        extra = {'data': scenario.data(dataset) if scenario.data else None, 'format': 'json'}
+    timings, queries = [], []
+    atomic_requests = connection.settings_dict.get('ATOMIC_REQUESTS', False)
+    connection.settings_dict['ATOMIC_REQUESTS'] = False
+    gc.collect()
+    try:
+        for run in range(iterations + 1):
+            response, elapsed, captured = _timed_request(client, scenario, path, extra)
+            if response.status_code != scenario.status:
+                raise AssertionError(
+                    f'{scenario.name}: {scenario.method.upper()} {path} answered {response.status_code}, '
+                    f'not {scenario.status}: {getattr(response, "data", response.content)}'
+                )
+            if run:
+                timings.append(elapsed)
+                queries.append(len(captured))
+    finally:
+        connection.settings_dict['ATOMIC_REQUESTS'] = atomic_requests
+    reset_caches()
+    client.force_authenticate(None)
+    return {
+        'queries': max(queries),
+        'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+    }
+
+
+def _timed_request(client, scenario, path, extra):
+    reset_caches()
+    # the query log is a bounded deque: once a long run fills it, CaptureQueriesContext counts nothing
+    reset_queries()
+    gc.disable()
+    try:
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                # the work the request defers to its commit (search indexing, version bumps and so on) is run and
+                # measured with it, as it would be in production: the rolled-back transaction never commits
+                with capture_on_commit_callbacks(execute=True):
+                    response = getattr(client, scenario.method)(path, **extra)
+                elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+    finally:
+        gc.enable()
+    return response, elapsed, captured
+
+
+@contextmanager
+def _capture_on_commit_callbacks(execute=False):
+    """TestCase.captureOnCommitCallbacks for Django before 3.2: catches the callbacks registered inside the block."""
+    callbacks = []
+    with mock.patch.object(transaction, 'on_commit', lambda func, using=None: callbacks.append(func)):
+        yield callbacks
+        if execute:
+            for func in callbacks:  # including any the callbacks register themselves
+                func()
+
+
+capture_on_commit_callbacks = getattr(TestCase, 'captureOnCommitCallbacks', _capture_on_commit_callbacks)
+
+
+def run_all(client, dataset, iterations, names=None):
+    """Runs every scenario, or only those named in `names`."""
+    # the comment indexing building the dataset deferred to its commit happens first, so no scenario is charged for it
+    flush_comment_index()
+    return {
+        scenario.name: run_scenario(client, dataset, scenario, iterations)
+        for scenario in SCENARIOS if names is None or scenario.name in names
+    }
+
+
+def route_key(url_name, kwargs, method):
+    return url_name, tuple(sorted(kwargs)), method
+
+
+def api_routes():
+    """Every (url name, url kwargs, method) the API router serves."""
+    from config import api_router
+
+    def walk(patterns, groups=()):
+        for pattern in patterns:
+            pattern_groups = groups + tuple(pattern.pattern.regex.groupindex)
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns, pattern_groups)
+            elif isinstance(pattern, URLPattern) and getattr(pattern.callback, 'cls', None) is not None:
+                allowed = pattern.callback.cls.http_method_names
+                # DRF adds 'head' to the actions of a GET route the first time it's requested; it's the same view
+                for method in pattern.callback.actions:
+                    if method in allowed and method != 'head':
+                        yield route_key(pattern.name, pattern_groups, method)
+
+    return set(walk(api_router.urlpatterns))
+
+
+def unbenchmarked_routes(dataset):
+    """Routes served by the API that neither a scenario nor UNBENCHMARKED accounts for."""
+    covered = set(UNBENCHMARKED)
+    for scenario in SCENARIOS:
+        match = resolve(scenario.path(dataset).split('?')[0])
+        covered.add(route_key(match.url_name, match.kwargs, scenario.method))
+    return api_routes() - covered
+
+
+def load_baselines(path=BASELINES_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(baselines, path=BASELINES_PATH):
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def over_budget(dataset, results):
+    """
+    Finds the scenarios that ran more queries than REQUEST_BUDGETS allows their view, the same budgets
+    RequestTimingMiddleware warns about in production. Returns {scenario name: [what was over]}.
+    """
+    over = {}
+    for scenario in SCENARIOS:
+        result = results.get(scenario.name)
+        if result is None:
+            continue
+        label = view_label(resolve(scenario.path(dataset).split('?')[0]).func, scenario.method)
+        allowed = get_budget(label).get('queries')
+        if allowed is not None and result['queries'] > allowed:
+            over[scenario.name] = [f'{result["queries"]} queries, {label} budget {allowed}']
+    return over
+
+
+def compare(results, baseline, query_tolerance, latency_tolerance=None, latency_floor_ms=0):
+    """
+    Finds the scenarios that did worse than their baseline: more than `query_tolerance` extra queries, or (unless
+    `latency_tolerance` is None) a p95 more than `latency_tolerance` times slower plus `latency_floor_ms`, the floor
+    keeping sub-millisecond noise from counting. Scenarios without a baseline count too.
+    Returns {scenario name: [what was worse]}.
+    """
+    regressions = {}
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            regressions[name] = ['no baseline recorded']
+            continue
+        found = []
+        if result['queries'] > expected['queries'] + query_tolerance:
+            found.append(f'{result["queries"]} queries, baseline {expected["queries"]}')
+        if latency_tolerance is not None:
+            allowed = expected['p95_ms'] * (1 + latency_tolerance) + latency_floor_ms
+            if result['p95_ms'] > allowed:
+                found.append(f'p95 {result["p95_ms"]}ms, baseline {expected["p95_ms"]}ms (allowed {allowed:.1f}ms)')
+        if found:
+            regressions[name] = found
+    return regressions
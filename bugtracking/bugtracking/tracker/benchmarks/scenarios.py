@@ -0,0 +1,190 @@
+# stdlib imports
+from collections import namedtuple
+
+# core django imports
+from django.shortcuts import reverse
+
+# third party imports
+
+# my internal imports
+
+
+# One request per scenario. `path` and `data` are functions of the Dataset (see datasets.py), `user` is the name of
+# the Dataset user who makes the request, and `status` is the response it must get: a benchmark of an error page
+# would say nothing about the endpoint.
+Scenario = namedtuple('Scenario', ['name', 'method', 'path', 'user', 'data', 'status'])
+
+
+def scenario(name, method, path, user='admin', data=None, status=200):
+    return Scenario(name, method, path, user, data, status)
+
+
+def _team(d):
+    return {'team_slug': d.team.slug}
+
+
+def _project(d):
+    return {'team_slug': d.team.slug, 'project_slug': d.project.slug}
+
+
+def _ticket(d):
+    return {'team_slug': d.team.slug, 'project_slug': d.project.slug, 'slug': d.ticket.slug}
+
+
+def _team_url(name, suffix=''):
+    return lambda d: reverse(name, kwargs={'slug': d.team.slug}) + suffix
+
+
+def _invitation_url(name):
+    return lambda d: reverse(name, kwargs={'slug': d.team.slug}) + f'?invitation={d.invitation.id}'
+
+
+def _project_url(name):
+    return lambda d: reverse(name, kwargs={**_team(d), 'slug': d.project.slug})
+
+
+SCENARIOS = [
+    # users
+    scenario('users.list', 'get', lambda d: reverse('api:user-list')),
+    scenario('users.me', 'get', lambda d: reverse('api:user-me')),
+    scenario('users.retrieve', 'get', lambda d: reverse('api:user-detail', kwargs={'username': d.admin.username})),
+    scenario(
+        'users.update', 'put', lambda d: reverse('api:user-detail', kwargs={'username': d.admin.username}),
+        data=lambda d: {'username': d.admin.username, 'email': d.admin.email, 'name': 'Benchmark Admin'},
+    ),
+    scenario(
+        'users.partial_update', 'patch', lambda d: reverse('api:user-detail', kwargs={'username': d.admin.username}),
+        data=lambda d: {'name': 'Benchmark Admin'},
+    ),
+
+    # teams
+    scenario('teams.list', 'get', lambda d: reverse('api:teams-list')),
+    scenario(
+        'teams.create', 'post', lambda d: reverse('api:teams-list'), data=lambda d: {'title': 'Benchmark new team'},
+        status=201,
+    ),
+    scenario('teams.retrieve', 'get', _team_url('api:teams-detail')),
+    scenario('teams.update', 'put', _team_url('api:teams-detail'), data=lambda d: {'description': 'Updated.'}),
+    scenario(
+        'teams.partial_update', 'patch', _team_url('api:teams-detail'), data=lambda d: {'description': 'Updated.'},
+    ),
+    scenario('teams.destroy', 'delete', _team_url('api:teams-detail'), status=403),  # teams can't be deleted
+    scenario('teams.search', 'get', _team_url('api:teams-search', '?q=widget')),
+    scenario('teams.accept_invitation', 'get', _invitation_url('api:teams-accept-invitation'), user='invitee'),
+    scenario('teams.decline_invitation', 'get', _invitation_url('api:teams-decline-invitation'), user='invitee'),
+    scenario('teams.leave_team', 'get', _team_url('api:teams-leave-team'), user='member'),
+    scenario(
+        'teams.promote_admin', 'post', _team_url('api:teams-promote-admin'), data=lambda d: {'user': d.member.username},
+    ),
+    scenario(
+        'teams.remove_member', 'put', _team_url('api:teams-remove-member'),
+        data=lambda d: {'member': d.member.username},
+    ),
+    scenario('teams.step_down_as_admin', 'get', _team_url('api:teams-step-down-as-admin')),
+
+    # invitations
+    scenario('invitations.list', 'get', lambda d: reverse('api:invitations-list', kwargs=_team(d))),
+    scenario(
+        'invitations.create', 'post', lambda d: reverse('api:invitations-list', kwargs=_team(d)),
+        data=lambda d: {'invitee_email': 'bench-new@example.com'}, status=201,
+    ),
+    scenario(
+        'invitations.bulk', 'post', lambda d: reverse('api:invitations-bulk', kwargs=_team(d)),
+        data=lambda d: {'emails': [f'bench-bulk-{i}@example.com' for i in range(10)]},
+    ),
+    scenario('invitations.my_invitations', 'get', lambda d: reverse('api:invitations-my-invitations'), user='invitee'),
+    scenario(
+        'invitations.my_invitations (team)', 'get',
+        lambda d: reverse('api:invitations-my-invitations', kwargs=_team(d)), user='invitee',
+    ),
+    scenario(
+        'invitations.retrieve', 'get',
+        lambda d: reverse('api:invitations-detail', kwargs={**_team(d), 'id': d.invitation.id}),
+    ),
+    scenario(
+        'invitations.destroy', 'delete',
+        lambda d: reverse('api:invitations-detail', kwargs={**_team(d), 'id': d.invitation.id}), status=204,
+    ),
+    scenario(
+        'invitations.resend_email', 'get',
+        lambda d: reverse('api:invitations-resend-email', kwargs={**_team(d), 'id': d.invitation.id}),
+    ),
+
+    # projects
+    scenario('projects.list', 'get', lambda d: reverse('api:projects-list', kwargs=_team(d))),
+    scenario(
+        'projects.create', 'post', lambda d: reverse('api:projects-list', kwargs=_team(d)),
+        data=lambda d: {'title': 'Benchmark new project'}, status=201,
+    ),
+    scenario('projects.retrieve', 'get', _project_url('api:projects-detail')),
+    scenario(
+        'projects.update', 'put', _project_url('api:projects-detail'),
+        data=lambda d: {'title': d.project.title, 'description': 'Updated.'},
+    ),
+    scenario(
+        'projects.partial_update', 'patch', _project_url('api:projects-detail'),
+        data=lambda d: {'description': 'Updated.'},
+    ),
+    scenario('projects.destroy', 'delete', _project_url('api:projects-detail'), status=204),
+    scenario(
+        'projects.add_member', 'put', _project_url('api:projects-add-member'),
+        data=lambda d: {'member': d.outsider.username},
+    ),
+    scenario('projects.get_user_permissions', 'get', _project_url('api:projects-get-user-permissions')),
+    scenario(
+        'projects.remove_member', 'put', _project_url('api:projects-remove-member'),
+        data=lambda d: {'member': d.member.username},
+    ),
+
+    # tickets
+    scenario('tickets.list', 'get', lambda d: reverse('api:tickets-list', kwargs=_project(d))),
+    scenario(
+        'tickets.create', 'post', lambda d: reverse('api:tickets-list', kwargs=_project(d)),
+        data=lambda d: {'title': 'Benchmark new ticket', 'description': 'New.', 'priority': 2}, status=201,
+    ),
+    scenario(
+        'tickets.bulk', 'post', lambda d: reverse('api:tickets-bulk', kwargs=_project(d)),
+        data=lambda d: {
+            'slugs': list(d.project.tickets.order_by('pk').values_list('slug', flat=True)[:20]),
+            'changes': {'priority': 3},
+        },
+    ),
+    scenario('tickets.retrieve', 'get', lambda d: reverse('api:tickets-detail', kwargs=_ticket(d))),
+    scenario(
+        'tickets.update', 'put', lambda d: reverse('api:tickets-detail', kwargs=_ticket(d)),
+        data=lambda d: {'title': d.ticket.title, 'description': 'Updated.', 'priority': 2},
+    ),
+    scenario(
+        'tickets.partial_update', 'patch', lambda d: reverse('api:tickets-detail', kwargs=_ticket(d)),
+        data=lambda d: {'is_open': False},
+    ),
+    scenario('tickets.destroy', 'delete', lambda d: reverse('api:tickets-detail', kwargs=_ticket(d)), status=204),
+    scenario(
+        'tickets.create_comment', 'post', lambda d: reverse('api:tickets-create-comment', kwargs=_ticket(d)),
+        data=lambda d: {'text': 'Benchmark comment.'}, status=201,
+    ),
+    scenario(
+        'tickets.get_user_permissions', 'get', lambda d: reverse('api:tickets-get-user-permissions', kwargs=_ticket(d)),
+    ),
+
+    # comments
+    scenario(
+        'comments.list', 'get',
+        lambda d: reverse('api:comments-list', kwargs={**_project(d), 'ticket_slug': d.ticket.slug}),
+    ),
+    scenario(
+        'comments.create', 'post',
+        lambda d: reverse('api:comments-list', kwargs={**_project(d), 'ticket_slug': d.ticket.slug}),
+        data=lambda d: {'text': 'Benchmark comment.'}, status=201,
+    ),
+]
+
+# routes deliberately left out, as (url name, url kwargs, method): reason
+UNBENCHMARKED = {
+    (name, kwargs, method): 'invitations outside a team URL have no team to look up; only my_invitations works there'
+    for name, kwargs, method in [
+        ('invitations-list', (), 'get'), ('invitations-list', (), 'post'), ('invitations-bulk', (), 'post'),
+        ('invitations-detail', ('id',), 'get'), ('invitations-detail', ('id',), 'delete'),
+        ('invitations-resend-email', ('id',), 'get'),
+    ]
+}
@@ -0,0 +1,104 @@
+# stdlib imports
+import time
+
+# core django imports
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+# third party imports
+
+# my internal imports
+
+
+# TEAM CHANGE VERSIONS
+# Every team has a version number in the shared cache that goes up whenever anything under it is written: the team
+# itself, its memberships and invitations, its projects and their memberships, tickets and comments, and the
+# usernames, names and emails its lists show (see `teams_showing_user`). List endpoints expose it as the
+# X-Team-Version header and build their ETags and server-side cache keys from it (see api/conditional.py), so "has
+# anything in this team changed?" costs one cache read instead of a query.
+# Versions only need to be ordered, not dense: like the access versions, a missing one is seeded from the clock, so
+# an evicted version can't come back lower than one a client has already seen.
+
+def _change_version_key(team_id):
+    return f'tracker:changes:team:{team_id}:version'
+
+
+def _project_team_key(project_id):
+    return f'tracker:project-team:{project_id}'
+
+
+def _bump(team_id):
+    key = _change_version_key(team_id)
+    try:
+        cache.incr(key)
+    except ValueError:  # no version yet (or it was evicted)
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_team_change_version(*team_ids):
+    """Bumps each team's version now and again once the transaction commits (see `access.bump_team_access_version`)."""
+    team_ids = {team_id for team_id in team_ids if team_id is not None}
+
+    def bump_all():
+        for team_id in team_ids:
+            _bump(team_id)
+
+    if team_ids:
+        bump_all()
+        transaction.on_commit(bump_all)
+
+
+def team_change_versions(team_ids):
+    """
+    {team_id: version} for the given teams, starting a version for any team that doesn't have one yet.
+    Versions are None if the shared cache is unreachable.
+    """
+    keys = {_change_version_key(team_id): team_id for team_id in team_ids}
+    found = cache.get_many(list(keys))
+    versions = {team_id: found.get(key) for key, team_id in keys.items()}
+    for key, team_id in keys.items():
+        if versions[team_id] is None:
+            cache.add(key, time.time_ns(), None)
+            versions[team_id] = cache.get(key)
+    return versions
+
+
+def team_change_version(team_id):
+    return team_change_versions([team_id])[team_id]
+
+
+def team_id_for_project(project_id):
+    """The team a project belongs to. Projects never change teams, so the answer is cached for good."""
+    from .models import Project
+    if project_id is None:
+        return None
+    team_id = cache.get(_project_team_key(project_id))
+    if team_id is None:
+        team_id = Project.objects.filter(pk=project_id).values_list('team_id', flat=True).first()
+        if team_id is not None:
+            cache.set(_project_team_key(project_id), team_id, None)
+    return team_id
+
+
+def forget_project_team(project_id):
+    cache.delete(_project_team_key(project_id))
+
+
+def teams_showing_user(user_id):
+    """
+    The teams whose lists can show the user's username, name or email: as a member, invitee or inviter, as a
+    project's manager, or on a ticket or comment in one of its projects (which outlive the user's membership).
+    """
+    from .models import TeamMembership, TeamInvitation, Project, Ticket, Comment
+    invitations = TeamInvitation.objects.filter(Q(invitee_id=user_id) | Q(inviter_id=user_id))
+    tickets = Ticket.objects.filter(Q(user_id=user_id) | Q(developer_id=user_id))
+    return set(
+        TeamMembership.objects.filter(user_id=user_id).order_by().values_list('team_id', flat=True)
+        .union(
+            invitations.order_by().values_list('team_id'),
+            Project.objects.filter(manager_id=user_id).order_by().values_list('team_id'),
+            tickets.order_by().values_list('project__team_id'),
+            Comment.objects.filter(user_id=user_id).order_by().values_list('ticket__project__team_id'),
+        )
+    )
@@ -0,0 +1,234 @@
+# stdlib imports
+import math
+import random
+from contextlib import contextmanager
+
+# core django imports
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+
+# third party imports
+
+# my internal imports
+from bugtracking.tracker import search
+from bugtracking.tracker.project_access import sync_project_access
+from bugtracking.tracker.models import Team, TeamMembership, TeamInvitation, Project, ProjectMembership, Ticket, Comment
+from bugtracking.users.models import FirebaseIdentity
+
+User = get_user_model()
+
+PRIORITY_WEIGHTS = {
+    Ticket.Priorities.LOW: 0.55,
+    Ticket.Priorities.HIGH: 0.33,
+    Ticket.Priorities.URGENT: 0.12,
+}
+ADMIN_SHARE = 0.1  # of each team's members, besides its creator
+UNASSIGNED_SHARE = 0.25  # of tickets, which have no developer
+
+ADJECTIVES = ['Blue', 'Quiet', 'Rapid', 'Northern', 'Bright', 'Iron', 'Silver', 'Open', 'Little', 'Grand']
+NOUNS = ['Widgets', 'Labs', 'Works', 'Systems', 'Studio', 'Collective', 'Foundry', 'Digital', 'Partners', 'Garage']
+PRODUCTS = [
+    'Website', 'Mobile app', 'API', 'Billing', 'Dashboard', 'Data pipeline', 'Admin panel', 'Search', 'Onboarding',
+]
+AREAS = [
+    'login form', 'checkout', 'settings page', 'export', 'search results', 'notifications', 'sidebar', 'report',
+    'upload',
+]
+PROBLEMS = [
+    'crashes on submit', 'is slow to load', 'shows the wrong totals', 'ignores the timezone', 'breaks on mobile',
+    'loses unsaved changes', 'returns a 500', 'needs a loading state', 'should support CSV', 'has a typo',
+]
+REMARKS = [
+    'I can reproduce this.', 'Looks like a regression from last week.', 'Fixed on my branch, needs review.',
+    'Can you add steps to reproduce?', 'Same thing happens in Firefox.', 'Bumping the priority on this one.',
+    'Deployed to staging.', 'Not seeing this any more.', 'Related to the caching change.', 'Works for me.',
+]
+
+
+def around(rng, mean, minimum=0):
+    """A count drawn from a log-normal distribution with the given mean: mostly near it, with a long tail above."""
+    if mean <= 0:
+        return minimum
+    sigma = 0.75
+    return max(minimum, round(rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)))
+
+
+@contextmanager
+def preset_slugs(*models_with_slugs):
+    """
+    Keeps the slugs given to new rows. AutoSlugField normally replaces them with one made from the title, checking
+    each candidate against the table (a query per row, failing after 100 clashes); the generated slugs are unique
+    by construction.
+    """
+    fields = [model._meta.get_field('slug') for model in models_with_slugs]
+    for field in fields:
+        field.overwrite_on_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.overwrite_on_add = True
+
+
+def insert(model, objs, batch_size):
+    """
+    Bulk inserts rows and returns their primary keys, in order. Backends that can't hand the new ids back (SQLite)
+    have them read back from the primary key range, which assumes nothing else is writing to the table meanwhile.
+    Goes through a plain QuerySet, so it skips the ticket counters and search indexing in TicketQueryset.bulk_create
+    (and bulk_create skips the signals that keep ProjectAccess up to date); the command brings those up to date once
+    per chunk instead.
+    """
+    if not objs:
+        return []
+    queryset = models.QuerySet(model)
+    if connection.features.can_return_rows_from_bulk_insert:
+        return [obj.pk for obj in queryset.bulk_create(objs, batch_size=batch_size)]
+    last_pk = queryset.aggregate(last=models.Max('pk'))['last'] or 0
+    queryset.bulk_create(objs, batch_size=batch_size)
+    return list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True))
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a synthetic dataset of users, teams, projects, tickets, comments and invitations for load testing "
+        "and benchmarking. The same --seed always produces the same data. Rows are bulk inserted, bypassing the "
+        "per-row signals; the projects' ticket counters, their access rows and the search index are brought up to date "
+        "in bulk. About 1k teams, 100k tickets and 1M comments: --teams 1000 --projects 4 --tickets 25 --comments 10."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=10, help='Teams to create.')
+        parser.add_argument('--members', type=float, default=8, help='Mean team size.')
+        parser.add_argument(
+            '--users', type=int,
+            help='Users the team members are drawn from (default: enough for half to be in two teams).',
+        )
+        parser.add_argument('--projects', type=float, default=4, help='Mean projects per team.')
+        parser.add_argument('--tickets', type=float, default=25, help='Mean tickets per project.')
+        parser.add_argument('--comments', type=float, default=4, help='Mean comments per ticket.')
+        parser.add_argument('--open-ratio', type=float, default=0.3, help='Share of tickets left open.')
+        parser.add_argument('--invitations', type=float, default=2, help='Mean pending invitations per team.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic', help='Prefix of every generated username and slug.')
+        parser.add_argument('--password', help='Password for every generated user (default: unusable).')
+        parser.add_argument('--chunk', type=int, default=50, help='Teams generated per transaction.')
+        parser.add_argument('--batch-size', type=int, default=settings.BULK_INSERT_BATCH_SIZE, help='Rows per INSERT.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        exists = (
+            User.objects.filter(username__startswith=f'{prefix}-').exists()
+            or Team.objects.filter(slug__startswith=f'{prefix}-').exists()
+        )
+        if exists:
+            raise CommandError(f'A dataset with the prefix "{prefix}" already exists; choose another --prefix.')
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        self.batch_size = options['batch_size']
+
+        user_count = options['users'] or max(
+            round(options['teams'] * options['members'] / 2), math.ceil(options['members'])
+        )
+        self.user_ids = self.create_users(user_count)
+        totals = {'teams': 0, 'projects': 0, 'tickets': 0, 'comments': 0}
+        for start in range(0, options['teams'], options['chunk']):
+            with transaction.atomic(), preset_slugs(Team, Project, Ticket):
+                created = self.create_teams(range(start, min(start + options['chunk'], options['teams'])))
+            for key, value in created.items():
+                totals[key] += value
+            self.stdout.write(
+                f'{totals["teams"]}/{options["teams"]} teams, {totals["tickets"]} tickets, '
+                f'{totals["comments"]} comments'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {user_count} users, {totals["teams"]} teams, {totals["projects"]} projects, '
+            f'{totals["tickets"]} tickets and {totals["comments"]} comments.'
+        ))
+
+    def create_users(self, count):
+        prefix = self.options['prefix']
+        password = make_password(self.options['password'])  # hashed once: hashing per user would dominate the run
+        with transaction.atomic():
+            user_ids = insert(User, [
+                User(
+                    username=f'{prefix}-user-{i}', email=f'{prefix}-user-{i}@example.com', name=f'Synthetic User {i}',
+                    password=password,
+                )
+                for i in range(count)
+            ], self.batch_size)
+            # so tokens from the local issuer (`manage.py issue_local_token <username>`) sign straight in as these users
+            insert(FirebaseIdentity, [
+                FirebaseIdentity(uid=f'{prefix}-user-{i}', user_id=user_id) for i, user_id in enumerate(user_ids)
+            ], self.batch_size)
+        return user_ids
+
+    def create_teams(self, numbers):
+        rng, options, prefix = self.rng, self.options, self.options['prefix']
+        numbers = list(numbers)
+        team_ids = insert(Team, [
+            Team(
+                title=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {n}', slug=f'{prefix}-team-{n}',
+                description='Synthetic team.',
+            )
+            for n in numbers
+        ], self.batch_size)
+
+        team_memberships, invitations, projects, project_members = [], [], [], []
+        for n, team_id in zip(numbers, team_ids):
+            members = rng.sample(self.user_ids, min(around(rng, options['members'], minimum=1), len(self.user_ids)))
+            for i, user_id in enumerate(members):
+                admin = i == 0 or rng.random() < ADMIN_SHARE
+                role = TeamMembership.Roles.ADMIN if admin else TeamMembership.Roles.MEMBER
+                team_memberships.append(TeamMembership(team_id=team_id, user_id=user_id, role=role))
+            for i in range(around(rng, options['invitations'])):
+                invitations.append(TeamInvitation(
+                    team_id=team_id, inviter_id=members[0], invitee_email=f'{prefix}-invitee-{n}-{i}@example.com',
+                    message_text='',
+                ))
+            for p in range(around(rng, options['projects'])):
+                # most of a team works on each of its projects; the first member picked manages it
+                in_project = rng.sample(members, max(1, round(len(members) * rng.uniform(0.3, 1.0))))
+                projects.append(Project(
+                    team_id=team_id, title=f'{rng.choice(PRODUCTS)} {p}', slug=f'{prefix}-{n}-{p}',
+                    description='Synthetic project.', manager_id=in_project[0],
+                ))
+                project_members.append(in_project)
+        insert(TeamMembership, team_memberships, self.batch_size)
+        insert(TeamInvitation, invitations, self.batch_size)
+        project_ids = insert(Project, projects, self.batch_size)
+
+        memberships, tickets, ticket_members = [], [], []
+        priorities, weights = list(PRIORITY_WEIGHTS), list(PRIORITY_WEIGHTS.values())
+        for project_id, project, members in zip(project_ids, projects, project_members):
+            for i, user_id in enumerate(members):
+                role = ProjectMembership.Roles.MANAGER if i == 0 else ProjectMembership.Roles.DEVELOPER
+                memberships.append(ProjectMembership(project_id=project_id, user_id=user_id, role=role))
+            for t in range(around(rng, options['tickets'])):
+                tickets.append(Ticket(
+                    project_id=project_id, user_id=rng.choice(members),
+                    developer_id=None if rng.random() < UNASSIGNED_SHARE else rng.choice(members),
+                    title=f'{rng.choice(AREAS).capitalize()} {rng.choice(PROBLEMS)}',
+                    slug=f'{project.slug}-{t}', description=' '.join(rng.choices(REMARKS, k=rng.randint(1, 4))),
+                    priority=rng.choices(priorities, weights)[0], is_open=rng.random() < options['open_ratio'],
+                ))
+                ticket_members.append(members)
+        insert(ProjectMembership, memberships, self.batch_size)
+        ticket_ids = insert(Ticket, tickets, self.batch_size)
+
+        comments = [
+            Comment(ticket_id=ticket_id, user_id=rng.choice(members), text=rng.choice(REMARKS))
+            for ticket_id, members in zip(ticket_ids, ticket_members)
+            for _ in range(around(rng, options['comments']))
+        ]
+        insert(Comment, comments, self.batch_size)
+
+        Project.objects.filter(pk__in=project_ids).refresh_ticket_counts()
+        sync_project_access(Project.objects.filter(pk__in=project_ids))
+        for start in range(0, len(ticket_ids), self.batch_size):
+            search.index_tickets(ticket_ids[start:start + self.batch_size])
+        return {
+            'teams': len(team_ids), 'projects': len(project_ids), 'tickets': len(ticket_ids), 'comments': len(comments),
+        }
@@ -0,0 +1,96 @@
+# stdlib imports
+import json
+
+# core django imports
+from django.core.management.base import BaseCommand, CommandError
+
+# third party imports
+
+# my internal imports
+from bugtracking.tracker.benchmarks import loadtest
+from bugtracking.users.firebase import LocalTokenIssuer
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a mix of realistic scenarios (browse a team, list tickets, open a ticket, comment, triage) against a "
+        "running server with many concurrent virtual users, and reports throughput, latency percentiles and error "
+        "rates per route. Users sign in with tokens from the local Firebase stand-in: start the server with "
+        "FIREBASE_TOKEN_VERIFICATION=local, FIREBASE_USER_RECORDS_FROM_TOKEN=True, FIREBASE_PROJECT_ID set and "
+        "FIREBASE_PUBLIC_KEYS_URL=file://<the --certificates file>. The users and objects come from a dataset made by "
+        "`manage.py generate_dataset`, in the same database as the server's."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users.')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds measured.')
+        parser.add_argument('--warmup', type=float, default=10, help='Seconds run before measuring starts.')
+        parser.add_argument('--ramp-up', type=float, default=5, help='Seconds over which the virtual users start.')
+        parser.add_argument(
+            '--think-time', type=float, default=0, help='Mean seconds a virtual user waits between scenarios.',
+        )
+        parser.add_argument(
+            '--mix', default=','.join(f'{name}={weight}' for name, weight in loadtest.DEFAULT_MIX.items()),
+            help='Scenario weights, e.g. "list_tickets=5,comment=1"; scenarios left out are not run.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic', help='The --prefix the dataset was generated with.')
+        parser.add_argument('--key', default='local_token_issuer.pem', help='Signing key; created if missing.')
+        parser.add_argument(
+            '--certificates', default='local_token_issuer.json', help='Where to write the public certificate.',
+        )
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='Show the change from the results in this JSON file.')
+
+    def parse_mix(self, value):
+        mix = {}
+        for part in value.split(','):
+            name, _sep, weight = part.partition('=')
+            if name.strip() not in loadtest.SCENARIOS:
+                raise CommandError(f'Unknown scenario "{name.strip()}"; choose from {", ".join(loadtest.SCENARIOS)}.')
+            try:
+                mix[name.strip()] = float(weight)
+            except ValueError:
+                raise CommandError(f'Scenario weights must be numbers, not "{weight}".')
+        return mix
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)['summary']
+        try:
+            plans = loadtest.make_plans(options['prefix'], options['users'], options['seed'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        issuer = LocalTokenIssuer.from_key_file(options['key'])
+        issuer.write_certificates(options['certificates'])
+
+        self.stdout.write(
+            f'{options["users"]} virtual users against {options["base_url"]}: '
+            f'{options["warmup"]}s warm-up, then {options["duration"]}s measured.'
+        )
+        samples = loadtest.run(
+            options['base_url'], plans, issuer, options['seed'], mix, options['duration'],
+            warmup=options['warmup'], ramp_up=options['ramp_up'], think_time=options['think_time'],
+        )
+        if not samples:
+            raise CommandError('No requests completed in the measured period.')
+        summary = loadtest.summarize(samples, options['duration'])
+        self.stdout.write(loadtest.format_report(summary, baseline))
+
+        if options['output']:
+            settings_used = {
+                name: options[name]
+                for name in ('base_url', 'users', 'duration', 'warmup', 'ramp_up', 'think_time', 'seed', 'prefix')
+            }
+            with open(options['output'], 'w') as f:
+                json.dump({'options': {**settings_used, 'mix': mix}, 'summary': summary}, f, indent=2, sort_keys=True)
+                f.write('\n')
+        errors = summary['total']['error_rate']
+        style = self.style.SUCCESS if not errors else self.style.WARNING
+        self.stdout.write(style(
+            f'{summary["total"]["requests"]} requests, {summary["total"]["rps"]}/s, {errors:.2%} errors.'
+        ))
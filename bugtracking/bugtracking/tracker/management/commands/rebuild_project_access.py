@@ -0,0 +1,54 @@
+# stdlib imports
+from collections import Counter
+
+# core django imports
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+# third party imports
+
+# my internal imports
+from bugtracking.tracker.access import bump_team_access_version
+from bugtracking.tracker.models import Project
+from bugtracking.tracker.project_access import sync_project_access
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes every project's ProjectAccess rows from the team and project memberships and repairs any that "
+        "differ. Run it to backfill after bulk loads that bypass the signals, or with --dry-run as a consistency check."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Projects checked per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Report the differences without repairing them.')
+
+    def handle(self, *args, **options):
+        totals = Counter()
+        checked = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                projects = Project.objects.filter(pk__gt=last_pk).order_by('pk')
+                batch = list(projects.values_list('pk', 'team_id')[:options['batch_size']])
+                if not batch:
+                    break
+                results = sync_project_access(
+                    Project.objects.filter(pk__gt=last_pk, pk__lte=batch[-1][0]), dry_run=options['dry_run'],
+                )
+                if sum(results.values()) and not options['dry_run']:
+                    for team_id in {team_id for _pk, team_id in batch}:
+                        bump_team_access_version(team_id)
+            if sum(results.values()):
+                self.stdout.write(
+                    f'Projects {batch[0][0]}-{batch[-1][0]}: {results["added"]} rows missing, '
+                    f'{results["changed"]} wrong, {results["removed"]} extra'
+                )
+            totals.update(results)
+            checked += len(batch)
+            last_pk = batch[-1][0]
+        verb = 'would be repaired' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} projects; {totals["added"]} missing, {totals["changed"]} wrong and '
+            f'{totals["removed"]} extra access rows {verb}.'
+        ))
@@ -0,0 +1,39 @@
+# stdlib imports
+
+# core django imports
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+# third party imports
+
+# my internal imports
+from bugtracking.tracker import search
+from bugtracking.tracker.models import Ticket
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the ticket search index (the tsvector column on Postgres, the FTS5 table on SQLite) from the tickets "
+        "and their comments. Only needed after writes that bypass the models, e.g. raw SQL or a restored dump."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tickets indexed per transaction.')
+
+    def handle(self, *args, **options):
+        if search.backend() is None:
+            self.stdout.write('No full-text index on this database; search uses substring matching.')
+            return
+        search.clear_index()
+        indexed = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                tickets = Ticket.objects.filter(pk__gt=last_pk).order_by('pk')
+                batch = list(tickets.values_list('pk', flat=True)[:options['batch_size']])
+                if not batch:
+                    break
+                search.index_tickets(batch)
+            indexed += len(batch)
+            last_pk = batch[-1]
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} tickets.'))
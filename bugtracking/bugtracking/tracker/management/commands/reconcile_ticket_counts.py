@@ -0,0 +1,56 @@
+# stdlib imports
+
+# core django imports
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+# third party imports
+
+# my internal imports
+from bugtracking.tracker.models import Project
+
+
+class Command(BaseCommand):
+    help = "Recounts every project's open/closed tickets and repairs any drift in the maintained counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Projects checked per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted projects without repairing them.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = repaired = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                # walk the projects table in primary key order so each batch is a range scan and locks are short-lived
+                batch = list(
+                    Project.objects.filter(pk__gt=last_pk).order_by('pk')
+                    .annotate(
+                        actual_open=Count('tickets', filter=Q(tickets__is_open=True)),
+                        actual_closed=Count('tickets', filter=Q(tickets__is_open=False)),
+                    )
+                    .only('pk', 'open_tickets_count', 'closed_tickets_count')[:batch_size]
+                )
+                if not batch:
+                    break
+                drifted = [
+                    project for project in batch
+                    if (project.open_tickets_count, project.closed_tickets_count)
+                    != (project.actual_open, project.actual_closed)
+                ]
+                for project in drifted:
+                    self.stdout.write(
+                        f'Project {project.pk}: open {project.open_tickets_count} -> {project.actual_open}, '
+                        f'closed {project.closed_tickets_count} -> {project.actual_closed}'
+                    )
+                if drifted and not options['dry_run']:
+                    # recounted in the UPDATE itself rather than written back from the counts read above, so tickets
+                    # opened or closed in between aren't overwritten with stale numbers
+                    Project.objects.filter(pk__in=[project.pk for project in drifted]).refresh_ticket_counts()
+            checked += len(batch)
+            repaired += len(drifted)
+            last_pk = batch[-1].pk
+        verb = 'would be repaired' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} projects; {repaired} {verb}.'))
@@ -0,0 +1,104 @@
+# stdlib imports
+import datetime as dt
+import time
+
+# core django imports
+from django.conf import settings
+from django.core import mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+# third party imports
+
+# my internal imports
+from bugtracking.utils import metrics
+from bugtracking.tracker.models import OutgoingEmail
+
+
+def backoff(attempts):
+    """Seconds to wait before the next try after `attempts` failures: base, 2x base, 4x base... up to the cap."""
+    return min(settings.EMAIL_OUTBOX_RETRY_BASE * 2 ** (attempts - 1), settings.EMAIL_OUTBOX_RETRY_MAX)
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends the emails queued in the outbox, in batches over one mail connection. Failed sends are retried with "
+        "exponential backoff and marked dead after EMAIL_OUTBOX_MAX_ATTEMPTS. Runs until stopped unless --once is "
+        "given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Emails claimed and sent per batch.')
+        parser.add_argument('--poll-interval', type=float, default=5, help='Seconds to wait when nothing is due.')
+        parser.add_argument('--once', action='store_true', help='Send everything that is due, then exit.')
+        parser.add_argument(
+            '--requeue-dead', action='store_true', help='Give dead emails a fresh set of attempts first.',
+        )
+
+    def claim(self, batch_size):
+        """
+        Claims up to `batch_size` due emails by pushing their next attempt past the lease period, so other workers
+        skip them while they're being sent and they come back on their own if this worker dies mid-batch.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            batch = list(
+                OutgoingEmail.objects.select_for_update(skip_locked=True)
+                .filter(status=OutgoingEmail.Status.PENDING, next_attempt_at__lte=now)
+                .order_by('next_attempt_at')[:batch_size]
+            )
+            if batch:
+                leased_until = now + dt.timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+                OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(next_attempt_at=leased_until)
+        return batch
+
+    def send_batch(self, batch, connection):
+        sent, failed = [], []
+        for email in batch:
+            try:
+                email.as_message(connection=connection).send()
+            except Exception as exc:  # whatever the backend raises, the email goes back in the queue
+                email.attempts += 1
+                email.last_error = f'{exc.__class__.__name__}: {exc}'
+                if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    email.status = OutgoingEmail.Status.DEAD
+                else:
+                    email.next_attempt_at = timezone.now() + dt.timedelta(seconds=backoff(email.attempts))
+                failed.append(email)
+            else:
+                email.attempts += 1
+                email.status = OutgoingEmail.Status.SENT
+                email.sent_at = timezone.now()
+                sent.append(email)
+        OutgoingEmail.objects.bulk_update(sent, ['status', 'attempts', 'sent_at'])
+        OutgoingEmail.objects.bulk_update(failed, ['status', 'attempts', 'last_error', 'next_attempt_at'])
+        dead = sum(1 for email in failed if email.status == OutgoingEmail.Status.DEAD)
+        metrics.count_emails('sent', len(sent))
+        metrics.count_emails('failed', len(failed) - dead)
+        metrics.count_emails('dead', dead)
+        return len(sent), len(failed)
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            requeued = OutgoingEmail.objects.filter(status=OutgoingEmail.Status.DEAD).update(
+                status=OutgoingEmail.Status.PENDING, attempts=0, next_attempt_at=timezone.now()
+            )
+            self.stdout.write(f'Requeued {requeued} dead emails.')
+        total_sent = total_failed = 0
+        # one connection for the life of the worker; the backend reconnects itself if it has to
+        connection = mail.get_connection(settings.EMAIL_OUTBOX_BACKEND or settings.EMAIL_BACKEND)
+        connection.open()
+        try:
+            while True:
+                batch = self.claim(options['batch_size'])
+                if batch:
+                    sent, failed = self.send_batch(batch, connection)
+                    total_sent, total_failed = total_sent + sent, total_failed + failed
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        finally:
+            connection.close()
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} emails; {total_failed} failed.'))
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.11 on 2026-10-16 20:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0007_creating_superuser'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['project', 'created', 'id'], name='ticket_project_created_idx'),
+        ),
+    ]
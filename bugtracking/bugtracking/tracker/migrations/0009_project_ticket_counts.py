@@ -0,0 +1,37 @@
+# Generated by Django 3.0.11 on 2026-10-16 20:19
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_ticket_counts(apps, schema_editor):
+    Project = apps.get_model('tracker', 'Project')
+    projects = Project.objects.annotate(
+        open_count=Count('tickets', filter=Q(tickets__is_open=True)),
+        closed_count=Count('tickets', filter=Q(tickets__is_open=False)),
+    )
+    for project in projects.iterator():
+        project.open_tickets_count = project.open_count
+        project.closed_tickets_count = project.closed_count
+        project.save(update_fields=['open_tickets_count', 'closed_tickets_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_ticket_project_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='closed_tickets_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='open_tickets_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_ticket_counts, migrations.RunPython.noop),
+    ]
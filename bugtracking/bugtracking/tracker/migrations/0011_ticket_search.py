@@ -0,0 +1,66 @@
+# Generated by Django 3.0.11 on 2026-10-16 20:37
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import OperationalError, migrations
+
+
+POSTGRES_BACKFILL = '''
+UPDATE tracker_ticket t SET search_vector =
+    setweight(to_tsvector(%(config)s, t.title), 'A')
+    || setweight(to_tsvector(%(config)s, COALESCE(t.description, '')), 'B')
+    || setweight(to_tsvector(%(config)s, COALESCE(t.resolution, '')), 'C')
+    || setweight(to_tsvector(%(config)s, COALESCE(
+        (SELECT string_agg(c.text, ' ') FROM tracker_comment c WHERE c.ticket_id = t.id), ''
+    )), 'D')
+'''
+
+SQLITE_BACKFILL = '''
+INSERT INTO tracker_ticket_fts (rowid, title, description, resolution, comments)
+SELECT t.id, t.title, COALESCE(t.description, ''), COALESCE(t.resolution, ''),
+       COALESCE((SELECT group_concat(c.text, ' ') FROM tracker_comment c WHERE c.ticket_id = t.id), '')
+FROM tracker_ticket t
+'''
+
+
+def create_search_index(apps, schema_editor):
+    """A GIN index over the tsvector on Postgres; an FTS5 table on SQLite, when the SQLite build has FTS5."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('CREATE INDEX ticket_search_vector_idx ON tracker_ticket USING gin (search_vector)')
+            cursor.execute(POSTGRES_BACKFILL, {'config': settings.TICKET_SEARCH_CONFIG})
+        elif connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    'CREATE VIRTUAL TABLE tracker_ticket_fts USING fts5('
+                    "title, description, resolution, comments, tokenize = 'porter unicode61')"
+                )
+            except OperationalError:  # no FTS5 in this build: search falls back to substring matching
+                return
+            cursor.execute(SQLITE_BACKFILL)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS ticket_search_vector_idx')
+        elif connection.vendor == 'sqlite':
+            cursor.execute('DROP TABLE IF EXISTS tracker_ticket_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0010_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
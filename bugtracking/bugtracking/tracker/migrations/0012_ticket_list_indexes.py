@@ -0,0 +1,25 @@
+# Generated by Django 3.0.11 on 2026-10-16 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0011_ticket_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['project', 'is_open', 'priority', 'created'], name='ticket_open_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['developer', 'is_open', 'priority', 'created'], name='ticket_developer_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['project', 'modified'], name='ticket_project_modified_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.0.11 on 2026-10-16 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0012_ticket_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['team', 'slug'], name='project_team_slug_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['project', 'slug'], name='ticket_project_slug_idx'),
+        ),
+    ]
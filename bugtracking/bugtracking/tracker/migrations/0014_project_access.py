@@ -0,0 +1,67 @@
+# Generated by Django 3.0.11 on 2026-10-16 23:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# ProjectAccess.MEMBER, VIEW, MANAGE and ADMINISTER, and TeamMembership.Roles.ADMIN, as of this migration
+MEMBER, VIEW, MANAGE, ADMINISTER = 1, 2, 4, 8
+TEAM_ADMIN = 2
+
+
+def populate_project_access(apps, schema_editor):
+    """The same rows as project_access.expected_capabilities, for every project."""
+    Project = apps.get_model('tracker', 'Project')
+    TeamMembership = apps.get_model('tracker', 'TeamMembership')
+    ProjectMembership = apps.get_model('tracker', 'ProjectMembership')
+    ProjectAccess = apps.get_model('tracker', 'ProjectAccess')
+    admins = {}
+    for team_id, user_id in TeamMembership.objects.filter(role=TEAM_ADMIN).values_list('team_id', 'user_id'):
+        admins.setdefault(team_id, []).append(user_id)
+    members = {}
+    for project_id, user_id in ProjectMembership.objects.values_list('project_id', 'user_id'):
+        members.setdefault(project_id, []).append(user_id)
+    rows = []
+    for project_id, team_id, manager_id in Project.objects.values_list('pk', 'team_id', 'manager_id').iterator():
+        capabilities = {}
+        for user_id in admins.get(team_id, []):
+            capabilities[user_id] = capabilities.get(user_id, 0) | VIEW | MANAGE | ADMINISTER
+        for user_id in members.get(project_id, []):
+            capabilities[user_id] = capabilities.get(user_id, 0) | MEMBER | VIEW
+        if manager_id is not None:
+            capabilities[manager_id] = capabilities.get(manager_id, 0) | MANAGE
+        rows.extend(
+            ProjectAccess(user_id=user_id, project_id=project_id, team_id=team_id, capabilities=value)
+            for user_id, value in capabilities.items()
+        )
+    ProjectAccess.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracker', '0013_nested_route_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectAccess',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('capabilities', models.PositiveSmallIntegerField()),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access', to='tracker.Project')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracker.Team')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_access', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='projectaccess',
+            index=models.Index(fields=['user', 'team'], name='project_access_user_team_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='projectaccess',
+            unique_together={('user', 'project')},
+        ),
+        migrations.RunPython(populate_project_access, migrations.RunPython.noop),
+    ]
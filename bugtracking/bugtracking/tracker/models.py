@@ -1,8 +1,10 @@
 # stdlib imports
 import uuid
+from collections import Counter
 
 # core django imports
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, Lower
 from django.conf import settings
 from django.core import mail
 from django.template.loader import render_to_string
@@ -10,14 +12,21 @@ from django.utils.html import strip_tags
 from django.contrib.auth import get_user_model
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.exceptions import ValidationError, ObjectDoesNotExist, PermissionDenied
+from django.core.validators import EmailValidator
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
+from django.contrib.postgres.search import SearchVectorField
 
 # third party imports
 from django_extensions.db.models import TitleSlugDescriptionModel, TimeStampedModel
 from django_extensions.db.fields import CreationDateTimeField
 
 # my internal imports
+from .access import get_access, batched_access_changes, access_changes_batched
+from .changes import bump_team_change_version, team_id_for_project
+from .search import index_tickets, unindexed_tickets, unindex_tickets, queue_comment_index
+from .project_access import sync_project_access, sync_team_access
 
 
 User = settings.AUTH_USER_MODEL
@@ -31,8 +40,7 @@ class TeamManager(models.Manager):
             if not isinstance(creator, get_user_model()):
                 raise ValidationError(_('Creator argument must be a User object. If you wish to pass a username string, use the create_new_by_username() method instead.'))
             team = super().create(*args, **kwargs)
-            membership = TeamMembership.objects.create(user=creator, team=team, role=TeamMembership.Roles.ADMIN)
-            membership.save()
+            TeamMembership.objects.create(user=creator, team=team, role=TeamMembership.Roles.ADMIN)
             return team
         else:
             raise ValidationError(_("The create_new() method must be passed a `creator`=User kwarg to assign an initial administrator."))
@@ -47,8 +55,7 @@ class TeamManager(models.Manager):
             except ObjectDoesNotExist:
                 raise ObjectDoesNotExist(_("User by that username does not exist."))
             team = super().create(*args, **kwargs)
-            membership = TeamMembership.objects.create(user=creator, team=team, role=TeamMembership.Roles.ADMIN)
-            membership.save()
+            TeamMembership.objects.create(user=creator, team=team, role=TeamMembership.Roles.ADMIN)
             return team
         else:
             raise ValidationError(_("The create_new_by_username() method must be passed a `creator`=User kwarg to assign an initial administrator."))
@@ -69,6 +76,73 @@ class TeamInvitationManager(models.Manager):
         else:
             raise ValidationError(_("You must pass in a team and inviter parameter."))
 
+    def bulk_invite(self, team, inviter, emails):
+        """
+        Invites every address in `emails` to the team and queues their emails, skipping anyone who is already a
+        member or already invited. Members and existing invitations are found with one query each, the invitations
+        and their emails are inserted in bulk, and the email template is rendered once for the whole batch.
+        Returns a list of {'email', 'status'} in the order given, where status is one of
+        'invited', 'already_member', 'already_invited', 'duplicate' or 'invalid'.
+        """
+        validate = EmailValidator()
+        results = []
+        candidates = []
+        seen = set()
+        for email in emails:
+            email = email.strip()
+            try:
+                validate(email)
+            except ValidationError:
+                results.append({'email': email, 'status': 'invalid'})
+                continue
+            if email.lower() in seen:
+                results.append({'email': email, 'status': 'duplicate'})
+                continue
+            seen.add(email.lower())
+            results.append({'email': email, 'status': None})
+            candidates.append(email)
+        # addresses are compared case-insensitively, as the duplicate check above does
+        lowered = [email.lower() for email in candidates]
+        members = set(
+            team.members.annotate(email_lower=Lower('email')).filter(email_lower__in=lowered)
+            .values_list('email_lower', flat=True)
+        )
+        invited = set(
+            self.filter(team=team).annotate(email_lower=Lower('invitee_email')).filter(email_lower__in=lowered)
+            .values_list('email_lower', flat=True)
+        )
+        invitations = []
+        for result in results:
+            if result['status'] is not None:
+                continue
+            if result['email'].lower() in members:
+                result['status'] = 'already_member'
+            elif result['email'].lower() in invited:
+                result['status'] = 'already_invited'
+            else:
+                result['status'] = 'invited'
+                invitations.append(TeamInvitation(team=team, inviter=inviter, invitee_email=result['email'], message_text=''))
+        if invitations:
+            rendered = TeamInvitation.render_invitation_email(team, inviter)
+            self.bulk_create(invitations, batch_size=settings.BULK_INSERT_BATCH_SIZE)
+            bump_team_change_version(team.pk)
+            OutgoingEmail.objects.bulk_create(
+                [invitation.invitation_email(rendered) for invitation in invitations], batch_size=settings.BULK_INSERT_BATCH_SIZE
+            )
+        return results
+
+
+class OutgoingEmailManager(models.Manager):
+    def queue(self, subject, message, recipient, html_message='', from_email=None):
+        """
+        Adds an email to the outbox, in the caller's transaction; `manage.py send_queued_email` does the sending.
+        If the transaction rolls back, the email is never sent.
+        """
+        return self.create(
+            subject=subject, body=message, html_body=html_message or '', recipient=recipient,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        )
+
 
 class ProjectManager(models.Manager):
     def create_new(self, *args, **kwargs):
@@ -77,8 +151,7 @@ class ProjectManager(models.Manager):
             if not isinstance(manager, get_user_model()):
                 raise ValidationError(_('Manager argument must be a User object.'))
             project = super().create(*args, **kwargs)
-            membership = ProjectMembership.objects.create(user=manager, project=project, role=ProjectMembership.Roles.MANAGER)
-            membership.save()
+            ProjectMembership.objects.create(user=manager, project=project, role=ProjectMembership.Roles.MANAGER)
             return project
         return super().create(*args, **kwargs)
 
@@ -101,9 +174,9 @@ class TicketManager(models.Manager):
             if not isinstance(developer, get_user_model()):
                 raise ValidationError(_('Developer argument must be a User object.'))
             # only project managers or team admins may assign a developer
-            if user not in project.team.get_admins() and user != project.manager:
+            if not project.can_user_assign_developer(user):
                 raise PermissionDenied(_('Only project managers or team admins may assign a developer.'))
-            if developer not in project.members.all():
+            if not project.memberships.filter(user=developer).exists():
                 raise ValidationError(_('Only project members may be assigned as a ticket\'s developer.'))
         return super().create(*args, **kwargs)
 
@@ -123,31 +196,139 @@ class CommentManager(models.Manager):
 
 # CUSTOM QUERYSETS
 
+# The visibility filters below come back with each row at most once in a single statement, with no DISTINCT (a sort
+# or hash over every selected column, descriptions included): teams through an IN subquery on the user's memberships,
+# projects and tickets through a join on ProjectAccess, which has at most one row per user and project.
+
 class TeamQueryset(models.QuerySet):
+    def with_membership(self, user, **conditions):
+        """The teams `user` has a membership matching `conditions` in."""
+        # uncorrelated, so the user's memberships are read once through their index, not probed once per team
+        memberships = TeamMembership.objects.filter(user=user, **conditions).values('team_id')
+        return self.filter(pk__in=memberships)
+
     def users_admin_teams(self, user):
-        return self.filter(memberships__role=TeamMembership.Roles.ADMIN, memberships__user=user).distinct()
+        return self.with_membership(user, role=TeamMembership.Roles.ADMIN)
 
     def users_member_teams(self, user):
-        return self.filter(memberships__role=TeamMembership.Roles.MEMBER, memberships__user=user).distinct()
+        return self.with_membership(user, role=TeamMembership.Roles.MEMBER)
 
     def all_users_teams(self, user):
-        return self.filter(memberships__user=user).distinct()
+        return self.with_membership(user)
+
+    def with_admins(self):
+        """Prefetches each team's admin memberships, with their users, into `admin_memberships` for `Team.admins`."""
+        admins = TeamMembership.objects.filter(role=TeamMembership.Roles.ADMIN).select_related('user')
+        return self.prefetch_related(models.Prefetch('memberships', queryset=admins, to_attr='admin_memberships'))
 
 
 class ProjectQueryset(models.QuerySet):
     def filter_for_team_and_user(self, team_slug, user):
-        team = Team.objects.get(slug=team_slug)
-        if user in team.get_admins():
-            return self.filter(team__slug=team_slug).distinct()
-        return self.filter(members=user, team__slug=team_slug).distinct()
+        """The team's projects `user` can see: all of them for its admins, the ones they're members of for anyone else."""
+        return self.filter(
+            team__slug=team_slug, access__user=user, access__capabilities__in=ProjectAccess.masks_with(ProjectAccess.VIEW),
+        )
+
+    def adjust_ticket_counts(self, open_delta=0, closed_delta=0):
+        """Shifts the maintained open/closed ticket counters in place, without reading them first."""
+        return self.update(
+            open_tickets_count=models.F('open_tickets_count') + open_delta,
+            closed_tickets_count=models.F('closed_tickets_count') + closed_delta,
+        )
+
+    def refresh_ticket_counts(self):
+        """Recomputes the open/closed ticket counters from the tickets table, in a single UPDATE."""
+        def count(is_open):
+            tickets = Ticket.objects.filter(project=models.OuterRef('pk'), is_open=is_open).order_by()
+            return Coalesce(models.Subquery(tickets.values('project').annotate(count=models.Count('pk')).values('count')), 0)
+        return self.update(open_tickets_count=count(True), closed_tickets_count=count(False))
 
 
 class TicketQueryset(models.QuerySet):
     def filter_for_team_and_user(self, team_slug, user):
-        team = Team.objects.get(slug=team_slug)
-        if user in team.get_admins():
-            return self.filter(project__team__slug=team_slug).distinct()
-        return self.filter(project__members=user, project__team__slug=team_slug).distinct()
+        """The tickets in the projects filter_for_team_and_user gives for `user`."""
+        return self.filter(
+            project__team__slug=team_slug, project__access__user=user,
+            project__access__capabilities__in=ProjectAccess.masks_with(ProjectAccess.VIEW),
+        )
+
+    def update(self, **kwargs):
+        """
+        Keeps the projects' open/closed ticket counters in step when tickets are closed, reopened or moved in bulk,
+        the search index in step when their text changes, and bumps their teams' change versions.
+        """
+        if kwargs.keys() <= {'search_vector'}:  # the search index's own writes
+            return super().update(**kwargs)
+        recount = {'is_open', 'project', 'project_id'} & kwargs.keys()
+        reindex = set(Ticket.SEARCH_FIELDS) & kwargs.keys()
+        with transaction.atomic():
+            project_ids = set(self.values_list('project_id', flat=True))
+            if reindex:
+                ticket_ids = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            new_project = kwargs.get('project', kwargs.get('project_id'))
+            if new_project is not None:
+                project_ids.add(getattr(new_project, 'pk', new_project))
+            if recount:
+                Project.objects.filter(pk__in=project_ids).refresh_ticket_counts()
+            if reindex:
+                index_tickets(ticket_ids)
+            if not access_changes_batched():
+                bump_team_change_version(*(team_id_for_project(project_id) for project_id in project_ids))
+        return rows
+
+    def delete(self):
+        """
+        Deletes the tickets, then recounts their projects' open/closed counters, drops them from the search index and
+        bumps their teams' change versions, a statement each rather than a signal per ticket.
+        """
+        with transaction.atomic(savepoint=False):
+            project_ids = set(self.order_by().values_list('project_id', flat=True).distinct())
+            unindex_tickets(self.values('pk'))
+            deleted = super().delete()
+            tickets_removed(project_ids)
+        return deleted
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic():
+            tickets = super().bulk_create(objs, *args, **kwargs)
+            count_ticket_changes(added=tickets)
+            bump_team_change_version(*{team_id_for_project(ticket.project_id) for ticket in tickets})
+            if all(ticket.pk is not None for ticket in tickets):
+                index_tickets([ticket.pk for ticket in tickets])
+            else:
+                # the backend didn't hand the new ids back (SQLite), so index whatever in their projects isn't yet
+                project_ids = {ticket.project_id for ticket in tickets}
+                index_tickets(unindexed_tickets(Ticket.objects.filter(project_id__in=project_ids)).values_list('pk', flat=True))
+        return tickets
+
+    def with_comment_summary(self, recent=None):
+        """
+        Annotates each ticket with `comment_count` and `comments_modified` (when its comments last changed) and
+        prefetches only its `recent` newest comments (with their users) into `recent_comments`, instead of loading
+        every ticket's whole comment history.
+        """
+        recent = settings.TICKET_RECENT_COMMENTS if recent is None else recent
+        newest_ids = Comment.objects.filter(ticket_id=models.OuterRef('ticket_id')).order_by('-created').values('pk')[:recent]
+        recent_comments = Comment.objects.filter(pk__in=models.Subquery(newest_ids)).select_related('user')
+        # correlated subqueries rather than aggregates over a join, which would GROUP BY every ticket column
+        comments = Comment.objects.filter(ticket=models.OuterRef('pk')).order_by().values('ticket')
+        return self.annotate(
+            comment_count=Coalesce(models.Subquery(comments.annotate(count=models.Count('pk')).values('count')), 0),
+            comments_modified=models.Subquery(comments.annotate(latest=models.Max('modified')).values('latest')),
+        ).prefetch_related(
+            models.Prefetch('comments', queryset=recent_comments, to_attr='recent_comments')
+        )
+
+
+class CommentQueryset(models.QuerySet):
+    def delete(self):
+        """Deletes the comments, then queues their tickets for reindexing and bumps their teams' change versions."""
+        with transaction.atomic(savepoint=False):
+            ticket_ids = set(self.order_by().values_list('ticket_id', flat=True).distinct())
+            deleted = super().delete()
+            comments_removed(ticket_ids)
+        return deleted
 
 
 # TEAM AND RELATED THROUGH MODELS
@@ -172,10 +353,10 @@ class Team(TitleSlugDescriptionModel, models.Model):
 
     @property
     def admins(self):
-        admins_names = []
-        for name in self.get_admins():
-            admins_names.append(name.username)
-        return admins_names
+        """The admins' usernames, already loaded if the team came from `with_admins()`."""
+        if hasattr(self, 'admin_memberships'):
+            return [membership.user.username for membership in self.admin_memberships]
+        return list(self.get_admins().values_list('username', flat=True))
 
     def get_non_admins(self):
         return self.members.filter(team_memberships__role=TeamMembership.Roles.MEMBER, team_memberships__team=self)
@@ -207,32 +388,31 @@ class Team(TitleSlugDescriptionModel, models.Model):
     def add_member(self, user):
         if user in self.members.all():
             return
-        membership = TeamMembership.objects.create(team=self, user=user, role=TeamMembership.Roles.MEMBER)
-        membership.save()
+        TeamMembership.objects.create(team=self, user=user, role=TeamMembership.Roles.MEMBER)
 
     def remove_member(self, user):
-        if user in self.get_admins():
+        """
+        Removes the user from the team and from each of its projects they belong to, unassigning them from those
+        projects' tickets and stepping them down as manager, and deletes their invitation to the team.
+        Done in a fixed number of set-based statements however many projects and tickets the team has.
+        """
+        role = self.memberships.filter(user=user).values_list('role', flat=True).first()
+        if role == TeamMembership.Roles.ADMIN:
             raise ValidationError(_('Cannot remove admin.'))
-        if user in self.members.all():
-            team_projects = self.projects.all()
-            for project in team_projects:
-                if user in project.members.all():
-                    if user == project.manager:
-                        project.manager = None
-                        project.save()
-                    project.remove_member(user)
-            membership = TeamMembership.objects.get(team=self, user=user)
-            membership.delete()
-            try:
-                invitation = TeamInvitation.objects.get(team=self, invitee=user)
-                invitation.delete()
-            except ObjectDoesNotExist:
-                pass
-        else:
+        if role is None:
             raise ValidationError(_('Cannot remove user. User is not a member of this team.'))
+        now = timezone.now()
+        with transaction.atomic(), batched_access_changes(self.pk):
+            project_ids = ProjectMembership.objects.filter(user=user, project__team=self).values('project_id')
+            Project.objects.filter(pk__in=project_ids, manager=user).update(manager=None, modified=now)
+            Ticket.objects.filter(project__in=project_ids, developer=user).update(developer=None, modified=now)
+            ProjectMembership.objects.filter(user=user, project__team=self).delete()
+            TeamMembership.objects.filter(team=self, user=user).delete()
+            TeamInvitation.objects.filter(team=self, invitee=user).delete()
+            sync_team_access(self.pk, [user.pk])
 
     def is_user_member(self, user):
-        return user in self.members.all()
+        return get_access(user).is_team_member(self.pk)
 
     def remove_self_as_admin(self, user):
         """Method for removing oneself as a team admin."""
@@ -247,7 +427,7 @@ class Team(TitleSlugDescriptionModel, models.Model):
 
     def is_user_admin(self, user):
         """This function is used so that the frontend can identify which permissions a user has and thus which UI elements to display."""
-        return user in self.get_admins()
+        return get_access(user).is_team_admin(self.pk)
 
 
 class TeamMembership(TimeStampedModel, models.Model):
@@ -307,29 +487,43 @@ class TeamInvitation(TimeStampedModel, models.Model):
     def team_title(self):
         return self.team.title
 
-    def send_invitation_email(self, extra_info=None):
-        accept_url = f'https://bugtracking.io/invitation/?invitation={str(self.id)}&slug={str(self.team.slug)}'
+    # stands in for the invitation id while the email is rendered, so one rendering can serve a whole batch
+    INVITATION_ID_PLACEHOLDER = '__invitation_id__'
+
+    @classmethod
+    def render_invitation_email(cls, team, inviter, extra_info=None):
+        """Returns the (plain, html) invitation email for a team, with INVITATION_ID_PLACEHOLDER in the accept link."""
+        accept_url = f'https://bugtracking.io/invitation/?invitation={cls.INVITATION_ID_PLACEHOLDER}&slug={str(team.slug)}'
         decline_url = f'https://bugtracking.io/dashboard/invitations'
         register_url = 'https://bugtracking.io/auth'
         context = {
             'accept_url': accept_url,
             'decline_url': decline_url,
             'register_url': register_url,
-            'team': self.team.title,
-            'inviter': self.inviter.username
+            'team': team.title,
+            'inviter': inviter.username
         }
         if extra_info:
             context['extra_info'] = extra_info
         html_message = render_to_string('tracker/team_invite_email.html', context)
         plain_message = strip_tags(html_message)
-        mail.send_mail(
+        return plain_message, html_message
+
+    def invitation_email(self, rendered):
+        """An unsaved OutgoingEmail for this invitation, from the output of `render_invitation_email`."""
+        plain_message, html_message = rendered
+        return OutgoingEmail(
             subject='Team Invitation - Bugtracking.io',
-            message=plain_message,
+            body=plain_message.replace(self.INVITATION_ID_PLACEHOLDER, str(self.id)),
+            html_body=html_message.replace(self.INVITATION_ID_PLACEHOLDER, str(self.id)),
             from_email='noreply@bugtracking.io',
-            recipient_list=[self.invitee_email],
-            html_message=html_message
+            recipient=self.invitee_email,
         )
 
+    def send_invitation_email(self, extra_info=None):
+        # queued rather than sent, so a slow mail provider never holds up the request
+        self.invitation_email(self.render_invitation_email(self.team, self.inviter, extra_info)).save()
+
     def accept_invite(self, user):
         self.invitee = user
         self.status = self.Status.ACCEPTED
@@ -362,50 +556,76 @@ class Project(TitleSlugDescriptionModel, TimeStampedModel, models.Model):
     subscribers = models.ManyToManyField(User, related_name='project_subscriptions', through='ProjectSubscription')
     is_archived = models.BooleanField(default=False)
     manager = models.ForeignKey(User, related_name='assigned_projects', on_delete=models.SET_NULL, null=True, blank=True)
+    # maintained by Ticket.save()/delete() and TicketQueryset's bulk methods; repaired by `manage.py reconcile_ticket_counts`
+    open_tickets_count = models.IntegerField(default=0, editable=False)
+    closed_tickets_count = models.IntegerField(default=0, editable=False)
     # the `TitleSlugDescriptionModel` implements title, slug, and description fields, with the slug based on the project's title
     # the `TimeStampedModel` implements created and modified fields
 
     objects = ProjectManager.from_queryset(ProjectQueryset)()
 
+    # only ever changed in place by the database (see ProjectQueryset.adjust_ticket_counts), never written back from an instance
+    MAINTAINED_FIELDS = ('open_tickets_count', 'closed_tickets_count')
+
+    class Meta:
+        indexes = [
+            # nested routes look a project up by slug within its team (see api/routes.py)
+            models.Index(fields=['team', 'slug'], name='project_team_slug_idx'),
+        ]
+
     def __str__(self):
         return f'<Title: {self.title}, Slug: {self.slug}>'
 
+    def save(self, *args, **kwargs):
+        """Saving an existing project leaves the maintained ticket counters alone, so a stale instance can't overwrite them."""
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """
+        Deletes the project with its memberships, tickets and comments. The memberships' signals leave the access
+        versions to one bump at the end; their ProjectAccess rows go with the project.
+        """
+        with transaction.atomic(savepoint=False), batched_access_changes(self.team_id):
+            return super().delete(*args, **kwargs)
+
     def add_member(self, user):
         if user in self.members.all():
             return
         if user in self.team.members.all():
-            membership = ProjectMembership.objects.create(project=self, user=user, role=ProjectMembership.Roles.DEVELOPER)
-            membership.save()
+            ProjectMembership.objects.create(project=self, user=user, role=ProjectMembership.Roles.DEVELOPER)
         else:
             raise ValidationError(_('Cannot add user. User is not a member of this project\'s team.'))
 
     def remove_member(self, user):
-        if user==self.manager:
+        """Removes the user from the project and unassigns them from its tickets, in two statements."""
+        if user.pk == self.manager_id:
             raise ValidationError(_('Cannot remove project manager. Demote the user first.'))
-        if user in self.members.all():
-            project_tickets = self.tickets.all()
-            for ticket in project_tickets:
-                if user == ticket.developer:
-                    ticket.developer = None
-                    ticket.save()
-            membership = ProjectMembership.objects.get(project=self, user=user)
-            membership.delete()
-        else:
-            raise ValidationError(_('Cannot remove user. User is not a member of this project.'))
+        with transaction.atomic(), batched_access_changes(self.team_id):
+            removed, _removed_by_model = ProjectMembership.objects.filter(project=self, user=user).delete()
+            if not removed:
+                raise ValidationError(_('Cannot remove user. User is not a member of this project.'))
+            self.tickets.filter(developer=user).update(developer=None, modified=timezone.now())
+            sync_project_access(Project.objects.filter(pk=self.pk), [user.pk])
 
     def make_manager(self, user):
         if user == self.manager:
             return
         if user in self.members.all():
-            if self.manager:
-                old_manager_membership = self.get_membership(self.manager)
-                old_manager_membership.role = old_manager_membership.Roles.DEVELOPER
-                old_manager_membership.save()
-            new_manager_membership = self.get_membership(user)
-            new_manager_membership.role = new_manager_membership.Roles.MANAGER
-            new_manager_membership.save()
-            self.manager = new_manager_membership.user
-            self.save()
+            with transaction.atomic():
+                if self.manager:
+                    old_manager_membership = self.get_membership(self.manager)
+                    old_manager_membership.role = old_manager_membership.Roles.DEVELOPER
+                    old_manager_membership.save()
+                new_manager_membership = self.get_membership(user)
+                new_manager_membership.role = new_manager_membership.Roles.MANAGER
+                new_manager_membership.save()
+                self.manager = new_manager_membership.user
+                self.save()
         else:
             raise ValidationError(_('Cannot make manager. User is not a member of this project.'))
 
@@ -413,16 +633,19 @@ class Project(TitleSlugDescriptionModel, TimeStampedModel, models.Model):
         return ProjectMembership.objects.get(user=user, project=self)
 
     def can_user_view(self, user):
-        return user in self.members.all() or user in self.team.get_admins()
+        return get_access(user).can(self, ProjectAccess.VIEW)
 
     def can_user_edit(self, user):
-        return user == self.manager or user in self.team.get_admins()
+        return get_access(user).can(self, ProjectAccess.MANAGE)
 
     def can_user_update_manager(self, user):
-        return user in self.team.get_admins()
+        return get_access(user).can(self, ProjectAccess.ADMINISTER)
 
     def can_user_create_tickets(self, user):
-        return user in self.members.all() or user in self.team.get_admins()
+        return get_access(user).can(self, ProjectAccess.VIEW)
+
+    def can_user_assign_developer(self, user):
+        return get_access(user).can(self, ProjectAccess.MANAGE)
 
     def get_user_project_permissions(self, user):
         """This function is used so that the frontend can identify which permissions a user has and thus which UI elements to display."""
@@ -431,13 +654,21 @@ class Project(TitleSlugDescriptionModel, TimeStampedModel, models.Model):
             'edit': self.can_user_edit(user),
             'update_manager': self.can_user_update_manager(user),
             'create_tickets': self.can_user_create_tickets(user),
-            'assign_developer': user in self.team.get_admins() or user == self.manager
+            'assign_developer': self.can_user_assign_developer(user),
         }
         return permissions
 
+    @staticmethod
+    def get_user_project_permissions_for(projects, user):
+        """
+        Returns {project.pk: permissions} for a list of projects, as used by list serialization.
+        Every check reads from the user's access context, so this costs no queries beyond loading that context once.
+        """
+        return {project.pk: project.get_user_project_permissions(user) for project in projects}
+
     @property
     def open_tickets(self):
-        return self.tickets.filter(is_open=True).count()
+        return self.open_tickets_count
 
 
 class ProjectMembership(TimeStampedModel, models.Model):
@@ -463,6 +694,41 @@ class ProjectMembership(TimeStampedModel, models.Model):
         return self.get_role_display()
 
 
+class ProjectAccess(models.Model):
+    """
+    One user's effective access to one project, as a bitmask of the flags below, derived from their team role, their
+    project membership and whether they manage the project. Users with no access to a project have no row.
+    Maintained by the membership and project signals (and by the set-based removals in Team.remove_member and
+    Project.remove_member), in the same transaction as the change; see `project_access.py`. Repaired by
+    `manage.py rebuild_project_access`.
+    """
+    MEMBER = 1  # on the project's member list
+    VIEW = 2  # sees the project and all its tickets and may submit tickets: project members and team admins
+    MANAGE = 4  # edits the project and assigns, edits and deletes any of its tickets: its manager and team admins
+    ADMINISTER = 8  # changes the project's manager: team admins
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='project_access')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='access')
+    # projects never change teams; kept here so the access context can load a user's whole team in one lookup
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='+')
+    capabilities = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('user', 'project',)
+        indexes = [
+            models.Index(fields=['user', 'team'], name='project_access_user_team_idx'),
+        ]
+
+    def __str__(self):
+        return f'<Project Access: {self.user_id}, {self.project_id}, {self.capabilities}>'
+
+    @classmethod
+    def masks_with(cls, capability):
+        """Every bitmask that includes `capability`, for filtering with `capabilities__in`, which can use the index."""
+        every = cls.MEMBER | cls.VIEW | cls.MANAGE | cls.ADMINISTER
+        return [mask for mask in range(1, every + 1) if mask & capability == capability]
+
+
 class ProjectSubscription(TimeStampedModel, models.Model):
     """
     The through model representing the email subscription relationship between Projects and Users.
@@ -480,6 +746,31 @@ class ProjectSubscription(TimeStampedModel, models.Model):
 
 # TICKET, COMMENT AND RELATED THROUGH MODELS
 
+def count_ticket_changes(added=(), removed=()):
+    """
+    Applies ticket additions and removals to their projects' open/closed counters, one UPDATE per affected project.
+    `added` and `removed` are iterables of tickets, or of (project_id, is_open) pairs.
+    """
+    deltas = Counter()
+    for tickets, sign in ((added, 1), (removed, -1)):
+        for ticket in tickets:
+            key = ticket if isinstance(ticket, tuple) else (ticket.project_id, ticket.is_open)
+            deltas[key] += sign
+    for (project_id, is_open), delta in deltas.items():
+        if not delta:
+            continue
+        if is_open:
+            Project.objects.filter(pk=project_id).adjust_ticket_counts(open_delta=delta)
+        else:
+            Project.objects.filter(pk=project_id).adjust_ticket_counts(closed_delta=delta)
+
+
+def tickets_removed(project_ids):
+    """Recounts the counters of projects that lost tickets, in one UPDATE, and bumps their teams' change versions."""
+    Project.objects.filter(pk__in=project_ids).refresh_ticket_counts()
+    bump_team_change_version(*{team_id_for_project(project_id) for project_id in project_ids})
+
+
 class Ticket(TitleSlugDescriptionModel, TimeStampedModel, models.Model):
     """
     The lowest organizational unit of the app. A ticket (subsumed under a project) represents an individual task related to that project.
@@ -500,26 +791,85 @@ class Ticket(TitleSlugDescriptionModel, TimeStampedModel, models.Model):
     # the `TitleSlugDescriptionModel` implements title, slug, and description fields, with the slug based on the ticket's title
     # the `TimeStampedModel` implements created and modified fields
 
+    # Postgres' full-text index (a weighted tsvector over SEARCH_FIELDS and the ticket's comments, maintained by
+    # `search.index_tickets`); unused on SQLite, which keeps the same text in an FTS5 table instead
+    search_vector = SearchVectorField(null=True, editable=False)
+
     objects = TicketManager.from_queryset(TicketQueryset)()
 
+    SEARCH_FIELDS = ('title', 'description', 'resolution')
+
+    class Meta:
+        indexes = [
+            # backs the tickets endpoint's cursor pagination: each page is a range scan within one project
+            models.Index(fields=['project', 'created', 'id'], name='ticket_project_created_idx'),
+            # the tickets list's filters (see api/filters.py): open/closed tickets by priority or newest first,
+            # a developer's open tickets, and ordering by last change
+            models.Index(fields=['project', 'is_open', 'priority', 'created'], name='ticket_open_priority_idx'),
+            models.Index(fields=['developer', 'is_open', 'priority', 'created'], name='ticket_developer_open_idx'),
+            models.Index(fields=['project', 'modified'], name='ticket_project_modified_idx'),
+            # nested routes look a ticket up by slug within its project (see api/routes.py)
+            models.Index(fields=['project', 'slug'], name='ticket_project_slug_idx'),
+        ]
+
     def __str__(self):
         return f'<Ticket: {self.title}, Slug: {self.slug}>'
 
+    def save(self, *args, **kwargs):
+        """Saves the ticket and moves it between its projects' open/closed counters if it was created, closed, reopened or moved."""
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                # read (and lock) the stored state rather than trusting this instance, which may be stale
+                previous = Ticket.objects.select_for_update().filter(pk=self.pk).values_list('project_id', 'is_open').first()
+            super().save(*args, **kwargs)
+            current = (self.project_id, self.is_open)
+            if previous != current:
+                count_ticket_changes(added=[current], removed=[previous] if previous else [])
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None or set(self.SEARCH_FIELDS) & set(update_fields):
+                index_tickets([self.pk])
+
+    def delete(self, *args, **kwargs):
+        """
+        Deletes the ticket (its comments and subscriptions go with it in bulk), takes it off its project's counters and
+        out of the search index. Like TicketQueryset.delete; Ticket has no delete signal receivers, which would make
+        Django load and delete the tickets of a deleted project one by one.
+        """
+        with transaction.atomic(savepoint=False):
+            unindex_tickets([self.pk])
+            deleted = super().delete(*args, **kwargs)
+            tickets_removed([self.project_id])
+        return deleted
+
     def can_user_view(self, user):
-        return user in self.project.members.all() or user in self.project.team.get_admins() or user == self.user
+        access = get_access(user)
+        return access.can(self.project, ProjectAccess.VIEW) or access.is_user(self.user_id)
 
     def can_user_edit(self, user):
-        return user == self.developer or user == self.project.manager or user in self.project.team.get_admins()
+        access = get_access(user)
+        return access.is_user(self.developer_id) or access.can(self.project, ProjectAccess.MANAGE)
 
     def can_user_change_developer(self, user):
-        return user in self.project.team.get_admins() or user == self.project.manager
+        return get_access(user).can(self.project, ProjectAccess.MANAGE)
 
     def can_user_delete(self, user):
-        return user in self.project.team.get_admins() or user == self.project.manager
+        return get_access(user).can(self.project, ProjectAccess.MANAGE)
 
     def can_user_close(self, user):
         return self.can_user_edit(user)
 
+    def get_recent_comments(self):
+        """The newest comments, already loaded if the ticket came from `with_comment_summary()`."""
+        if hasattr(self, 'recent_comments'):
+            return self.recent_comments
+        return list(self.comments.select_related('user')[:settings.TICKET_RECENT_COMMENTS])
+
+    def get_comment_count(self):
+        if hasattr(self, 'comment_count'):
+            return self.comment_count
+        return self.comments.count()
+
     def get_user_ticket_permissions(self, user):
         """This function is used so that the frontend can identify which permissions a user has and thus which UI elements to display."""
         permissions = {
@@ -531,6 +881,34 @@ class Ticket(TitleSlugDescriptionModel, TimeStampedModel, models.Model):
         }
         return permissions
 
+    @staticmethod
+    def get_user_ticket_permissions_for(tickets, user):
+        """
+        Returns {ticket.pk: permissions} for a list of tickets, as used by list serialization.
+        The user's access to each project is looked up once; only the developer and creator checks differ from
+        ticket to ticket. Tickets should come with their project loaded.
+        """
+        access = get_access(user)
+        project_access = {}
+        results = {}
+        for ticket in tickets:
+            if ticket.project_id not in project_access:
+                capabilities = access.capabilities(ticket.project)
+                project_access[ticket.project_id] = (
+                    bool(capabilities & ProjectAccess.VIEW),  # may view every ticket in the project
+                    bool(capabilities & ProjectAccess.MANAGE),  # may manage every ticket in the project
+                )
+            can_view_project, can_manage_project = project_access[ticket.project_id]
+            can_edit = can_manage_project or access.is_user(ticket.developer_id)
+            results[ticket.pk] = {
+                'view': can_view_project or access.is_user(ticket.user_id),
+                'edit': can_edit,
+                'change_developer': can_manage_project,
+                'delete': can_manage_project,
+                'close': can_edit,
+            }
+        return results
+
 
 class TicketSubscription(TimeStampedModel, models.Model):
     """
@@ -547,6 +925,13 @@ class TicketSubscription(TimeStampedModel, models.Model):
         return f'<TicketSubscription: {self.user}, {self.ticket.slug}>'
 
 
+def comments_removed(ticket_ids):
+    """The search index and change version work for deleted comments (see `search.queue_comment_index`)."""
+    queue_comment_index(stale_tickets=ticket_ids)
+    project_ids = Ticket.objects.filter(pk__in=ticket_ids).order_by().values_list('project_id', flat=True).distinct()
+    bump_team_change_version(*{team_id_for_project(project_id) for project_id in project_ids})
+
+
 class Comment(TimeStampedModel, models.Model):
     """
     A comment which can be posted to an individual ticket.
@@ -556,10 +941,62 @@ class Comment(TimeStampedModel, models.Model):
     ticket = models.ForeignKey(Ticket, related_name='comments', on_delete=models.CASCADE)
     # the `TimeStampedModel` implements created and modified fields
 
-    objects = CommentManager()
+    objects = CommentManager.from_queryset(CommentQueryset)()
 
     class Meta:
         ordering = ['-created']
 
     def __str__(self):
         return f'<Comment on {self.ticket.slug} by {self.user}>'
+
+    def delete(self, *args, **kwargs):
+        """
+        Deletes the comment and queues its ticket for reindexing. Comment has no delete signal receivers, so the
+        comments of a deleted ticket or project are deleted in bulk.
+        """
+        with transaction.atomic(savepoint=False):
+            deleted = super().delete(*args, **kwargs)
+            comments_removed([self.ticket_id])
+        return deleted
+
+
+# EMAIL OUTBOX
+
+class OutgoingEmail(TimeStampedModel, models.Model):
+    """
+    An email waiting to be sent (or that has been). Rows are written in the same transaction as whatever caused them
+    and drained by `manage.py send_queued_email`, which retries failures with exponential backoff and gives up on an
+    email (marking it dead) after EMAIL_OUTBOX_MAX_ATTEMPTS.
+    """
+    class Status(models.IntegerChoices):
+        PENDING = 1, 'Pending'
+        SENT = 2, 'Sent'
+        DEAD = 3, 'Dead'
+
+    status = models.IntegerField(choices=Status.choices, default=Status.PENDING)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    recipient = models.EmailField()
+    attempts = models.IntegerField(default=0)
+    # when the worker may next pick the email up: now for new emails, later after a failure or while it's being sent
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    objects = OutgoingEmailManager()
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='outgoingemail_due_idx')]
+
+    def __str__(self):
+        return f'<OutgoingEmail to {self.recipient}: {self.subject} ({self.get_status_display()})>'
+
+    def as_message(self, connection=None):
+        message = mail.EmailMultiAlternatives(
+            subject=self.subject, body=self.body, from_email=self.from_email, to=[self.recipient], connection=connection
+        )
+        if self.html_body:
+            message.attach_alternative(self.html_body, 'text/html')
+        return message
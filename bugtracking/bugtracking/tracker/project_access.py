@@ -0,0 +1,111 @@
+# stdlib imports
+from collections import Counter, defaultdict
+
+# core django imports
+from django.db import transaction
+
+# third party imports
+
+# my internal imports
+
+
+# EFFECTIVE PROJECT ACCESS
+# Who may see and do what in a project follows from three things: the user's role in the project's team (admins may
+# do everything in every project of their team), their project membership (members see the project and its tickets)
+# and whether they manage the project. ProjectAccess keeps the result, one row per user and project, so list
+# querysets can join against it and the access context can read a user's whole team in one indexed lookup, instead
+# of working the rules out again from the memberships on every request.
+# `sync_project_access` brings the rows for some projects (and optionally only some users) in line with the
+# memberships: the signals call it for each change, in the change's transaction, and `manage.py
+# rebuild_project_access` calls it over every project.
+
+def expected_capabilities(projects, user_ids=None):
+    """
+    {(user_id, project_id): (team_id, capabilities)} for the given projects, as (pk, team_id, manager_id) tuples,
+    and only the given users if any, as the memberships say they should be.
+    """
+    from .models import TeamMembership, ProjectMembership, ProjectAccess
+    team_projects = {}
+    for project_id, team_id, _manager_id in projects:
+        team_projects.setdefault(team_id, []).append(project_id)
+    team_of = {project_id: team_id for project_id, team_id, _manager_id in projects}
+
+    admins = TeamMembership.objects.filter(team_id__in=team_projects, role=TeamMembership.Roles.ADMIN)
+    members = ProjectMembership.objects.filter(project_id__in=team_of)
+    if user_ids is not None:
+        admins, members = admins.filter(user_id__in=user_ids), members.filter(user_id__in=user_ids)
+
+    capabilities = defaultdict(int)
+    admin_capabilities = ProjectAccess.VIEW | ProjectAccess.MANAGE | ProjectAccess.ADMINISTER
+    for team_id, user_id in admins.values_list('team_id', 'user_id'):
+        for project_id in team_projects[team_id]:
+            capabilities[user_id, project_id] |= admin_capabilities
+    for project_id, user_id in members.values_list('project_id', 'user_id'):
+        capabilities[user_id, project_id] |= ProjectAccess.MEMBER | ProjectAccess.VIEW
+    for project_id, _team_id, manager_id in projects:
+        if manager_id is not None and (user_ids is None or manager_id in user_ids):
+            capabilities[manager_id, project_id] |= ProjectAccess.MANAGE
+    return {key: (team_of[key[1]], value) for key, value in capabilities.items() if value}
+
+
+def sync_project_access(projects, user_ids=None, revoke_only=False, dry_run=False):
+    """
+    Adds, updates and deletes the ProjectAccess rows of a queryset of projects (for the given users, if any) until
+    they match the memberships. Returns a Counter of rows 'added', 'changed' and 'removed'.
+    With `revoke_only`, no rows are added: for memberships being deleted, which can only take access away, and which
+    may be going as part of a cascade whose projects and users are about to be deleted too (and whose access rows,
+    deleted first, leave nothing to do).
+    """
+    from .models import ProjectAccess
+    user_ids = None if user_ids is None else set(user_ids)
+    results = Counter()
+    if user_ids == set():
+        return results
+    existing = ProjectAccess.objects.all() if user_ids is None else ProjectAccess.objects.filter(user_id__in=user_ids)
+    if revoke_only:
+        # the rows that might have to go are all there is to look at, and in a cascade there are none
+        existing = list(
+            existing.filter(project__in=projects.values('pk'))
+            .values_list('pk', 'user_id', 'project_id', 'capabilities')
+        )
+        if not existing:
+            return results
+        project_rows = list(projects.values_list('pk', 'team_id', 'manager_id'))
+    else:
+        project_rows = list(projects.values_list('pk', 'team_id', 'manager_id'))
+        if not project_rows:
+            return results
+        existing = list(
+            existing.filter(project_id__in=[row[0] for row in project_rows])
+            .values_list('pk', 'user_id', 'project_id', 'capabilities')
+        )
+    expected = expected_capabilities(project_rows, user_ids)
+
+    removed, changed = [], {}
+    for pk, user_id, project_id, capabilities in existing:
+        _team_id, wanted = expected.pop((user_id, project_id), (None, 0))
+        if not wanted:
+            removed.append(pk)
+        elif wanted != capabilities:
+            changed.setdefault(wanted, []).append(pk)
+    added = [] if revoke_only else [
+        ProjectAccess(user_id=user_id, project_id=project_id, team_id=team_id, capabilities=capabilities)
+        for (user_id, project_id), (team_id, capabilities) in expected.items()
+    ]
+    results.update(added=len(added), changed=sum(len(pks) for pks in changed.values()), removed=len(removed))
+    if dry_run or not (removed or changed or added):
+        return results
+    with transaction.atomic():
+        if removed:
+            ProjectAccess.objects.filter(pk__in=removed).delete()
+        for capabilities, pks in changed.items():
+            ProjectAccess.objects.filter(pk__in=pks).update(capabilities=capabilities)
+        if added:
+            ProjectAccess.objects.bulk_create(added)
+    return results
+
+
+def sync_team_access(team_id, user_ids=None, revoke_only=False):
+    """Syncs every project in a team, e.g. after a user's team role changes."""
+    from .models import Project
+    return sync_project_access(Project.objects.filter(team_id=team_id), user_ids, revoke_only=revoke_only)
@@ -0,0 +1,247 @@
+# stdlib imports
+import threading
+
+# core django imports
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, FloatField, OuterRef, Q, QuerySet, Subquery, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+# third party imports
+
+# my internal imports
+
+
+# TICKET SEARCH
+# Tickets are searched over their title, description, resolution and comments. On Postgres the searchable text lives
+# in Ticket.search_vector (a weighted tsvector with a GIN index); on SQLite, in the FTS5 table `tracker_ticket_fts`,
+# keyed by ticket id. Both are created by migration 0011 and kept up to date from the ticket and comment write
+# paths (`Ticket.save`, TicketQueryset.update/bulk_create and the signals) as they happen, except that comment writes
+# are collected and applied once per transaction (see `queue_comment_index`).
+# `manage.py rebuild_ticket_search` rebuilds either index from scratch.
+
+FTS_TABLE = 'tracker_ticket_fts'
+
+_fts_available = None
+
+
+def backend():
+    """'postgres', 'fts5', or None when neither is available (e.g. SQLite built without FTS5)."""
+    global _fts_available
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    if connection.vendor == 'sqlite':
+        if _fts_available is None:
+            _fts_available = FTS_TABLE in connection.introspection.table_names()
+        return 'fts5' if _fts_available else None
+    return None
+
+
+def _comment_text():
+    from .models import Comment
+    from django.contrib.postgres.aggregates import StringAgg
+    comments = (
+        Comment.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket')
+        .annotate(text=StringAgg('text', delimiter=' ')).values('text')
+    )
+    return Coalesce(Subquery(comments, output_field=TextField()), Value(''))
+
+
+def _search_vector():
+    from django.contrib.postgres.search import SearchVector
+    config = settings.TICKET_SEARCH_CONFIG
+    return (
+        SearchVector('title', weight='A', config=config)
+        + SearchVector(Coalesce('description', Value('')), weight='B', config=config)
+        + SearchVector(Coalesce('resolution', Value('')), weight='C', config=config)
+        + SearchVector(_comment_text(), weight='D', config=config)
+    )
+
+
+def index_tickets(ticket_ids):
+    """(Re)indexes the given tickets. `ticket_ids` may be a list or a values_list/values queryset of ids."""
+    pending = _pending_index()
+    if pending is not None and pending.new_comments:
+        # the reindex reads these tickets' comments as they stand, so appending their queued comments afterwards would
+        # index them twice; rebuilding them again on commit is correct whichever way round the writes came
+        ticket_ids = list(ticket_ids)
+        pending.stale_tickets.update(ticket_ids)
+    _index_tickets(ticket_ids)
+
+
+def _index_tickets(ticket_ids):
+    from .models import Ticket
+    engine = backend()
+    if engine == 'postgres':
+        Ticket.objects.filter(pk__in=ticket_ids).update(search_vector=_search_vector())
+    elif engine == 'fts5':
+        ids = list(ticket_ids)
+        if not ids:
+            return
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', ids)
+            cursor.execute(
+                f'''
+                INSERT INTO {FTS_TABLE} (rowid, title, description, resolution, comments)
+                SELECT t.id, t.title, COALESCE(t.description, ''), COALESCE(t.resolution, ''),
+                       COALESCE((SELECT group_concat(c.text, ' ') FROM tracker_comment c WHERE c.ticket_id = t.id), '')
+                FROM tracker_ticket t WHERE t.id IN ({placeholders})
+                ''',
+                ids,
+            )
+
+
+def _append_comments(comment_ids, skip_tickets=()):
+    """
+    Adds new comments' text to their tickets' entries, rather than reading every comment of the ticket again.
+    Comments that no longer exist (deleted, or rolled back with a savepoint) are skipped, and so are tickets missing
+    from the index, which `unindexed_tickets` still finds for a rebuild.
+    """
+    from .models import Comment
+    comments = Comment.objects.filter(pk__in=comment_ids).exclude(ticket_id__in=skip_tickets).order_by('pk')
+    texts = {}
+    for ticket_id, text in comments.values_list('ticket_id', 'text'):
+        texts.setdefault(ticket_id, []).append(text)
+    engine = backend()
+    with connection.cursor() as cursor:
+        if engine == 'postgres':
+            cursor.executemany(
+                'UPDATE tracker_ticket '
+                "SET search_vector = search_vector || setweight(to_tsvector(%s::regconfig, %s), 'D') "
+                'WHERE id = %s AND search_vector IS NOT NULL',
+                [(settings.TICKET_SEARCH_CONFIG, ' '.join(text), ticket_id) for ticket_id, text in texts.items()],
+            )
+        elif engine == 'fts5':
+            cursor.executemany(
+                f"UPDATE {FTS_TABLE} SET comments = comments || ' ' || %s WHERE rowid = %s",
+                [(' '.join(text), ticket_id) for ticket_id, text in texts.items()],
+            )
+
+
+class _PendingIndex:
+    """
+    The queued comment writes of the current transaction, applied together when it commits. Kept in a thread-local
+    slot until it runs; see `queue_comment_index` for how rollbacks are handled.
+    """
+    def __init__(self):
+        self.new_comments = set()  # comment ids whose text is appended to their ticket's entry
+        self.stale_tickets = set()  # ticket ids whose entry is rebuilt, covering any new comments of theirs too
+
+    def __call__(self):
+        if getattr(_pending, 'index', None) is self:
+            _pending.index = None
+        new_comments, stale_tickets = self.new_comments, self.stale_tickets
+        self.new_comments, self.stale_tickets = set(), set()
+        if stale_tickets:
+            _index_tickets(sorted(stale_tickets))
+        if new_comments:
+            _append_comments(new_comments, skip_tickets=stale_tickets)
+
+
+_pending = threading.local()
+
+
+def _pending_index():
+    return getattr(_pending, 'index', None)
+
+
+def queue_comment_index(new_comments=(), stale_tickets=()):
+    """
+    Queues index work for comment writes until the transaction commits, so a ticket is touched once however many of
+    its comments the transaction writes: new comments are appended to their ticket's entry, and tickets whose
+    comments were edited or deleted are reindexed. Outside a transaction the work is done straight away.
+    The queue is registered with transaction.on_commit on every call, not just the first: a rollback (of the
+    transaction or of a savepoint) silently drops the registrations made inside it, and whichever one survives runs
+    the lot, later ones finding nothing left to do. Work left over from a rollback is harmless when it does run, since
+    comments are read back by id (rolled-back ones are gone) and reindexing a ticket is idempotent.
+    """
+    pending = _pending_index()
+    if pending is None:
+        pending = _pending.index = _PendingIndex()
+    pending.new_comments.update(comment.pk for comment in new_comments)
+    pending.stale_tickets.update(stale_tickets)
+    transaction.on_commit(pending)  # in autocommit, this runs it now
+
+
+def flush_comment_index():
+    """Applies the current transaction's queued comment index work now, so a search in it sees its own writes."""
+    pending = _pending_index()
+    if pending is not None:
+        pending()
+
+
+def unindex_tickets(ticket_ids):
+    """
+    Drops tickets about to be deleted from the index. `ticket_ids` may be a list or a values_list/values queryset of
+    ids, which is run as a subquery of the one DELETE. Only needed for FTS5; Postgres' vector goes with the row.
+    """
+    if backend() != 'fts5':
+        return
+    if isinstance(ticket_ids, QuerySet):
+        ids_sql, params = ticket_ids.query.sql_with_params()
+    else:
+        params = list(ticket_ids)
+        if not params:
+            return
+        ids_sql = ', '.join(['%s'] * len(params))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({ids_sql})', params)
+
+
+def unindexed_tickets(tickets):
+    """Narrows a ticket queryset to the tickets missing from the index."""
+    engine = backend()
+    if engine == 'postgres':
+        return tickets.filter(search_vector__isnull=True)
+    if engine == 'fts5':
+        return tickets.exclude(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE}', []))
+    return tickets.none()
+
+
+def clear_index():
+    """Empties the FTS5 table before a full rebuild; Postgres' vectors are simply overwritten."""
+    if backend() == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+
+def _fts5_query(query):
+    """Every word quoted, so user input can't use (or break on) FTS5's query syntax; terms are ANDed."""
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+
+
+def search_tickets(tickets, query):
+    """
+    Narrows a ticket queryset to those matching `query` and annotates `search_rank` (higher is better),
+    ordered best match first. Without a full-text index, falls back to a case-insensitive substring match.
+    """
+    flush_comment_index()
+    engine = backend()
+    if engine == 'postgres':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        search_query = SearchQuery(query, config=settings.TICKET_SEARCH_CONFIG)
+        tickets = tickets.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query),
+        )
+    elif engine == 'fts5':
+        # the FTS table is joined on rowid, so the MATCH runs once and each ticket's bm25 is read off its joined row;
+        # ranking with a subquery per ticket would run the MATCH again for every ticket matched
+        table = tickets.model._meta.db_table
+        tickets = tickets.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = "{table}"."id"', f'{FTS_TABLE} MATCH %s'],
+            params=[_fts5_query(query)],
+            # bm25 is lower-is-better, so negate it to match SearchRank
+            select={'search_rank': f'-bm25({FTS_TABLE}, 10.0, 4.0, 2.0, 1.0)'},
+        )
+    else:
+        condition = Q()
+        for term in query.split():
+            condition &= (
+                Q(title__icontains=term) | Q(description__icontains=term)
+                | Q(resolution__icontains=term) | Q(comments__text__icontains=term)
+            )
+        tickets = tickets.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return tickets.order_by('-search_rank', '-created', '-id')
@@ -0,0 +1,113 @@
+# stdlib imports
+
+# core django imports
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+# third party imports
+
+# my internal imports
+from .models import (
+    Team, TeamMembership, TeamInvitation, Project, ProjectMembership, Ticket, Comment,
+)
+from .access import bump_team_access_version, forget_team_slug, access_changes_batched
+from .changes import bump_team_change_version, team_id_for_project, forget_project_team, teams_showing_user
+from .search import queue_comment_index, unindex_tickets
+from .project_access import sync_project_access, sync_team_access
+
+User = get_user_model()
+
+# what the team's lists show of a user
+USER_LIST_FIELDS = {'username', 'name', 'email'}
+
+# Ticket and Comment deliberately have no delete receivers: any receiver makes Django's deletion collector load and
+# delete the tickets and comments of a deleted project row by row, and send a signal for each. Their counter, search
+# index and version work is done set-based by Ticket/Comment.delete() and their querysets' delete(), and for
+# cascades from a deleted project, by the project's own receivers below.
+
+
+@receiver([post_save, post_delete], sender=TeamMembership)
+def team_membership_changed(sender, instance, **kwargs):
+    """Any change to who belongs to a team, or in which role, makes that team's cached role maps stale."""
+    if access_changes_batched():
+        return
+    sync_team_access(instance.team_id, [instance.user_id], revoke_only=kwargs.get('signal') is post_delete)
+    bump_team_access_version(instance.team_id)
+    bump_team_change_version(instance.team_id)
+
+
+@receiver([post_save, post_delete], sender=ProjectMembership)
+def project_membership_changed(sender, instance, **kwargs):
+    if access_changes_batched():
+        return
+    sync_project_access(
+        Project.objects.filter(pk=instance.project_id), [instance.user_id],
+        revoke_only=kwargs.get('signal') is post_delete,
+    )
+    team_id = team_id_for_project(instance.project_id)
+    bump_team_access_version(team_id)
+    bump_team_change_version(team_id)
+
+
+@receiver(pre_delete, sender=Project)
+def project_deleting(sender, instance, **kwargs):
+    """Its tickets are about to go with it: they leave the search index in one statement, and its counters with its row."""
+    unindex_tickets(Ticket.objects.filter(project_id=instance.pk).values('pk'))
+
+
+@receiver([post_save, post_delete], sender=Project)
+def project_changed(sender, instance, **kwargs):
+    """Covers manager changes as well as projects coming and going."""
+    if kwargs.get('signal') is post_delete:
+        forget_project_team(instance.pk)
+    if access_changes_batched():
+        return
+    if kwargs.get('signal') is post_save:  # a deleted project's access rows go with it
+        sync_project_access(Project.objects.filter(pk=instance.pk))
+    bump_team_access_version(instance.team_id)
+    bump_team_change_version(instance.team_id)
+
+
+@receiver(post_save, sender=Team)
+def team_saved(sender, instance, **kwargs):
+    bump_team_change_version(instance.pk)
+
+
+@receiver(post_delete, sender=Team)
+def team_deleted(sender, instance, **kwargs):
+    forget_team_slug(instance.slug)
+
+
+@receiver([post_save, post_delete], sender=TeamInvitation)
+def invitation_changed(sender, instance, **kwargs):
+    if access_changes_batched():
+        return
+    bump_team_change_version(instance.team_id)
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_saved(sender, instance, **kwargs):
+    bump_team_change_version(team_id_for_project(instance.project_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """A ticket's comments are part of its search text, and of its team's changes."""
+    if created:
+        queue_comment_index(new_comments=[instance])
+    else:
+        queue_comment_index(stale_tickets=[instance.ticket_id])
+    if Comment.ticket.is_cached(instance):
+        project_id = instance.ticket.project_id
+    else:
+        project_id = Ticket.objects.filter(pk=instance.ticket_id).values_list('project_id', flat=True).first()
+    bump_team_change_version(team_id_for_project(project_id))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Cached lists embed usernames, names and emails, so changing them changes every team the user shows up in."""
+    if created or (update_fields is not None and not USER_LIST_FIELDS.intersection(update_fields)):
+        return
+    bump_team_change_version(*teams_showing_user(instance.pk))
@@ -0,0 +1,140 @@
+# stdlib imports
+from unittest import mock
+
+# django core imports
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import reverse
+
+# third party imports
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+# my internal imports
+from bugtracking.users.models import User
+from bugtracking.tracker.access import get_access
+from bugtracking.tracker.models import TeamMembership
+from .factories import model_setup as fac
+
+
+def user(username='admin'):
+    return User.objects.create_user(username=username, password='password')
+
+
+class TestAccessContext(TestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.manager = base['manager']
+        self.member = base['member']
+        self.nonmember = base['nonmember']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']
+
+    def test_roles_loaded_with_two_queries(self):
+        access = get_access(User.objects.get(pk=self.admin.pk))
+        with self.assertNumQueries(2):
+            assert access.is_team_admin(self.team.pk)
+            assert access.is_team_member(self.team.pk)
+            assert access.is_project_member(self.project)
+
+    def test_roles_shared_through_cache(self):
+        """A fresh context (i.e. another request or another worker) reads the roles from the cache, not the database."""
+        get_access(User.objects.get(pk=self.admin.pk)).is_team_admin(self.team.pk)
+        get_access(User.objects.get(pk=self.admin.pk)).team_id_for_slug(self.team.slug)
+        access = get_access(User.objects.get(pk=self.admin.pk))
+        with self.assertNumQueries(0):
+            assert access.team_id_for_slug(self.team.slug) == self.team.pk
+            assert access.is_team_admin(self.team.pk)
+            assert access.is_project_member(self.project)
+
+    def test_cached_roles_invalidated_by_version_bump(self):
+        team_member = user('team_member')
+        self.team.add_member(team_member)
+        assert get_access(User.objects.get(pk=team_member.pk)).is_team_admin(self.team.pk) == False
+        self.team.make_admin(team_member)
+        # a fresh user instance has no per-request context, so this can only come from the shared cache or the db
+        assert get_access(User.objects.get(pk=team_member.pk)).is_team_admin(self.team.pk) == True
+        self.project.add_member(team_member)
+        assert get_access(User.objects.get(pk=team_member.pk)).is_project_member(self.project) == True
+
+    def test_change_committed_while_roles_are_read_invalidates_them(self):
+        """The team's version is taken before the rows are read, so a change landing in between isn't cached as current."""
+        team_member = user('team_member')
+        self.team.add_member(team_member)
+        cache.clear()  # no version yet for the team, as on first use or after an eviction
+        read_memberships = TeamMembership.objects.filter
+
+        def read_then_remove(*args, **kwargs):
+            rows = list(read_memberships(*args, **kwargs).values_list('team_id', 'role'))
+            patched.stop()  # remove_member reads the memberships too
+            self.team.remove_member(team_member)
+            return mock.Mock(values_list=mock.Mock(return_value=rows))
+
+        patched = mock.patch.object(TeamMembership.objects, 'filter', side_effect=read_then_remove)
+        patched.start()
+        assert get_access(User.objects.get(pk=team_member.pk)).is_team_member(self.team.pk) == True
+        assert get_access(User.objects.get(pk=team_member.pk)).is_team_member(self.team.pk) == False
+
+    def test_falls_back_to_database_without_cache(self):
+        """With Redis down (and IGNORE_EXCEPTIONS on) every read misses and every write is dropped."""
+        with mock.patch.object(cache, 'get_many', return_value={}), \
+                mock.patch.object(cache, 'get', return_value=None), \
+                mock.patch.object(cache, 'add', return_value=False), mock.patch.object(cache, 'set') as cache_set:
+            access = get_access(User.objects.get(pk=self.admin.pk))
+            assert access.team_id_for_slug(self.team.slug) == self.team.pk
+            assert access.is_team_admin(self.team.pk)
+            assert access.is_project_member(self.project)
+            assert get_access(self.nonmember).is_team_member(self.team.pk) == False
+        # the slug is still written (it doesn't depend on a version); the role maps never are
+        assert all('slug' in call.args[0] for call in cache_set.call_args_list)
+
+    def test_repeated_checks_do_not_query_again(self):
+        user = User.objects.get(pk=self.manager.pk)
+        ticket = self.ticket.__class__.objects.select_related('project').get(pk=self.ticket.pk)
+        ticket.get_user_ticket_permissions(user)
+        with self.assertNumQueries(0):
+            assert ticket.get_user_ticket_permissions(user)['edit'] == True
+            assert ticket.project.get_user_project_permissions(user)['edit'] == True
+
+    def test_context_rebuilt_after_membership_change(self):
+        team_member = user('team_member')
+        self.team.add_member(team_member)
+        assert self.project.can_user_view(team_member) == False
+        self.project.add_member(team_member)
+        assert self.project.can_user_view(team_member) == True
+        self.team.make_admin(team_member)
+        assert self.team.is_user_admin(team_member) == True
+
+    def test_nonmember_has_no_roles(self):
+        access = get_access(self.nonmember)
+        assert access.is_team_member(self.team.pk) == False
+        assert access.is_project_member(self.project) == False
+        assert access.is_user(None) == False
+
+
+class TestAccessContextQueries(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.member = base['member']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']
+        self.url = reverse('api:tickets-detail', kwargs={
+            'team_slug': self.team.slug, 'project_slug': self.project.slug, 'slug': self.ticket.slug
+        })
+
+    def test_membership_queries_shared_across_checks(self):
+        """Permission classes and model checks share one context, so memberships are only loaded once per request."""
+        self.client.force_authenticate(User.objects.get(pk=self.member.pk))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['user_permissions']['view'] == True
+        membership_lookups = [
+            q for q in queries.captured_queries if q['sql'].startswith('SELECT "tracker_projectaccess"."project_id"')
+        ]
+        assert len(membership_lookups) == 1
@@ -0,0 +1,148 @@
+# stdlib imports
+import os
+import tempfile
+from io import StringIO
+
+# django core imports
+from django.core.management import call_command
+from django.db import connection
+from django.test import LiveServerTestCase, override_settings
+
+# third party imports
+import pytest
+from rest_framework.test import APITestCase
+
+# my internal imports
+from bugtracking.tracker.benchmarks import loadtest, plans, runner
+from bugtracking.tracker.benchmarks.datasets import SIZES, build_dataset
+from bugtracking.users import firebase
+from bugtracking.users.identity import last_logins
+
+# Environment variables:
+# BENCHMARK_DATASETS            comma-separated sizes to run (default: small; medium and large take minutes)
+# BENCHMARK_ITERATIONS          measured runs per scenario (default: 5)
+# BENCHMARK_UPDATE=1            record the results as the new baselines instead of comparing with them
+# BENCHMARK_QUERY_TOLERANCE     extra queries allowed over the baseline (default: from baselines.json)
+# BENCHMARK_LATENCY_TOLERANCE   fraction a p95 may exceed its baseline by, or "off" (default: from baselines.json)
+# BENCHMARK_PLANS=1             print the visibility filters' query plans and timings, DISTINCT join vs current (-s)
+# Latency is only compared against baselines recorded on the same database backend.
+
+
+def requested_datasets():
+    return [name.strip() for name in os.environ.get('BENCHMARK_DATASETS', 'small').split(',') if name.strip()]
+
+
+class TestEndpointBenchmarks(APITestCase):
+    def benchmark(self, size):
+        if size not in requested_datasets():
+            pytest.skip(f'the {size} dataset is only benchmarked when BENCHMARK_DATASETS includes it')
+        dataset = build_dataset(size)
+        uncovered = runner.unbenchmarked_routes(dataset)
+        assert not uncovered, f'API routes without a benchmark scenario: {sorted(uncovered)}'
+        iterations = int(os.environ.get('BENCHMARK_ITERATIONS', 5))
+        results = runner.run_all(self.client, dataset, iterations)
+        over = runner.over_budget(dataset, results)
+        assert not over, f'{size} dataset over REQUEST_BUDGETS:\n' + '\n'.join(
+            f'{name}: {problem}' for name, problems in over.items() for problem in problems
+        )
+        baselines = runner.load_baselines()
+        if os.environ.get('BENCHMARK_UPDATE') == '1':
+            baselines['datasets'][size] = {'vendor': connection.vendor, 'iterations': iterations, 'results': results}
+            runner.save_baselines(baselines)
+            return
+        recorded = baselines['datasets'].get(size)
+        assert recorded is not None, f'no baselines recorded for the {size} dataset; run with BENCHMARK_UPDATE=1'
+        tolerance = baselines['tolerance']
+        latency_tolerance = os.environ.get('BENCHMARK_LATENCY_TOLERANCE', tolerance['latency'])
+        if latency_tolerance == 'off' or recorded['vendor'] != connection.vendor:
+            latency_tolerance = None
+
+        def compare():
+            return runner.compare(
+                results, recorded['results'],
+                query_tolerance=int(os.environ.get('BENCHMARK_QUERY_TOLERANCE', tolerance['queries'])),
+                latency_tolerance=None if latency_tolerance is None else float(latency_tolerance),
+                latency_floor_ms=tolerance['latency_floor_ms'],
+            )
+
+        regressions = compare()
+        if regressions and latency_tolerance is not None:
+            # a single slow run on a busy machine is enough to fail a p95 over a few iterations, so measure again first
+            results.update(runner.run_all(self.client, dataset, iterations, names=set(regressions)))
+            regressions = compare()
+        assert not regressions, f'{size} dataset regressions:\n' + '\n'.join(
+            f'{name}: {problem}' for name, problems in regressions.items() for problem in problems
+        )
+
+    def test_small(self):
+        self.benchmark('small')
+
+    def test_medium(self):
+        self.benchmark('medium')
+
+    def test_large(self):
+        self.benchmark('large')
+
+
+class TestBudgets(APITestCase):
+    def test_over_budget_by_view(self):
+        dataset = build_dataset('small')
+        results = {'teams.list': {'queries': 3}, 'teams.retrieve': {'queries': 3}, 'tickets.list': {'queries': 3}}
+        with self.settings(REQUEST_BUDGETS={'default': {'queries': 3}, 'TeamViewSet.list': {'queries': 2}}):
+            assert runner.over_budget(dataset, results) == {'teams.list': ['3 queries, TeamViewSet.list budget 2']}
+
+
+def test_every_size_has_a_test():
+    assert set(SIZES) == {name[len('test_'):] for name in dir(TestEndpointBenchmarks) if name.startswith('test_')}
+
+
+class TestVisibilityPlans(APITestCase):
+    def compare(self, size):
+        if size not in requested_datasets():
+            pytest.skip(f'the {size} dataset is only compared when BENCHMARK_DATASETS includes it')
+        dataset = build_dataset(size)
+        for user in [dataset.admin, dataset.manager, dataset.member, dataset.outsider, dataset.invitee]:
+            for name, (distinct_join, current) in plans.visible_pks(user, dataset.team.slug).items():
+                assert current == distinct_join, f'{name} visible to {user.username} differ'
+        if os.environ.get('BENCHMARK_PLANS') == '1':
+            for user in [dataset.admin, dataset.member]:
+                print(f'\n{size} dataset, as {user.username}:')
+                print(plans.format_plans(plans.compare_plans(user, dataset.team.slug)))
+
+    def test_small(self):
+        self.compare('small')
+
+    def test_medium(self):
+        self.compare('medium')
+
+    def test_large(self):
+        self.compare('large')
+
+
+class TestLoadTest(LiveServerTestCase):
+    def setUp(self):
+        call_command('generate_dataset', '--teams=2', '--members=4', '--tickets=5', stdout=StringIO())
+        self.issuer = firebase.LocalTokenIssuer(project_id='test-project')
+        path = os.path.join(tempfile.mkdtemp(), 'certificates.json')
+        self.issuer.write_certificates(path)
+        local_auth = override_settings(
+            FIREBASE_PROJECT_ID='test-project', FIREBASE_PUBLIC_KEYS_URL=f'file://{path}',
+            FIREBASE_TOKEN_VERIFICATION='local', FIREBASE_USER_RECORDS_FROM_TOKEN=True,
+        )
+        local_auth.enable()
+        self.addCleanup(local_auth.disable)
+        firebase.public_keys.clear()
+        self.addCleanup(firebase.public_keys.clear)
+        self.addCleanup(last_logins.reset)  # the server's sign-ins, which would otherwise be flushed at exit
+
+    def test_plans_are_reproducible(self):
+        assert loadtest.make_plans('synthetic', 3, seed=1) == loadtest.make_plans('synthetic', 3, seed=1)
+
+    def test_scenarios_run_without_errors(self):
+        # one virtual user: the test database is SQLite's in-memory one, whose table locks concurrent writes would hit
+        plans = loadtest.make_plans('synthetic', 1, seed=0)
+        samples = loadtest.run(self.live_server_url, plans, self.issuer, 0, loadtest.DEFAULT_MIX, duration=1.5)
+        summary = loadtest.summarize(samples, 1.5)
+        assert summary['total']['requests'] > 0
+        assert summary['total']['errors'] == 0, summary['total']['statuses']
+        assert 'TOTAL' in loadtest.format_report(summary, baseline=summary)
@@ -0,0 +1,85 @@
+# stdlib imports
+from unittest import mock
+
+# django core imports
+from django.shortcuts import reverse
+
+# third party imports
+import pytest
+from rest_framework.test import APITestCase
+
+# my internal imports
+from bugtracking.utils import metrics
+from .factories import model_setup as fac
+
+
+class TestMetricsUnavailable(APITestCase):
+    def test_no_endpoint_without_prometheus_client(self):
+        with mock.patch.object(metrics, 'prometheus_client', None):
+            response = self.client.get(reverse('metrics'))
+        assert response.status_code == 404
+        # and recording is a no-op
+        with mock.patch.object(metrics, 'prometheus_client', None):
+            metrics.observe_request('TicketViewSet.list', 200, 0.01, 3)
+
+
+class TestMetrics(APITestCase):
+    def setUp(self) -> None:
+        pytest.importorskip('prometheus_client')
+        base = fac()
+        self.admin = base['admin']
+        self.team = base['team']
+        self.project = base['project']
+        self.url = reverse('api:tickets-list', kwargs={'team_slug': self.team.slug, 'project_slug': self.project.slug})
+
+    def sample(self, name, **labels):
+        return metrics.prometheus_client.REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_latency_and_queries_by_view(self):
+        self.client.force_authenticate(self.admin)
+        count = self.sample('bugtracking_request_duration_seconds_count', view='TicketViewSet.list')
+        queries = self.sample('bugtracking_request_queries_sum', view='TicketViewSet.list')
+        self.client.get(self.url)
+        assert self.sample('bugtracking_request_duration_seconds_count', view='TicketViewSet.list') == count + 1
+        assert self.sample('bugtracking_request_queries_sum', view='TicketViewSet.list') > queries
+
+    def test_errors_by_view_and_status(self):
+        response = self.client.get(self.url)  # not logged in
+        status = str(response.status_code)
+        assert status.startswith('4')
+        errors = self.sample('bugtracking_request_errors_total', view='TicketViewSet.list', status=status)
+        self.client.get(self.url)
+        assert self.sample('bugtracking_request_errors_total', view='TicketViewSet.list', status=status) == errors + 1
+
+    def test_cache_lookups(self):
+        self.client.force_authenticate(self.admin)
+        hits = self.sample('bugtracking_cache_lookups_total', cache='list', result='hit')
+        self.client.get(self.url)
+        self.client.get(self.url)
+        assert self.sample('bugtracking_cache_lookups_total', cache='list', result='hit') == hits + 1
+
+    def test_endpoint(self):
+        self.client.get(self.url)
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        assert response.status_code == 200
+        assert b'bugtracking_request_duration_seconds_bucket' in response.content
+
+    def test_no_endpoint_without_token(self):
+        with self.settings(METRICS_TOKEN='', DEBUG=False):
+            assert self.client.get(reverse('metrics')).status_code == 404
+        with self.settings(METRICS_TOKEN='', DEBUG=True):
+            assert self.client.get(reverse('metrics')).status_code == 200
+
+    def test_endpoint_token(self):
+        with self.settings(METRICS_TOKEN='secret'):
+            assert self.client.get(reverse('metrics')).status_code == 403
+            assert self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code == 403
+            assert self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret').status_code == 200
+
+    def test_disabled(self):
+        with self.settings(METRICS_ENABLED=False):
+            count = self.sample('bugtracking_request_duration_seconds_count', view='TicketViewSet.list')
+            self.client.get(self.url)
+            assert self.sample('bugtracking_request_duration_seconds_count', view='TicketViewSet.list') == count
+            assert self.client.get(reverse('metrics')).status_code == 404
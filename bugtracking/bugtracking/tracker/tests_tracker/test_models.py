@@ -1,9 +1,14 @@
 # stdlib imports
+from io import StringIO
 
 # django core imports
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 # third party imports
 import pytest
@@ -12,8 +17,9 @@ from model_bakery.recipe import related
 
 # my internal imports
 from bugtracking.users.models import User
+from bugtracking.tracker import search
 from bugtracking.tracker.models import (
-    Team, TeamMembership, Project, ProjectMembership, Ticket, Comment
+    Team, TeamMembership, Project, ProjectMembership, Ticket, Comment, TeamInvitation
 )
 from .factories import model_setup as fac
 
@@ -154,6 +160,11 @@ class TestTeam(TestCase):
         assert len(Team.objects.users_member_teams(self.member)) == 1
         assert len(Team.objects.users_member_teams(self.nonmember)) == 0
 
+    def test_team_querysets_check_memberships_without_distinct(self):
+        for teams in [Team.objects.all_users_teams(self.admin), Team.objects.users_admin_teams(self.admin)]:
+            assert 'DISTINCT' not in str(teams.query)
+            assert list(teams) == [self.team]
+
     def test_team_creation_with_create_new_by_username(self):
         new_team = Team.objects.create_new_by_username(title='New', description='desc', creator='admin')
         assert isinstance(new_team, Team)
@@ -290,6 +301,97 @@ class TestProject(TestCase):
         # nonmember sees no projects
         assert len(Project.objects.filter_for_team_and_user(user=self.nonmember, team_slug=self.team.slug)) == 0
 
+    def test_filter_for_team_and_user_is_one_statement_without_distinct(self):
+        Project.objects.create(title='title', description='desc', team=self.team)
+        for user in [self.admin, self.member, self.nonmember]:
+            with CaptureQueriesContext(connection) as queries:
+                list(Project.objects.filter_for_team_and_user(user=user, team_slug=self.team.slug))
+            assert len(queries) == 1
+            assert 'DISTINCT' not in queries[0]['sql']
+        assert list(Project.objects.filter_for_team_and_user(user=self.admin, team_slug='no-such-team')) == []
+
+
+class TestRemoveMember(TestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.manager = base['manager']
+        self.developer = base['developer']
+        self.nonmember = base['nonmember']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']
+
+    def add_projects(self, count, tickets_each):
+        """Extra projects managed by, and full of tickets assigned to, both the manager and the developer."""
+        for i in range(count):
+            project = Project.objects.create(team=self.team, title=f'extra {i}', description='desc')
+            project.add_member(self.manager)
+            project.add_member(self.developer)
+            project.make_manager(self.manager)
+            for j in range(tickets_each):
+                Ticket.objects.create(user=self.admin, project=project, developer=self.developer, title=f'ticket {j}', description='desc')
+
+    def count_queries(self, remove):
+        with CaptureQueriesContext(connection) as queries:
+            remove()
+        return len(queries.captured_queries)
+
+    def test_team_remove_member(self):
+        self.add_projects(2, 2)
+        self.project.can_user_view(self.developer)  # warm the developer's access context
+        TeamInvitation.objects.create(team=self.team, invitee=self.developer, invitee_email='dev@email.com', message_text='')
+        other_team = Team.objects.create_new(title='other', description='desc', creator=self.developer)
+        other_project = Project.objects.create(team=other_team, title='other', description='desc')
+        other_ticket = Ticket.objects.create(user=self.developer, project=other_project, developer=self.developer, title='t', description='d')
+        self.team.remove_member(self.developer)
+        assert not self.team.memberships.filter(user=self.developer).exists()
+        assert not ProjectMembership.objects.filter(user=self.developer, project__team=self.team).exists()
+        assert not Ticket.objects.filter(project__team=self.team, developer=self.developer).exists()
+        assert not TeamInvitation.objects.filter(team=self.team, invitee=self.developer).exists()
+        assert Ticket.objects.get(pk=other_ticket.pk).developer == self.developer
+        assert self.project.can_user_view(self.developer) == False
+
+    def test_team_remove_member_steps_down_manager(self):
+        self.add_projects(2, 1)
+        self.team.remove_member(self.manager)
+        assert not Project.objects.filter(team=self.team, manager=self.manager).exists()
+
+    def test_team_remove_member_errors(self):
+        with pytest.raises(ValidationError) as error:
+            self.team.remove_member(self.admin)
+        assert 'Cannot remove admin' in str(error.value)
+        with pytest.raises(ValidationError) as error:
+            self.team.remove_member(self.nonmember)
+        assert 'not a member' in str(error.value)
+
+    def test_team_remove_member_query_count_constant(self):
+        few = self.count_queries(lambda: self.team.remove_member(self.developer))
+        self.team.add_member(self.developer)
+        self.project.add_member(self.developer)
+        self.add_projects(5, 4)
+        many = self.count_queries(lambda: self.team.remove_member(self.developer))
+        assert few == many
+
+    def test_project_remove_member(self):
+        self.project.remove_member(self.developer)
+        assert not self.project.memberships.filter(user=self.developer).exists()
+        assert Ticket.objects.get(pk=self.ticket.pk).developer is None
+        with pytest.raises(ValidationError) as error:
+            self.project.remove_member(self.developer)
+        assert 'not a member' in str(error.value)
+        with pytest.raises(ValidationError) as error:
+            self.project.remove_member(self.manager)
+        assert 'Cannot remove project manager' in str(error.value)
+
+    def test_project_remove_member_query_count_constant(self):
+        few = self.count_queries(lambda: self.project.remove_member(self.developer))
+        self.project.add_member(self.developer)
+        for i in range(20):
+            Ticket.objects.create(user=self.admin, project=self.project, developer=self.developer, title=f'ticket {i}', description='desc')
+        many = self.count_queries(lambda: self.project.remove_member(self.developer))
+        assert few == many
+
 
 class TestTicket(TestCase):
     def setUp(self):
@@ -298,6 +400,7 @@ class TestTicket(TestCase):
         self.nonmember = base['nonmember']
         self.ticket = base['ticket']
         self.team = base['team']
+        self.project = base['project']
         self.developer = base['developer']
         self.admin = base['admin']
         self.manager = base['manager']
@@ -329,3 +432,141 @@ class TestTicket(TestCase):
         assert isinstance(other_team_ticket, Ticket) # just making sure model_bakery worked
         # nonmember sees no tickets
         assert len(Ticket.objects.filter_for_team_and_user(user=self.nonmember, team_slug=self.team.slug)) == 0
+
+    def test_filter_for_team_and_user_is_one_statement_without_distinct(self):
+        # a second membership path to the same tickets, which a join would return them twice through
+        self.project.add_member(self.admin)
+        for user in [self.admin, self.member, self.nonmember]:
+            with CaptureQueriesContext(connection) as queries:
+                tickets = list(Ticket.objects.filter_for_team_and_user(user=user, team_slug=self.team.slug))
+            assert len(queries) == 1
+            assert 'DISTINCT' not in queries[0]['sql']
+            assert len(tickets) == len(set(tickets))
+
+    def test_bulk_ticket_permissions_match_single(self):
+        other_ticket = Ticket.objects.create(title='other', description='desc', project=self.project, user=self.member)
+        tickets = [self.ticket, other_ticket]
+        for user in [self.admin, self.manager, self.developer, self.member, self.nonmember]:
+            batched = Ticket.get_user_ticket_permissions_for(tickets, user)
+            for ticket in tickets:
+                assert batched[ticket.pk] == ticket.get_user_ticket_permissions(user)
+
+    def test_bulk_project_permissions_match_single(self):
+        other_project = Project.objects.create(title='other', description='desc', team=self.team)
+        projects = [self.project, other_project]
+        for user in [self.admin, self.manager, self.developer, self.member, self.nonmember]:
+            batched = Project.get_user_project_permissions_for(projects, user)
+            for project in projects:
+                assert batched[project.pk] == project.get_user_project_permissions(user)
+
+
+class TestProjectTicketCounts(TestCase):
+    def setUp(self):
+        base = fac()
+        self.admin = base['admin']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']
+        self.other_project = Project.objects.create(title='other', description='desc', team=self.team)
+
+    def counts(self, project):
+        project.refresh_from_db()
+        return project.open_tickets_count, project.closed_tickets_count
+
+    def test_create_close_reopen(self):
+        assert self.counts(self.project) == (1, 0)
+        self.ticket.is_open = False
+        self.ticket.save()
+        assert self.counts(self.project) == (0, 1)
+        self.ticket.save()  # saving again without a change doesn't count twice
+        assert self.counts(self.project) == (0, 1)
+        self.ticket.is_open = True
+        self.ticket.save()
+        assert self.counts(self.project) == (1, 0)
+        assert self.project.open_tickets == 1
+
+    def test_move_and_delete(self):
+        self.ticket.project = self.other_project
+        self.ticket.save()
+        assert self.counts(self.project) == (0, 0)
+        assert self.counts(self.other_project) == (1, 0)
+        self.ticket.delete()
+        assert self.counts(self.other_project) == (0, 0)
+
+    def test_bulk_paths(self):
+        Ticket.objects.bulk_create([Ticket(title=f'bulk {i}', project=self.project) for i in range(3)])
+        assert self.counts(self.project) == (4, 0)
+        Ticket.objects.filter(project=self.project).update(is_open=False)
+        assert self.counts(self.project) == (0, 4)
+        Ticket.objects.filter(project=self.project, title__startswith='bulk').update(project=self.other_project)
+        assert self.counts(self.project) == (0, 1)
+        assert self.counts(self.other_project) == (0, 3)
+        Ticket.objects.filter(project=self.other_project).delete()
+        assert self.counts(self.other_project) == (0, 0)
+
+    def test_cascade_delete_keeps_other_projects_consistent(self):
+        baker.make(Ticket, project=self.other_project, _quantity=2)
+        assert self.counts(self.other_project) == (2, 0)
+        self.project.delete()
+        assert self.counts(self.other_project) == (2, 0)
+
+    def test_cascade_delete_work_does_not_grow_with_tickets(self):
+        def delete_project(tickets):
+            project = Project.objects.create(title=f'doomed {tickets}', description='desc', team=self.team)
+            for ticket in baker.make(Ticket, project=project, _quantity=tickets):
+                baker.make(Comment, ticket=ticket, _quantity=2)
+            with CaptureQueriesContext(connection) as queries:
+                project.delete()
+            return len(queries)
+
+        assert delete_project(2) == delete_project(6)
+        if search.backend() == 'fts5':
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM {search.FTS_TABLE}')
+                assert cursor.fetchone()[0] == Ticket.objects.count()
+        self.ticket.delete()
+        assert self.counts(self.project) == (0, 0)
+
+    def test_reconcile_command_repairs_drift(self):
+        Project.objects.filter(pk=self.project.pk).update(open_tickets_count=7, closed_tickets_count=3)
+        out = StringIO()
+        call_command('reconcile_ticket_counts', '--batch-size=1', stdout=out)
+        assert self.counts(self.project) == (1, 0)
+        assert 'Checked 2 projects; 1 repaired.' in out.getvalue()
+
+
+class TestGenerateDataset(TestCase):
+    def generate(self, *args):
+        call_command('generate_dataset', '--teams=3', '--tickets=6', '--comments=2', *args, stdout=StringIO())
+
+    def snapshot(self, prefix):
+        return sorted(
+            (ticket.slug[len(prefix):], ticket.title, ticket.priority, ticket.is_open, ticket.comments.count())
+            for ticket in Ticket.objects.filter(slug__startswith=prefix)
+        )
+
+    def test_same_seed_same_data(self):
+        self.generate('--prefix=first', '--seed=7')
+        self.generate('--prefix=second', '--seed=7')
+        self.generate('--prefix=third', '--seed=8')
+        assert self.snapshot('first') == self.snapshot('second') != self.snapshot('third')
+
+    def test_generated_data_is_consistent(self):
+        self.generate('--batch-size=4', '--chunk=2')
+        assert Team.objects.count() == 3
+        for team in Team.objects.all():
+            assert team.get_admins().exists()
+        for project in Project.objects.all():
+            assert project.memberships.get(user_id=project.manager_id).role == ProjectMembership.Roles.MANAGER
+            counts = project.open_tickets_count, project.closed_tickets_count
+            Project.objects.filter(pk=project.pk).refresh_ticket_counts()
+            project.refresh_from_db()
+            assert counts == (project.open_tickets_count, project.closed_tickets_count)
+        ticket = Ticket.objects.filter(developer__isnull=False).first()
+        assert ticket.project.members.filter(pk=ticket.developer_id).exists()
+        assert search.search_tickets(Ticket.objects.all(), ticket.description).filter(pk=ticket.pk).exists()
+
+    def test_prefix_in_use(self):
+        self.generate()
+        with pytest.raises(CommandError):
+            self.generate()
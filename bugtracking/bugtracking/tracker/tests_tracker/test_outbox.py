@@ -0,0 +1,99 @@
+# stdlib imports
+from io import StringIO
+from unittest import mock
+
+# django core imports
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.shortcuts import reverse
+from django.utils import timezone
+
+# third party imports
+from rest_framework.test import APITestCase
+
+# my internal imports
+from bugtracking.tracker.models import OutgoingEmail
+from .factories import model_setup as fac
+
+
+def drain():
+    call_command('send_queued_email', '--once', stdout=StringIO())
+
+
+class TestInvitationEmailQueued(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.team = base['team']
+        self.admin = base['admin']
+
+    def test_invitation_email_queued_then_sent(self):
+        url = reverse('api:invitations-list', kwargs={'team_slug': self.team.slug})
+        self.client.force_authenticate(self.admin)
+        self.client.post(url, {'invitee_email': 'test@email.com'})
+        # nothing is sent during the request
+        assert len(mail.outbox) == 0
+        queued = OutgoingEmail.objects.get()
+        assert queued.recipient == 'test@email.com'
+        assert queued.status == OutgoingEmail.Status.PENDING
+        drain()
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == ['test@email.com']
+        assert str(self.team.title) in mail.outbox[0].body
+        queued.refresh_from_db()
+        assert queued.status == OutgoingEmail.Status.SENT
+        assert queued.sent_at is not None
+
+
+class TestOutboxWorker(TestCase):
+    def queue(self, count):
+        for i in range(count):
+            OutgoingEmail.objects.queue('subject', 'body', f'user{i}@email.com', html_message='<p>body</p>')
+
+    def test_email_dropped_with_rolled_back_transaction(self):
+        try:
+            with transaction.atomic():
+                self.queue(1)
+                raise ValueError
+        except ValueError:
+            pass
+        assert OutgoingEmail.objects.count() == 0
+
+    def test_batches_share_one_connection(self):
+        self.queue(5)
+        with mock.patch('django.core.mail.get_connection', wraps=mail.get_connection) as get_connection:
+            call_command('send_queued_email', '--once', '--batch-size', '2', stdout=StringIO())
+        assert get_connection.call_count == 1
+        assert len(mail.outbox) == 5
+        assert OutgoingEmail.objects.filter(status=OutgoingEmail.Status.SENT).count() == 5
+
+    def test_failed_email_retried_with_backoff(self):
+        self.queue(1)
+        with mock.patch('django.core.mail.EmailMultiAlternatives.send', side_effect=ConnectionError('mailgun down')):
+            drain()
+        email = OutgoingEmail.objects.get()
+        assert email.status == OutgoingEmail.Status.PENDING
+        assert email.attempts == 1
+        assert 'mailgun down' in email.last_error
+        assert email.next_attempt_at > timezone.now()
+        # not due yet, so a second pass leaves it alone
+        drain()
+        assert len(mail.outbox) == 0
+        # once due, it goes out
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        drain()
+        assert len(mail.outbox) == 1
+
+    def test_email_dead_after_max_attempts(self):
+        self.queue(1)
+        with self.settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2), \
+                mock.patch('django.core.mail.EmailMultiAlternatives.send', side_effect=ConnectionError('mailgun down')):
+            drain()
+            OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+            drain()
+        email = OutgoingEmail.objects.get()
+        assert email.status == OutgoingEmail.Status.DEAD
+        assert email.attempts == 2
+        call_command('send_queued_email', '--once', '--requeue-dead', stdout=StringIO())
+        assert len(mail.outbox) == 1
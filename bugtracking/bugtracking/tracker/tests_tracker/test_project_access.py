@@ -0,0 +1,130 @@
+# stdlib imports
+from io import StringIO
+
+# django core imports
+from django.core.management import call_command
+from django.test import TestCase
+
+# third party imports
+
+# my internal imports
+from bugtracking.users.models import User
+from bugtracking.tracker.access import get_access, invalidate_access
+from bugtracking.tracker.models import Team, Project, ProjectAccess, ProjectMembership
+from bugtracking.tracker.project_access import expected_capabilities, sync_project_access
+from .factories import model_setup as fac
+
+MEMBER, VIEW, MANAGE, ADMINISTER = (
+    ProjectAccess.MEMBER, ProjectAccess.VIEW, ProjectAccess.MANAGE, ProjectAccess.ADMINISTER,
+)
+
+
+class TestProjectAccess(TestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.manager = base['manager']
+        self.developer = base['developer']
+        self.member = base['member']
+        self.nonmember = base['nonmember']
+        self.team = base['team']
+        self.project = base['project']
+
+    def capabilities(self, user, project=None):
+        project = project or self.project
+        rows = ProjectAccess.objects.filter(user=user, project=project)
+        return rows.values_list('capabilities', flat=True).first() or 0
+
+    def assert_in_sync(self):
+        assert not sum(sync_project_access(Project.objects.all(), dry_run=True).values())
+
+    def test_rows_follow_roles(self):
+        assert self.capabilities(self.admin) == MEMBER | VIEW | MANAGE | ADMINISTER
+        assert self.capabilities(self.manager) == MEMBER | VIEW | MANAGE
+        assert self.capabilities(self.developer) == MEMBER | VIEW
+        assert self.capabilities(self.nonmember) == 0
+        assert not ProjectAccess.objects.filter(user=self.nonmember).exists()
+        self.assert_in_sync()
+
+    def test_team_admins_get_every_project(self):
+        other_project = Project.objects.create(title='other', description='desc', team=self.team)
+        assert self.capabilities(self.admin, other_project) == VIEW | MANAGE | ADMINISTER
+        assert self.capabilities(self.member, other_project) == 0
+        self.team.make_admin(self.member)
+        assert self.capabilities(self.member, other_project) == VIEW | MANAGE | ADMINISTER
+        self.team.make_admin(self.manager)
+        self.team.remove_self_as_admin(self.member)
+        assert self.capabilities(self.member, other_project) == 0
+        assert self.capabilities(self.member) == MEMBER | VIEW
+        self.assert_in_sync()
+
+    def test_manager_changes(self):
+        self.project.make_manager(self.developer)
+        assert self.capabilities(self.developer) == MEMBER | VIEW | MANAGE
+        assert self.capabilities(self.manager) == MEMBER | VIEW
+        self.project.manager = None
+        self.project.save()
+        assert self.capabilities(self.developer) == MEMBER | VIEW
+        self.assert_in_sync()
+
+    def test_removals(self):
+        self.project.remove_member(self.member)
+        assert self.capabilities(self.member) == 0
+        self.team.remove_member(self.manager)  # also steps them down as manager
+        assert not ProjectAccess.objects.filter(user=self.manager).exists()
+        ProjectMembership.objects.filter(user=self.developer).delete()
+        assert self.capabilities(self.developer) == 0
+        self.assert_in_sync()
+
+    def test_cascades(self):
+        Team.objects.create_new(title='other', creator=self.admin)
+        self.project.delete()
+        assert not ProjectAccess.objects.filter(project_id=self.project.pk).exists()
+        self.developer.delete()
+        self.team.delete()
+        assert not ProjectAccess.objects.exists()
+
+    def test_expected_capabilities_for_some_users(self):
+        rows = list(Project.objects.values_list('pk', 'team_id', 'manager_id'))
+        expected = expected_capabilities(rows, [self.manager.pk, self.nonmember.pk])
+        assert expected == {(self.manager.pk, self.project.pk): (self.team.pk, MEMBER | VIEW | MANAGE)}
+
+    def test_access_context_reads_the_table(self):
+        ProjectAccess.objects.filter(user=self.member).delete()
+        invalidate_access()
+        member = User.objects.get(pk=self.member.pk)
+        assert not get_access(member).can(self.project, VIEW)
+        assert not self.project.can_user_view(member)
+        assert get_access(member).is_team_member(self.team.pk)
+        assert Project.objects.filter_for_team_and_user(self.team.slug, member).count() == 0
+
+
+class TestRebuildProjectAccess(TestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.member = base['member']
+        self.nonmember = base['nonmember']
+        self.project = base['project']
+        ProjectAccess.objects.filter(user=self.member).delete()
+        ProjectAccess.objects.filter(user=self.admin).update(capabilities=VIEW)
+        ProjectAccess.objects.create(
+            user=self.nonmember, project=self.project, team=self.project.team, capabilities=VIEW,
+        )
+
+    def test_dry_run_reports_without_repairing(self):
+        out = StringIO()
+        call_command('rebuild_project_access', '--dry-run', stdout=out)
+        assert '1 missing, 1 wrong and 1 extra access rows would be repaired' in out.getvalue()
+        assert ProjectAccess.objects.filter(user=self.nonmember).exists()
+
+    def test_repairs(self):
+        out = StringIO()
+        call_command('rebuild_project_access', '--batch-size=1', stdout=out)
+        assert '1 missing, 1 wrong and 1 extra access rows repaired' in out.getvalue()
+        assert not ProjectAccess.objects.filter(user=self.nonmember).exists()
+        assert ProjectAccess.objects.get(user=self.admin).capabilities == VIEW | MANAGE | ADMINISTER | MEMBER
+        assert ProjectAccess.objects.get(user=self.member).capabilities == MEMBER | VIEW
+        out = StringIO()
+        call_command('rebuild_project_access', '--dry-run', stdout=out)
+        assert '0 missing, 0 wrong and 0 extra' in out.getvalue()
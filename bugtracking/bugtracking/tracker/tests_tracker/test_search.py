@@ -0,0 +1,220 @@
+# stdlib imports
+from io import StringIO
+from unittest import mock
+
+# django core imports
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import reverse
+
+# third party imports
+from rest_framework.test import APITestCase
+
+# my internal imports
+from bugtracking.tracker import search
+from bugtracking.tracker.models import Project, Ticket, Comment
+from .factories import model_setup as fac
+
+
+def matching(query, tickets=None):
+    tickets = Ticket.objects.all() if tickets is None else tickets
+    return list(search.search_tickets(tickets, query).values_list('title', flat=True))
+
+
+class TestSearchIndex(TestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.project = base['project']
+        self.admin = base['admin']
+        self.ticket = Ticket.objects.create(
+            user=self.admin, project=self.project, title='Login page crashes', description='Stack trace attached.',
+        )
+
+    def test_index_available(self):
+        # the test database is SQLite with FTS5, or Postgres
+        assert search.backend() in ('fts5', 'postgres')
+
+    def test_matches_title_description_and_resolution(self):
+        Ticket.objects.filter(pk=self.ticket.pk).update(resolution='Patched the session middleware.')
+        assert matching('login') == ['Login page crashes']
+        assert matching('stack trace') == ['Login page crashes']
+        assert matching('middleware') == ['Login page crashes']
+        assert matching('login middleware') == ['Login page crashes']
+        assert matching('login nonsense') == []
+
+    def test_index_follows_edits(self):
+        self.ticket.title = 'Signup page crashes'
+        self.ticket.save()
+        assert matching('login') == []
+        assert matching('signup') == ['Signup page crashes']
+
+    def test_index_follows_comments(self):
+        comment = Comment.objects.create(ticket=self.ticket, user=self.admin, text='Reproduced on Firefox.')
+        assert matching('firefox') == ['Login page crashes']
+        comment.delete()
+        assert matching('firefox') == []
+
+    def test_comments_indexed_once_per_transaction(self):
+        with mock.patch.object(search, '_index_tickets', wraps=search._index_tickets) as reindex:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    for text in ['Reproduced on Firefox.', 'And on Safari.', 'Not on Chrome.']:
+                        Comment.objects.create(ticket=self.ticket, user=self.admin, text=text)
+                # nothing is indexed until the transaction commits (or searches)
+                assert len(queries) == 3
+                assert matching('firefox safari chrome') == ['Login page crashes']
+        # the comments were appended to the ticket's entry, not read back with all its others
+        assert not reindex.called
+
+    def test_rolled_back_comments_not_indexed(self):
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    Comment.objects.create(ticket=self.ticket, user=self.admin, text='Reproduced on Firefox.')
+                    raise ValueError
+            except ValueError:
+                pass
+            Comment.objects.create(ticket=self.ticket, user=self.admin, text='And on Safari.')
+            assert matching('safari') == ['Login page crashes']
+            assert matching('firefox') == []
+
+    def test_ticket_saved_after_new_comment_indexed_once(self):
+        with transaction.atomic():
+            Comment.objects.create(ticket=self.ticket, user=self.admin, text='Firefox Firefox')
+            self.ticket.title = 'Signup page crashes'
+            self.ticket.save()
+            search.flush_comment_index()
+        if search.backend() == 'fts5':
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT comments FROM {search.FTS_TABLE} WHERE rowid = %s', [self.ticket.pk])
+                assert cursor.fetchone()[0] == 'Firefox Firefox'
+
+    def test_match_runs_once(self):
+        if search.backend() != 'fts5':
+            return
+        for i in range(3):
+            Ticket.objects.create(user=self.admin, project=self.project, title=f'Login bug {i}', description='desc')
+        with CaptureQueriesContext(connection) as queries:
+            assert len(matching('login')) == 4
+        assert queries.captured_queries[-1]['sql'].count('MATCH') == 1
+
+    def test_deleted_tickets_dropped(self):
+        self.ticket.delete()
+        assert matching('login') == []
+
+    def test_bulk_created_tickets_indexed(self):
+        Ticket.objects.bulk_create([
+            Ticket(user=self.admin, project=self.project, title=f'Bulk ticket {i}', slug=f'bulk-ticket-{i}')
+            for i in range(3)
+        ])
+        assert len(matching('bulk')) == 3
+
+    def test_title_matches_rank_first(self):
+        other = Ticket.objects.create(user=self.admin, project=self.project, title='Unrelated', description='desc')
+        Comment.objects.create(ticket=other, user=self.admin, text='Same as the login crash?')
+        assert matching('login') == ['Login page crashes', 'Unrelated']
+
+    def test_query_syntax_is_not_interpreted(self):
+        assert matching('"login') == ['Login page crashes']
+        assert matching('login OR') == []
+        assert matching('- *') == []
+
+    def test_rebuild_command(self):
+        if search.backend() == 'fts5':
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        else:
+            Ticket.objects.update(search_vector=None)
+        assert matching('login') == []
+        call_command('rebuild_ticket_search', stdout=StringIO())
+        assert matching('login') == ['Login page crashes']
+
+
+class TestSearchIndexCommits(TransactionTestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.ticket = Ticket.objects.create(
+            user=self.admin, project=base['project'], title='Login page crashes', description='Stack trace attached.',
+        )
+
+    def tearDown(self) -> None:
+        # the flush between these tests doesn't know about the FTS5 table
+        if search.backend() == 'fts5':
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+
+    def test_queued_comments_indexed_on_commit(self):
+        with transaction.atomic():
+            for text in ['Reproduced on Firefox.', 'And on Safari.']:
+                Comment.objects.create(ticket=self.ticket, user=self.admin, text=text)
+            assert search._pending_index() is not None
+        assert search._pending_index() is None
+        assert matching('firefox safari') == ['Login page crashes']
+
+    def test_indexed_after_rollbacks(self):
+        # each rollback drops the queue's registrations made inside it; the next write registers it again
+        try:
+            with transaction.atomic():
+                Comment.objects.create(ticket=self.ticket, user=self.admin, text='Reproduced on Firefox.')
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    Comment.objects.create(ticket=self.ticket, user=self.admin, text='Reproduced on Chrome.')
+                    raise ValueError
+            except ValueError:
+                pass
+            Comment.objects.create(ticket=self.ticket, user=self.admin, text='And on Safari.')
+        assert search._pending_index() is None
+        assert matching('safari') == ['Login page crashes']
+        assert matching('firefox') == []
+        assert matching('chrome') == []
+
+
+class TestSearchEndpoint(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.team = base['team']
+        self.admin = base['admin']
+        self.member = base['member']
+        self.nonmember = base['nonmember']
+        self.url = reverse('api:teams-search', kwargs={'slug': self.team.slug})
+        other_project = Project.objects.create(team=self.team, title='other project', description='desc')
+        Ticket.objects.create(user=self.admin, project=base['project'], title='Visible crash', description='desc')
+        Ticket.objects.create(user=self.admin, project=other_project, title='Hidden crash', description='desc')
+
+    def test_results_limited_to_visible_tickets(self):
+        self.client.force_authenticate(self.member)
+        response = self.client.get(self.url, {'q': 'crash'})
+        assert response.status_code == 200
+        assert response.data['count'] == 1
+        result = response.data['results'][0]
+        assert result['title'] == 'Visible crash'
+        assert result['project'] == 'project_title'
+        assert 'rank' in result and 'url' in result
+
+    def test_team_admin_sees_every_project(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url, {'q': 'crash'})
+        assert response.data['count'] == 2
+
+    def test_paginated(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url, {'q': 'crash', 'page_size': 1})
+        assert len(response.data['results']) == 1
+        assert response.data['next'] is not None
+
+    def test_query_required(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url)
+        assert response.status_code == 400
+
+    def test_nonmember_forbidden(self):
+        self.client.force_authenticate(self.nonmember)
+        response = self.client.get(self.url, {'q': 'crash'})
+        assert response.status_code in (403, 404)
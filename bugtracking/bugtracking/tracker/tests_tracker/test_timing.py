@@ -0,0 +1,72 @@
+# stdlib imports
+
+# django core imports
+from django.shortcuts import reverse
+
+# third party imports
+from rest_framework.test import APITestCase
+
+# my internal imports
+from bugtracking.utils.timing import get_budget
+from .factories import model_setup as fac
+
+
+class TestRequestTiming(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']
+        self.url = reverse('api:tickets-list', kwargs={'team_slug': self.team.slug, 'project_slug': self.project.slug})
+
+    def test_server_timing_for_staff(self):
+        self.admin.is_staff = True
+        self.admin.save()
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url)
+        timing = response['Server-Timing']
+        assert 'db;dur=' in timing and 'queries"' in timing
+        assert 'serialize;dur=' in timing
+        assert 'total;dur=' in timing
+
+    def test_no_server_timing_for_others(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url)
+        assert 'Server-Timing' not in response
+
+    def test_disabled(self):
+        self.admin.is_staff = True
+        self.admin.save()
+        self.client.force_authenticate(self.admin)
+        with self.settings(REQUEST_TIMING_ENABLED=False):
+            response = self.client.get(self.url)
+        assert 'Server-Timing' not in response
+
+    def test_over_budget_logged_with_viewset_and_action(self):
+        self.client.force_authenticate(self.admin)
+        with self.settings(REQUEST_BUDGETS={'default': {'queries': 1000}, 'TicketViewSet.list': {'queries': 1}}):
+            with self.assertLogs('bugtracking.utils.timing', level='WARNING') as logs:
+                self.client.get(self.url)
+        assert 'TicketViewSet.list' in logs.output[0]
+        detail = reverse('api:tickets-get-user-permissions', kwargs={
+            'team_slug': self.team.slug, 'project_slug': self.project.slug, 'slug': self.ticket.slug
+        })
+        with self.settings(REQUEST_BUDGETS={'default': {}, 'TicketViewSet': {'queries': 0}}):
+            with self.assertLogs('bugtracking.utils.timing', level='WARNING') as logs:
+                self.client.get(detail)
+        assert 'TicketViewSet.get_user_permissions' in logs.output[0]
+
+    def test_within_budget_not_logged(self):
+        self.client.force_authenticate(self.admin)
+        with self.settings(REQUEST_BUDGETS={'default': {'queries': 1000, 'ms': 60000}}):
+            with self.assertRaises(AssertionError):
+                with self.assertLogs('bugtracking.utils.timing', level='WARNING'):
+                    self.client.get(self.url)
+
+    def test_budget_lookup(self):
+        budgets = {'default': {'queries': 30}, 'TicketViewSet': {'queries': 20}, 'TicketViewSet.list': {'queries': 10}}
+        with self.settings(REQUEST_BUDGETS=budgets):
+            assert get_budget('TicketViewSet.list') == {'queries': 10}
+            assert get_budget('TicketViewSet.retrieve') == {'queries': 20}
+            assert get_budget('TeamViewSet.list') == {'queries': 30}
@@ -1,12 +1,18 @@
 # stdlib imports
 import datetime as dt
+from io import StringIO
+from unittest import mock
 
 # django core imports
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError, ObjectDoesNotExist, PermissionDenied
 from django.shortcuts import reverse
 from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
 
 # third party imports
 import pytest
@@ -18,9 +24,10 @@ from rest_framework.test import APITestCase, APIRequestFactory, force_authentica
 # my internal imports
 from bugtracking.users.models import User
 from bugtracking.tracker.models import (
-    Team, TeamMembership, Project, ProjectMembership, Ticket, Comment, TeamInvitation
+    Team, TeamMembership, Project, ProjectMembership, Ticket, Comment, TeamInvitation, OutgoingEmail
 )
 from bugtracking.tracker import views
+from bugtracking.tracker.api.pagination import TicketCursorPagination
 from .factories import model_setup as fac
 
 
@@ -661,6 +668,28 @@ class TestProjectViewSet(APITestCase):
         assert response.status_code == status.HTTP_403_FORBIDDEN
         assert Project.objects.all().count() == 1
 
+    def test_delete_queries_do_not_grow(self):
+        """The cascade deletes tickets, comments and memberships in bulk, not one by one."""
+        self.client.force_authenticate(self.admin)
+
+        def delete_project(size):
+            project = Project.objects.create(title=f'doomed {size}', description='desc', team=self.team)
+            for i in range(size):
+                member = user(username=f'doomed_{size}_{i}')
+                self.team.add_member(member)
+                project.add_member(member)
+                ticket = baker.make(Ticket, project=project, user=member)
+                baker.make(Comment, ticket=ticket, user=member, _quantity=2)
+            url = reverse('api:projects-detail', kwargs={'team_slug': self.team.slug, 'slug': project.slug})
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.delete(url)
+            assert response.status_code == status.HTTP_204_NO_CONTENT
+            return len(queries)
+
+        delete_project(1)  # warms the cached team slug lookup
+        assert delete_project(2) == delete_project(6) <= 20
+        assert Ticket.objects.filter(project__title__startswith='doomed').count() == 0
+
     def test_patching_new_manager_as_admin(self):
         """Can change manager. Only team admins can."""
         assert self.project.manager == self.manager
@@ -884,8 +913,8 @@ class TestTicketViewSet(APITestCase):
         self.client.force_authenticate(self.admin)
         response = self.client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data[0]['title'] == self.ticket.title
-        assert len(response.data) == 1
+        assert response.data['results'][0]['title'] == self.ticket.title
+        assert len(response.data['results']) == 1
 
     def test_list_manager(self):
         """Can view."""
@@ -893,8 +922,8 @@ class TestTicketViewSet(APITestCase):
         self.client.force_authenticate(self.manager)
         response = self.client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data[0]['title'] == self.ticket.title
-        assert len(response.data) == 1
+        assert response.data['results'][0]['title'] == self.ticket.title
+        assert len(response.data['results']) == 1
 
     def test_list_team_member(self):
         """Cannot view."""
@@ -1319,9 +1348,9 @@ class TestTicketViewSet(APITestCase):
         url = reverse('api:tickets-list', kwargs={'team_slug': self.team.slug, 'project_slug': self.project.slug})
         self.client.force_authenticate(self.admin)
         response = self.client.get(url)
-        assert len(response.data) == 1
-        assert response.data[0]['title'] != other_team_ticket.title
-        assert response.data[0]['title'] != other_project_ticket
+        assert len(response.data['results']) == 1
+        assert response.data['results'][0]['title'] != other_team_ticket.title
+        assert response.data['results'][0]['title'] != other_project_ticket
 
 
 class TestTeamInvitationViewSet(APITestCase):
@@ -1511,6 +1540,66 @@ class TestUsersTeamInvitationViewset(APITestCase):
         assert response.data[0]['id'] == str(other_team_invite.id)
 
 
+class TestBulkInvitations(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.team = base['team']
+        self.admin = base['admin']
+        self.member = base['member']
+        self.member.email = 'member@email.com'
+        self.member.save()
+        baker.make(TeamInvitation, team=self.team, invitee_email='invited@email.com')
+        self.url = reverse('api:invitations-bulk', kwargs={'team_slug': self.team.slug})
+
+    def test_bulk_invite_reports_every_address(self):
+        self.client.force_authenticate(self.admin)
+        emails = ['new@email.com', 'member@email.com', 'invited@email.com', 'not-an-email', 'new@email.com', 'other@email.com']
+        response = self.client.post(self.url, {'emails': emails})
+        assert response.status_code == status.HTTP_200_OK
+        assert [r['status'] for r in response.data['results']] == [
+            'invited', 'already_member', 'already_invited', 'invalid', 'duplicate', 'invited'
+        ]
+        assert response.data['invited'] == 2
+        assert TeamInvitation.objects.filter(team=self.team, invitee_email__in=['new@email.com', 'other@email.com']).count() == 2
+        call_command('send_queued_email', '--once', stdout=StringIO())
+        assert sorted(email.to[0] for email in mail.outbox) == ['new@email.com', 'other@email.com']
+        invitation = TeamInvitation.objects.get(invitee_email='new@email.com')
+        sent = [email for email in mail.outbox if email.to == ['new@email.com']][0]
+        html_body, mimetype = sent.alternatives[0]
+        assert str(invitation.id) in html_body
+
+    def test_members_and_invitations_matched_regardless_of_case(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(self.url, {'emails': ['Member@Email.com', 'INVITED@email.com']})
+        assert response.status_code == status.HTTP_200_OK
+        assert [r['status'] for r in response.data['results']] == ['already_member', 'already_invited']
+        assert response.data['invited'] == 0
+        assert TeamInvitation.objects.filter(team=self.team).count() == 1
+
+    def test_query_count_constant_in_number_of_addresses(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.get(pk=self.admin.pk))
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(self.url, {'emails': [f'few{i}@email.com' for i in range(3)]})
+        # measure both requests with a cold role cache
+        cache.clear()
+        self.client.force_authenticate(User.objects.get(pk=self.admin.pk))
+        with CaptureQueriesContext(connection) as many:
+            self.client.post(self.url, {'emails': [f'many{i}@email.com' for i in range(60)]})
+        assert len(few.captured_queries) == len(many.captured_queries)
+
+    def test_only_admins_can_bulk_invite(self):
+        self.client.force_authenticate(self.member)
+        response = self.client.post(self.url, {'emails': ['new@email.com']})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert not TeamInvitation.objects.filter(invitee_email='new@email.com').exists()
+
+    def test_empty_list_rejected(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(self.url, {'emails': []})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
 class TestInvitationEmailSending(APITestCase):
     def setUp(self) -> None:
         base = fac()
@@ -1524,9 +1613,14 @@ class TestInvitationEmailSending(APITestCase):
         url = reverse('api:invitations-list', kwargs={'team_slug': self.team.slug})
         self.client.force_authenticate(user)
         response = self.client.post(url, {'invitee_email': 'test@email.com'})
+        assert response.status_code == status.HTTP_201_CREATED
+        # invitation emails go through the outbox: nothing is sent until it's drained
+        assert len(mail.outbox) == 0
+        call_command('send_queued_email', '--once', stdout=StringIO())
         assert len(mail.outbox) == 1
+        assert OutgoingEmail.objects.get().status == OutgoingEmail.Status.SENT
         email = mail.outbox[0]
-        assert email.subject == 'Team Invitation'
+        assert email.subject == 'Team Invitation - Bugtracking.io'
         assert str(self.team.title) in email.body
         assert 'test@email.com' in email.to
 
@@ -2093,3 +2187,631 @@ class TestUserEndpoints(APITestCase):
         assert response.status_code == status.HTTP_404_NOT_FOUND
         self.member.refresh_from_db()
         assert self.member.username == 'member'
+
+class TestTicketListQueries(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.member = base['member']
+        self.developer = base['developer']
+        self.team = base['team']
+        self.project = base['project']
+        self.url = reverse('api:tickets-list', kwargs={'team_slug': self.team.slug, 'project_slug': self.project.slug})
+
+    def create_tickets(self, count):
+        for i in range(count):
+            ticket = Ticket.objects.create(
+                user=self.member, project=self.project, developer=self.developer, title=f'ticket {i}', description='desc'
+            )
+            Comment.objects.create(user=self.member, ticket=ticket, text='comment')
+
+    def count_list_queries(self, user):
+        cache.clear()  # measure each request with a cold role cache
+        self.client.force_authenticate(User.objects.get(pk=user.pk))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        assert response.status_code == status.HTTP_200_OK
+        return len(queries.captured_queries)
+
+    def test_query_count_constant_in_number_of_tickets(self):
+        """Listing 30 tickets costs the same number of queries as listing 3."""
+        for user in [self.admin, self.member]:
+            self.create_tickets(2)
+            few = self.count_list_queries(user)
+            self.create_tickets(27)
+            many = self.count_list_queries(user)
+            assert few == many
+
+
+class TestProjectListQueries(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.member = base['member']
+        self.team = base['team']
+        self.url = reverse('api:projects-list', kwargs={'team_slug': self.team.slug})
+
+    def create_projects(self, count):
+        for i in range(count):
+            project = Project.objects.create(title=f'project {Project.objects.count()}', description='desc', team=self.team)
+            ProjectMembership.objects.create(project=project, user=self.member)
+            project.make_manager(self.member)
+
+    def count_list_queries(self, user):
+        cache.clear()  # measure each request with a cold role cache
+        self.client.force_authenticate(User.objects.get(pk=user.pk))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        assert response.status_code == status.HTTP_200_OK
+        return len(queries.captured_queries), len(response.data)
+
+    def test_query_count_constant_in_number_of_projects(self):
+        """Listing 20 projects costs the same number of queries as listing 3."""
+        for user in [self.admin, self.member]:
+            self.create_projects(2)
+            few, few_rows = self.count_list_queries(user)
+            self.create_projects(17)
+            many, many_rows = self.count_list_queries(user)
+            assert many_rows == few_rows + 17
+            assert few == many
+
+class TestBulkTicketUpdate(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.manager = base['manager']
+        self.developer = base['developer']
+        self.member = base['member']
+        self.nonmember = base['nonmember']
+        self.team = base['team']
+        self.project = base['project']
+        self.tickets = [
+            Ticket.objects.create(user=self.member, project=self.project, developer=self.developer, title=f'bulk {i}', description='desc')
+            for i in range(3)
+        ]
+        self.unassigned = Ticket.objects.create(user=self.member, project=self.project, title='unassigned', description='desc')
+        self.url = reverse('api:tickets-bulk', kwargs={'team_slug': self.team.slug, 'project_slug': self.project.slug})
+
+    def post(self, user, slugs, changes):
+        self.client.force_authenticate(User.objects.get(pk=user.pk))
+        return self.client.post(self.url, {'slugs': slugs, 'changes': changes})
+
+    def test_manager_closes_tickets(self):
+        open_before = Project.objects.get(pk=self.project.pk).open_tickets_count
+        response = self.post(self.manager, [t.slug for t in self.tickets], {'is_open': False, 'resolution': 'Fixed.'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['updated'] == 3
+        assert all(not t.is_open and t.resolution == 'Fixed.' for t in Ticket.objects.filter(pk__in=[t.pk for t in self.tickets]))
+        assert Project.objects.get(pk=self.project.pk).open_tickets_count == open_before - 3
+
+    def test_per_ticket_permissions(self):
+        """The developer may edit their own tickets but not others; unknown slugs are reported, not fatal."""
+        slugs = [self.tickets[0].slug, self.unassigned.slug, 'no-such-ticket']
+        response = self.post(self.developer, slugs, {'priority': Ticket.Priorities.URGENT})
+        assert response.status_code == status.HTTP_200_OK
+        assert [r['status'] for r in response.data['results']] == ['updated', 'forbidden', 'not_found']
+        assert Ticket.objects.get(pk=self.tickets[0].pk).priority == Ticket.Priorities.URGENT
+        assert Ticket.objects.get(pk=self.unassigned.pk).priority == Ticket.Priorities.LOW
+
+    def test_reassigning_needs_manager_or_admin(self):
+        slugs = [t.slug for t in self.tickets]
+        response = self.post(self.developer, slugs, {'developer': self.member.username})
+        assert response.data['updated'] == 0
+        response = self.post(self.admin, slugs, {'developer': self.member.username})
+        assert response.data['updated'] == 3
+        assert set(Ticket.objects.filter(pk__in=[t.pk for t in self.tickets]).values_list('developer', flat=True)) == {self.member.pk}
+
+    def test_developer_must_be_project_member(self):
+        response = self.post(self.admin, [self.tickets[0].slug], {'developer': self.nonmember.username})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_nonmembers_forbidden(self):
+        response = self.post(self.nonmember, [self.tickets[0].slug], {'is_open': False})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_empty_changes_rejected(self):
+        response = self.post(self.admin, [self.tickets[0].slug], {})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_query_count_constant_in_number_of_tickets(self):
+        few_slugs = [t.slug for t in self.tickets]
+        many_slugs = [
+            Ticket.objects.create(user=self.member, project=self.project, title=f'many {i}', description='desc').slug
+            for i in range(30)
+        ]
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self.post(self.manager, few_slugs, {'priority': Ticket.Priorities.HIGH, 'is_open': False})
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            self.post(self.manager, many_slugs, {'priority': Ticket.Priorities.HIGH, 'is_open': False})
+        assert len(few.captured_queries) == len(many.captured_queries)
+
+
+class TestTicketPagination(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']
+        for i in range(6):
+            Ticket.objects.create(user=self.admin, project=self.project, title=f'ticket {i}', description='desc')
+        self.url = reverse('api:tickets-list', kwargs={'team_slug': self.team.slug, 'project_slug': self.project.slug})
+
+    def test_pages_cover_all_tickets_once(self):
+        """Following `next` cursors returns every ticket exactly once, newest first."""
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url, {'page_size': 3})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['previous'] is None
+        slugs = [ticket['slug'] for ticket in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            slugs += [ticket['slug'] for ticket in response.data['results']]
+        expected = list(Ticket.objects.filter(project=self.project).order_by('-created', '-id').values_list('slug', flat=True))
+        assert slugs == expected
+        assert len(slugs) == 7
+
+    def test_page_size_query_param(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url, {'page_size': 2})
+        assert len(response.data['results']) == 2
+        assert 'cursor=' in response.data['next']
+
+
+class TestTicketFiltering(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.developer = base['developer']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']  # open, low priority, developer assigned, created by admin
+        self.urgent = Ticket.objects.create(
+            user=self.developer, project=self.project, developer=self.developer, title='urgent',
+            priority=Ticket.Priorities.URGENT,
+        )
+        self.closed = Ticket.objects.create(
+            user=self.admin, project=self.project, title='closed', priority=Ticket.Priorities.URGENT, is_open=False,
+        )
+        self.high = Ticket.objects.create(user=self.admin, project=self.project, title='high', priority=Ticket.Priorities.HIGH)
+        self.url = reverse('api:tickets-list', kwargs={'team_slug': self.team.slug, 'project_slug': self.project.slug})
+        self.client.force_authenticate(self.admin)
+
+    def titles(self, params):
+        response = self.client.get(self.url, params)
+        assert response.status_code == status.HTTP_200_OK, response.data
+        return [ticket['title'] for ticket in response.data['results']]
+
+    def test_filters(self):
+        assert self.titles({'is_open': 'false'}) == ['closed']
+        assert self.titles({'is_open': 'true', 'priority': Ticket.Priorities.URGENT}) == ['urgent']
+        assert self.titles({'priority': '2,3'}) == ['high', 'closed', 'urgent']
+        assert self.titles({'developer': 'developer', 'is_open': 'true'}) == ['urgent', 'ticket_title']
+        assert self.titles({'developer': ''}) == ['high', 'closed']
+        assert self.titles({'user': 'developer'}) == ['urgent']
+        assert self.titles({'user': 'nobody'}) == []
+
+    def test_invalid_filters(self):
+        assert self.client.get(self.url, {'is_open': 'maybe'}).status_code == status.HTTP_400_BAD_REQUEST
+        assert self.client.get(self.url, {'priority': '9'}).status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_ordering(self):
+        assert self.titles({'ordering': '-priority'}) == ['closed', 'urgent', 'high', 'ticket_title']
+        assert self.titles({'ordering': 'priority'}) == ['ticket_title', 'high', 'urgent', 'closed']
+        Ticket.objects.filter(pk=self.ticket.pk).update(modified=self.closed.modified + dt.timedelta(minutes=1))
+        assert self.titles({'ordering': '-modified'})[0] == 'ticket_title'
+        # unknown fields are ignored
+        assert self.titles({'ordering': 'title'}) == ['high', 'closed', 'urgent', 'ticket_title']
+
+    def test_ordered_pages_cover_all_tickets_once(self):
+        response = self.client.get(self.url, {'ordering': '-priority', 'page_size': 1})
+        titles = [ticket['title'] for ticket in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            titles += [ticket['title'] for ticket in response.data['results']]
+        assert titles == ['closed', 'urgent', 'high', 'ticket_title']
+
+    def test_pages_of_tied_tickets_go_past_the_offset_cutoff(self):
+        """Paging through tickets of one priority, both ways, needs no offset that the cutoff could stop."""
+        for i in range(6):
+            Ticket.objects.create(user=self.admin, project=self.project, title=f'high {i}', priority=Ticket.Priorities.HIGH)
+        expected = list(
+            Ticket.objects.filter(project=self.project, priority=Ticket.Priorities.HIGH)
+            .order_by('priority', 'created', 'id').values_list('title', flat=True)
+        )
+        with mock.patch.object(TicketCursorPagination, 'offset_cutoff', 2):
+            response = self.client.get(self.url, {'ordering': 'priority', 'priority': 2, 'page_size': 2})
+            titles = [ticket['title'] for ticket in response.data['results']]
+            while response.data['next']:
+                response = self.client.get(response.data['next'])
+                titles += [ticket['title'] for ticket in response.data['results']]
+            assert titles == expected
+            backwards = [ticket['title'] for ticket in response.data['results']]
+            while response.data['previous']:
+                response = self.client.get(response.data['previous'])
+                backwards = [ticket['title'] for ticket in response.data['results']] + backwards
+            assert backwards == expected
+
+    def test_cursor_for_another_ordering_is_rejected(self):
+        response = self.client.get(self.url, {'ordering': 'priority', 'page_size': 1})
+        next_url = response.data['next'].replace('ordering=priority', 'ordering=created')
+        assert self.client.get(next_url).status_code == status.HTTP_404_NOT_FOUND
+
+    def list_query_plan(self, params):
+        """The query plan of the statement that loads the page of tickets, as one string."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, params)
+        sql = next(query['sql'] for query in queries.captured_queries if '"tracker_ticket"."priority"' in query['sql'])
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # with a handful of rows Postgres would rightly prefer a sequential scan
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return ' '.join(str(row) for row in cursor.fetchall())
+
+    def test_open_by_priority_uses_index(self):
+        assert 'ticket_open_priority_idx' in self.list_query_plan({'is_open': 'true', 'priority': 3})
+        assert 'ticket_open_priority_idx' in self.list_query_plan({'is_open': 'true', 'ordering': '-priority'})
+
+    def test_developers_open_tickets_use_index(self):
+        plan = self.list_query_plan({'developer': 'developer', 'is_open': 'true', 'priority': 3})
+        assert 'ticket_developer_open_idx' in plan
+
+    def test_comment_summary_needs_no_group_by(self):
+        self.ticket.comments.all().delete()
+        for text in ['first', 'second']:
+            Comment.objects.create(user=self.admin, ticket=self.high, text=text)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        sql = next(query['sql'] for query in queries.captured_queries if '"tracker_ticket"."priority"' in query['sql'])
+        assert 'GROUP BY "tracker_ticket"' not in sql
+        counts = {ticket['title']: ticket['comment_count'] for ticket in response.data['results']}
+        assert counts == {'closed': 0, 'urgent': 0, 'high': 2, 'ticket_title': 0}
+
+    def test_ordering_by_modified_uses_index(self):
+        plan = self.list_query_plan({'ordering': '-modified', 'omit': 'comments,comment_count'})
+        assert 'ticket_project_modified_idx' in plan
+
+
+class TestCommentViewSet(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.member = base['member']
+        self.nonmember = base['nonmember']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']
+        for i in range(5):
+            Comment.objects.create(user=self.member, ticket=self.ticket, text=f'comment {i}')
+        self.url = reverse('api:comments-list', kwargs={
+            'team_slug': self.team.slug, 'project_slug': self.project.slug, 'ticket_slug': self.ticket.slug
+        })
+        self.ticket_url = reverse('api:tickets-detail', kwargs={
+            'team_slug': self.team.slug, 'project_slug': self.project.slug, 'slug': self.ticket.slug
+        })
+
+    def test_list_member(self):
+        """Can view, newest first, paginated."""
+        self.client.force_authenticate(self.member)
+        response = self.client.get(self.url, {'page_size': 2})
+        assert response.status_code == status.HTTP_200_OK
+        assert [comment['text'] for comment in response.data['results']] == ['comment 4', 'comment 3']
+        response = self.client.get(response.data['next'])
+        assert [comment['text'] for comment in response.data['results']] == ['comment 2', 'comment 1']
+
+    def test_list_nonmember(self):
+        """Cannot view."""
+        self.client.force_authenticate(self.nonmember)
+        response = self.client.get(self.url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_post_member(self):
+        """Can post."""
+        self.client.force_authenticate(self.member)
+        response = self.client.post(self.url, {'text': 'new comment'})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert self.ticket.comments.count() == 6
+        assert self.ticket.comments.first().user == self.member
+
+    def test_post_nonmember(self):
+        """Cannot post."""
+        self.client.force_authenticate(self.nonmember)
+        response = self.client.post(self.url, {'text': 'new comment'})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert self.ticket.comments.count() == 5
+
+    def test_ticket_embeds_only_recent_comments(self):
+        self.client.force_authenticate(self.member)
+        response = self.client.get(self.ticket_url)
+        assert response.data['comment_count'] == 5
+        assert [comment['text'] for comment in response.data['comments']] == ['comment 4', 'comment 3', 'comment 2']
+        assert response.data['comments_list'].endswith(self.url)
+
+
+class TestNestedRoutes(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']
+        self.other_project = Project.objects.create(team=self.team, title='other project', description='desc')
+        Comment.objects.create(user=self.admin, ticket=self.ticket, text='comment')
+        self.client.force_authenticate(self.admin)
+
+    def comments_url(self, project_slug, ticket_slug):
+        return reverse('api:comments-list', kwargs={
+            'team_slug': self.team.slug, 'project_slug': project_slug, 'ticket_slug': ticket_slug
+        })
+
+    def test_comments_route_resolved_in_one_query(self):
+        url = self.comments_url(self.project.slug, self.ticket.slug)
+        self.client.get(url)  # warm the access cache
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        route_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "tracker_team"' in query['sql'] or 'FROM "tracker_project"' in query['sql']
+            or ('FROM "tracker_ticket"' in query['sql'] and '"tracker_ticket"."slug"' in query['sql'])
+        ]
+        assert len(route_queries) == 1
+        assert 'INNER JOIN "tracker_team"' in route_queries[0]
+
+    def test_ticket_scoped_by_project(self):
+        response = self.client.get(self.comments_url(self.other_project.slug, self.ticket.slug))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_project_scoped_by_team(self):
+        other_team = Team.objects.create_new(title='other team', description='desc', creator=self.admin)
+        url = reverse('api:tickets-list', kwargs={'team_slug': other_team.slug, 'project_slug': self.project.slug})
+        response = self.client.get(url)
+        assert response.status_code in (status.HTTP_403_FORBIDDEN, status.HTTP_404_NOT_FOUND)
+
+    def test_ticket_create_uses_resolved_project(self):
+        url = reverse('api:tickets-list', kwargs={'team_slug': self.team.slug, 'project_slug': self.project.slug})
+        response = self.client.post(url, {'title': 'new ticket', 'description': 'desc'})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Ticket.objects.get(title='new ticket').project == self.project
+
+
+class TestConditionalRetrieve(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.member = base['member']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']
+        self.ticket_url = reverse('api:tickets-detail', kwargs={
+            'team_slug': self.team.slug, 'project_slug': self.project.slug, 'slug': self.ticket.slug
+        })
+        self.project_url = reverse('api:projects-detail', kwargs={'team_slug': self.team.slug, 'slug': self.project.slug})
+        self.client.force_authenticate(self.admin)
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_ticket_not_modified(self):
+        response = self.client.get(self.ticket_url)
+        assert response.status_code == status.HTTP_200_OK
+        etag = response['ETag']
+        assert response['Last-Modified']
+        with mock.patch('bugtracking.tracker.api.serializers.TicketSerializer.to_representation') as to_representation:
+            response = self.revalidate(self.ticket_url, etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response['ETag'] == etag
+        assert not to_representation.called
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.ticket_url)
+        response = self.client.get(self.ticket_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_ticket_changes_invalidate(self):
+        etag = self.client.get(self.ticket_url)['ETag']
+        self.ticket.priority = Ticket.Priorities.URGENT
+        self.ticket.save()
+        response = self.revalidate(self.ticket_url, etag)
+        assert response.status_code == status.HTTP_200_OK
+        etag = response['ETag']
+        Comment.objects.create(user=self.admin, ticket=self.ticket, text='new comment')
+        response = self.revalidate(self.ticket_url, etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['comment_count'] == 1
+
+    def test_username_change_invalidates(self):
+        etag = self.client.get(self.ticket_url)['ETag']
+        assert self.revalidate(self.ticket_url, etag).status_code == status.HTTP_304_NOT_MODIFIED
+        self.admin.username = 'renamed'
+        self.admin.save()
+        response = self.revalidate(self.ticket_url, etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['user'] == 'renamed'
+
+    def test_other_tickets_changes_leave_etag_alone(self):
+        etag = self.client.get(self.ticket_url)['ETag']
+        other = Ticket.objects.create(user=self.admin, project=self.project, title='another', description='desc')
+        other.priority = Ticket.Priorities.URGENT
+        other.save()
+        Comment.objects.create(user=self.admin, ticket=other, text='elsewhere')
+        assert self.revalidate(self.ticket_url, etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_comment_author_rename_invalidates(self):
+        Comment.objects.create(user=self.member, ticket=self.ticket, text='new comment')
+        etag = self.client.get(self.ticket_url)['ETag']
+        self.member.username = 'renamed'
+        self.member.save()
+        response = self.revalidate(self.ticket_url, etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['comments'][0]['user'] == 'renamed'
+
+    def test_etag_per_user_and_fieldset(self):
+        etag = self.client.get(self.ticket_url)['ETag']
+        assert self.client.get(self.ticket_url, {'fields': 'title'})['ETag'] != etag
+        self.client.force_authenticate(self.member)
+        assert self.revalidate(self.ticket_url, etag).status_code == status.HTTP_200_OK
+
+    def test_project_membership_change_invalidates(self):
+        response = self.client.get(self.project_url)
+        etag = response['ETag']
+        assert self.revalidate(self.project_url, etag).status_code == status.HTTP_304_NOT_MODIFIED
+        self.project.remove_member(self.member)
+        response = self.revalidate(self.project_url, etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert 'member' not in [membership['user'] for membership in response.data['memberships']]
+
+    def test_project_member_rename_invalidates(self):
+        etag = self.client.get(self.project_url)['ETag']
+        self.member.username = 'renamed'
+        self.member.save()
+        response = self.revalidate(self.project_url, etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert 'renamed' in [membership['user'] for membership in response.data['memberships']]
+
+    def test_project_ticket_counts_invalidate(self):
+        etag = self.client.get(self.project_url)['ETag']
+        Ticket.objects.create(user=self.admin, project=self.project, title='another', description='desc')
+        assert self.revalidate(self.project_url, etag).status_code == status.HTTP_200_OK
+
+
+class TestTeamChangeVersion(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.member = base['member']
+        self.nonmember = base['nonmember']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']
+        self.tickets_url = reverse('api:tickets-list', kwargs={'team_slug': self.team.slug, 'project_slug': self.project.slug})
+        self.client.force_authenticate(self.admin)
+
+    def version(self):
+        response = self.client.get(self.tickets_url)
+        return int(response['X-Team-Version'])
+
+    def test_version_bumped_by_writes(self):
+        writes = [
+            lambda: Ticket.objects.create(user=self.admin, project=self.project, title='new', description='desc'),
+            lambda: Comment.objects.create(user=self.admin, ticket=self.ticket, text='comment'),
+            lambda: Ticket.objects.filter(pk=self.ticket.pk).update(priority=Ticket.Priorities.URGENT),
+            lambda: self.project.remove_member(self.member),
+            lambda: self.team.add_member(self.nonmember),
+            lambda: TeamInvitation.objects.create(team=self.team, inviter=self.admin, invitee_email='new@email.com'),
+            lambda: Project.objects.create(team=self.team, title='another project', description='desc'),
+        ]
+        version = self.version()
+        for write in writes:
+            write()
+            new_version = self.version()
+            assert new_version > version
+            version = new_version
+
+    def test_other_teams_writes_leave_version_alone(self):
+        version = self.version()
+        other_team = Team.objects.create_new(title='other team', description='desc', creator=self.admin)
+        other_project = Project.objects.create(team=other_team, title='other project', description='desc')
+        Ticket.objects.create(user=self.admin, project=other_project, title='elsewhere', description='desc')
+        assert self.version() == version
+
+    def test_list_not_modified_until_team_changes(self):
+        response = self.client.get(self.tickets_url)
+        etag = response['ETag']
+        response = self.client.get(self.tickets_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        # a different page, filter or fieldset is a different list
+        assert self.client.get(self.tickets_url, {'is_open': 'true'}, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+        Comment.objects.create(user=self.admin, ticket=self.ticket, text='comment')
+        response = self.client.get(self.tickets_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+
+    def test_list_served_from_cache(self):
+        first = self.client.get(self.tickets_url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.tickets_url)
+        assert second.data == first.data
+        assert not [query for query in queries.captured_queries if 'FROM "tracker_ticket"' in query['sql']]
+        # the cache is per user
+        self.client.force_authenticate(self.member)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.tickets_url)
+        assert [query for query in queries.captured_queries if 'FROM "tracker_ticket"' in query['sql']]
+
+    def test_teams_list_changes_when_user_joins_a_team(self):
+        url = reverse('api:teams-list')
+        etag = self.client.get(url)['ETag']
+        other_team = Team.objects.create_new(title='other team', description='desc', creator=self.nonmember)
+        other_team.add_member(self.admin)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 2
+
+    def test_renaming_a_user_changes_their_teams_lists(self):
+        response = self.client.get(self.tickets_url)
+        etag = response['ETag']
+        self.admin.username = 'renamed'
+        self.admin.save()
+        response = self.client.get(self.tickets_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'][0]['user'] == 'renamed'
+        # saves that leave the shown fields alone don't
+        etag = response['ETag']
+        self.admin.save(update_fields=['last_login'])
+        assert self.client.get(self.tickets_url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_no_version_for_outsiders(self):
+        self.client.force_authenticate(self.nonmember)
+        response = self.client.get(self.tickets_url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert 'X-Team-Version' not in response
+
+
+class TestSparseFieldsets(APITestCase):
+    def setUp(self) -> None:
+        base = fac()
+        self.admin = base['admin']
+        self.team = base['team']
+        self.project = base['project']
+        self.ticket = base['ticket']
+        Comment.objects.create(user=self.admin, ticket=self.ticket, text='comment')
+        self.tickets_url = reverse('api:tickets-list', kwargs={'team_slug': self.team.slug, 'project_slug': self.project.slug})
+        self.projects_url = reverse('api:projects-list', kwargs={'team_slug': self.team.slug})
+        self.client.force_authenticate(self.admin)
+
+    def test_fields_limits_ticket_output(self):
+        response = self.client.get(self.tickets_url, {'fields': 'title,slug,priority'})
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data['results'][0].keys()) == {'title', 'slug', 'priority'}
+
+    def test_omit_removes_ticket_fields(self):
+        response = self.client.get(self.tickets_url, {'omit': 'comments,user_permissions'})
+        ticket = response.data['results'][0]
+        assert 'comments' not in ticket
+        assert 'user_permissions' not in ticket
+        assert ticket['title'] == self.ticket.title
+
+    def test_unrequested_columns_and_comments_not_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.tickets_url, {'fields': 'title,slug,priority'})
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        assert 'tracker_comment' not in sql
+        assert '"tracker_ticket"."description"' not in sql
+        assert '"tracker_ticket"."resolution"' not in sql
+
+    def test_fields_skips_project_open_tickets_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.projects_url, {'fields': 'title,slug'})
+        assert set(response.data[0].keys()) == {'title', 'slug'}
+        assert not any('"tracker_ticket"' in query['sql'] for query in queries.captured_queries)
+
+    def test_fields_ignored_on_writes(self):
+        response = self.client.post(self.tickets_url + '?fields=title', {'title': 'new ticket', 'description': 'desc'})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert 'description' in response.data
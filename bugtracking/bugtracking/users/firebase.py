@@ -0,0 +1,344 @@
+# std lib imports
+import datetime as dt
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+# django imports
+from django.conf import settings
+from django.core.cache import cache
+
+# third party imports
+import requests
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from drf_firebase_auth.settings import api_settings
+from google.auth import crypt, exceptions as google_exceptions, jwt as google_jwt
+
+# my internal imports
+from bugtracking.utils import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+# LOCAL ID-TOKEN VERIFICATION
+# Firebase ID tokens are RS256 JWTs signed with one of a handful of Google keys that rotate every few hours.
+# Instead of asking Firebase about every token (firebase_admin's verify_id_token with check_revoked, plus get_user),
+# we keep the published certificates in memory for as long as Google's Cache-Control allows, check the signature and
+# claims ourselves, and compare the token's issue time against a revocation list that `sync_firebase_revocations`
+# refreshes in the shared cache. Firebase itself is only contacted to fetch keys and the first time a uid is seen.
+
+class TokenError(Exception):
+    """The token could not be verified. `revoked` is set when it was valid but has since been revoked."""
+    def __init__(self, message, revoked=False):
+        super().__init__(message)
+        self.revoked = revoked
+
+
+def _project_id():
+    if settings.FIREBASE_PROJECT_ID:
+        return settings.FIREBASE_PROJECT_ID
+    import firebase_admin  # initialized by drf_firebase_auth from the service account key
+    return firebase_admin.get_app().project_id
+
+
+def _fetch_certificates(url):
+    """Returns ({kid: pem certificate}, seconds they may be cached for). `file://` urls are read from disk."""
+    if url.startswith('file://'):
+        with open(url[len('file://'):]) as f:
+            return json.load(f), settings.FIREBASE_PUBLIC_KEYS_MIN_CACHE
+    metrics.count_firebase_call('certificates')
+    response = requests.get(url, timeout=5)
+    response.raise_for_status()
+    match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+    max_age = int(match.group(1)) if match else 0
+    return response.json(), max(max_age, settings.FIREBASE_PUBLIC_KEYS_MIN_CACHE)
+
+
+class PublicKeyCache:
+    """
+    Google's signing certificates, held per process until they expire.
+    A token signed with a kid we haven't seen forces an early refresh (at most once per minimum cache period),
+    since that's what a key rotation looks like from here.
+    """
+    def __init__(self, url=None):
+        self.url = url
+        self._lock = threading.Lock()
+        self._certificates = {}
+        self._expires_at = 0
+        self._fetched_at = 0
+
+    def _refresh(self):
+        certificates, max_age = _fetch_certificates(self.url or settings.FIREBASE_PUBLIC_KEYS_URL)
+        now = time.monotonic()
+        self._certificates, self._expires_at, self._fetched_at = certificates, now + max_age, now
+
+    def _needs_refresh(self, kid):
+        now = time.monotonic()
+        if now >= self._expires_at:
+            return True
+        # a kid we don't know may be a rotation, but don't let made-up kids send us to Google on every request
+        return kid not in self._certificates and now - self._fetched_at >= settings.FIREBASE_PUBLIC_KEYS_MIN_CACHE
+
+    def get(self, kid):
+        if self._needs_refresh(kid):
+            with self._lock:
+                if self._needs_refresh(kid):  # another thread may have just refreshed
+                    try:
+                        self._refresh()
+                    except (requests.RequestException, OSError, ValueError):
+                        if not self._certificates:
+                            raise TokenError('Could not fetch the public keys to verify the token.')
+                        # keep using what we have for a little longer rather than retrying on every request
+                        self._fetched_at = time.monotonic()
+                        self._expires_at = self._fetched_at + settings.FIREBASE_PUBLIC_KEYS_MIN_CACHE
+        return self._certificates
+
+    def clear(self):
+        with self._lock:
+            self._certificates, self._expires_at, self._fetched_at = {}, 0, 0
+
+
+public_keys = PublicKeyCache()
+
+
+REVOCATIONS_CACHE_KEY = 'users:firebase:revocations'
+
+
+class RevocationList:
+    """
+    {uid: unix time} - tokens for that uid issued before that time are revoked (`float('inf')` for disabled users).
+    The list lives in the shared cache, where `sync_firebase_revocations` replaces it; each process re-reads it every
+    FIREBASE_REVOCATIONS_REFRESH_INTERVAL seconds. If the list can't be read (Redis unreachable, or the key evicted
+    until the next sync), the process keeps the copy it has rather than accepting every revoked token again. Users
+    first seen by this process are added as their records are fetched, so a freshly revoked user who hasn't been
+    synced yet is still caught on their next first sight.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._valid_after = {}
+        self._local = {}
+        self._loaded_at = None
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= settings.FIREBASE_REVOCATIONS_REFRESH_INTERVAL:
+            valid_after = cache.get(REVOCATIONS_CACHE_KEY)
+            metrics.count_cache_lookup('firebase_revocations', valid_after is not None)
+            with self._lock:
+                if valid_after is not None:
+                    self._valid_after = valid_after
+                elif self._valid_after:
+                    logger.warning(
+                        'Firebase revocation list missing from the cache; keeping the %d entries loaded before',
+                        len(self._valid_after),
+                    )
+                self._loaded_at = now
+
+    def valid_after(self, uid):
+        self._maybe_reload()
+        with self._lock:
+            return max(self._valid_after.get(uid, 0), self._local.get(uid, 0))
+
+    def note(self, uid, valid_after):
+        with self._lock:
+            self._local[uid] = valid_after
+
+    def is_revoked(self, uid, issued_at):
+        return issued_at < self.valid_after(uid)
+
+    def publish(self, valid_after):
+        """Replaces the shared list (used by `sync_firebase_revocations`)."""
+        cache.set(REVOCATIONS_CACHE_KEY, valid_after, None)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._valid_after, self._local, self._loaded_at = {}, {}, None
+
+
+revocations = RevocationList()
+
+
+def revocation_time(firebase_user):
+    """The time before which the user's tokens are no longer valid, from a Firebase user record."""
+    if firebase_user.disabled:
+        return float('inf')
+    # Firebase reports this in milliseconds
+    return (firebase_user.tokens_valid_after_timestamp or 0) / 1000
+
+
+def verify_id_token(token):
+    """
+    Verifies a Firebase ID token locally and returns its claims (with `uid` added, as firebase_admin does).
+    Raises TokenError if the token is malformed, badly signed, expired, meant for another project or revoked.
+    """
+    if isinstance(token, bytes):
+        token = token.decode('utf-8')
+    try:
+        header = google_jwt.decode_header(token)
+    except (ValueError, google_exceptions.GoogleAuthError):
+        raise TokenError('Token is invalid.')
+    if header.get('alg') != 'RS256' or not header.get('kid'):
+        raise TokenError('Token is invalid.')
+    certificates = public_keys.get(header['kid'])
+    if header['kid'] not in certificates:
+        raise TokenError('Token is invalid.')
+    project_id = _project_id()
+    try:
+        # google-auth 1.x allows its own 10s of clock skew on iat and exp; it takes no leeway argument
+        claims = google_jwt.decode(token, certs={header['kid']: certificates[header['kid']]}, audience=project_id)
+    except (ValueError, google_exceptions.GoogleAuthError):
+        raise TokenError('Token is invalid.')
+    if claims.get('iss') != f'https://securetoken.google.com/{project_id}':
+        raise TokenError('Token is invalid.')
+    uid = claims.get('sub')
+    if not uid or not isinstance(uid, str) or len(uid) > 128:
+        raise TokenError('Token is invalid.')
+    if claims.get('auth_time', 0) > time.time() + 10:
+        raise TokenError('Token is invalid.')
+    claims['uid'] = uid
+    if api_settings.FIREBASE_CHECK_JWT_REVOKED and revocations.is_revoked(uid, claims['iat']):
+        raise TokenError('Token revoked.', revoked=True)
+    return claims
+
+
+# FIREBASE USER RECORDS
+# The authentication backend needs a user record (email, display name, providers) for every request. It's fetched
+# from Firebase the first time a uid is seen and kept in the shared cache after that.
+
+def _user_record_key(uid):
+    return f'users:firebase:user:{uid}'
+
+
+def _snapshot(firebase_user):
+    """A picklable copy of the parts of a firebase_admin UserRecord the authentication backend uses."""
+    return SimpleNamespace(
+        uid=firebase_user.uid,
+        email=firebase_user.email,
+        email_verified=firebase_user.email_verified,
+        display_name=firebase_user.display_name,
+        disabled=firebase_user.disabled,
+        tokens_valid_after_timestamp=firebase_user.tokens_valid_after_timestamp,
+        provider_data=[
+            SimpleNamespace(provider_id=p.provider_id, uid=p.uid, email=p.email) for p in firebase_user.provider_data
+        ],
+    )
+
+
+def user_record_from_claims(claims):
+    """Builds a user record from the token alone, for running against LocalTokenIssuer without Firebase."""
+    identities = claims.get('firebase', {}).get('identities', {})
+    provider_id = claims.get('firebase', {}).get('sign_in_provider', 'password')
+    return SimpleNamespace(
+        uid=claims['uid'],
+        email=claims.get('email'),
+        email_verified=claims.get('email_verified', False),
+        display_name=claims.get('name'),
+        disabled=False,
+        tokens_valid_after_timestamp=None,
+        provider_data=[SimpleNamespace(
+            provider_id=provider_id, uid=(identities.get(provider_id) or [claims['uid']])[0], email=claims.get('email')
+        )],
+    )
+
+
+def get_user_record(claims):
+    """The Firebase user record for a verified token's uid: from the cache, or from Firebase on first sight."""
+    from firebase_admin import auth as firebase_auth
+    uid = claims['uid']
+    record = cache.get(_user_record_key(uid))
+    metrics.count_cache_lookup('firebase_user_record', record is not None)
+    if record is None:
+        if settings.FIREBASE_USER_RECORDS_FROM_TOKEN:
+            record = user_record_from_claims(claims)
+        else:
+            metrics.count_firebase_call('get_user')
+            record = _snapshot(firebase_auth.get_user(uid))
+        cache.set(_user_record_key(uid), record, settings.FIREBASE_USER_RECORD_CACHE_TIMEOUT)
+        revocations.note(uid, revocation_time(record))
+    return record
+
+
+def forget_user_record(uid):
+    cache.delete(_user_record_key(uid))
+
+
+# LOCAL STAND-IN ISSUER
+class LocalTokenIssuer:
+    """
+    Signs Firebase-shaped ID tokens with a key of its own, so local verification can be tested and benchmarked with
+    no network access. Point FIREBASE_PUBLIC_KEYS_URL at the file written by `write_certificates()` (as a `file://`
+    url), set FIREBASE_USER_RECORDS_FROM_TOKEN, and the tokens from `issue()` verify like real ones.
+    """
+    def __init__(self, private_key_pem=None, project_id=None, kid=None):
+        if private_key_pem is None:
+            self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        else:
+            self.private_key = serialization.load_pem_private_key(private_key_pem, password=None)
+        self.project_id = project_id or _project_id()
+        self.kid = kid or uuid.uuid4().hex
+        self._signer = crypt.RSASigner.from_string(self.private_key_pem, key_id=self.kid)
+
+    @classmethod
+    def from_key_file(cls, path, kid='local-token-issuer'):
+        """The issuer whose signing key is kept at `path`, creating the key if there isn't one yet."""
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return cls(f.read(), kid=kid)
+        issuer = cls(kid=kid)
+        with open(path, 'wb') as f:
+            f.write(issuer.private_key_pem)
+        return issuer
+
+    @property
+    def private_key_pem(self):
+        return self.private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+
+    @property
+    def certificates(self):
+        """{kid: pem certificate}, in the same shape Google publishes."""
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'local-token-issuer')])
+        now = dt.datetime.utcnow()
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(self.private_key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - dt.timedelta(days=1))
+            .not_valid_after(now + dt.timedelta(days=3650))
+            .sign(self.private_key, hashes.SHA256())
+        )
+        return {self.kid: certificate.public_bytes(serialization.Encoding.PEM).decode('utf-8')}
+
+    def write_certificates(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.certificates, f)
+
+    def issue(self, uid, email=None, name=None, issued_at=None, lifetime=3600, **claims):
+        issued_at = int(issued_at if issued_at is not None else time.time())
+        payload = {
+            'iss': f'https://securetoken.google.com/{self.project_id}',
+            'aud': self.project_id,
+            'sub': uid,
+            'user_id': uid,
+            'iat': issued_at,
+            'auth_time': issued_at,
+            'exp': issued_at + lifetime,
+            'email': email,
+            'email_verified': email is not None,
+            'name': name,
+            'firebase': {'sign_in_provider': 'password', 'identities': {'email': [email]} if email else {}},
+        }
+        payload.update(claims)
+        return google_jwt.encode(self._signer, payload, header={'kid': self.kid}).decode('utf-8')
@@ -0,0 +1,126 @@
+# std lib imports
+import atexit
+import threading
+import time
+
+# django imports
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.utils import timezone
+
+# third party imports
+
+# my internal imports
+
+
+# UID -> USER CACHE
+# Once a Firebase uid has been matched to a local user, the user's id is kept in the shared cache under the uid, and
+# the user under its id, so an authenticated request costs no queries at all. The uid's entry lasts
+# FIREBASE_UID_CACHE_TIMEOUT (a uid only changes users when its FirebaseIdentity is deleted, see `signals.py`), but
+# the user's only FIREBASE_UID_USER_CACHE_TIMEOUT: saving the user drops it straight away, and writes that skip the
+# signals (queryset updates such as a bulk deactivation, raw SQL) show up once it expires, at the cost of one query.
+
+def _uid_key(uid):
+    return f'users:firebase:uid:{uid}'
+
+
+def _user_key(user_pk):
+    return f'users:firebase:local-user:{user_pk}'
+
+
+def get_cached_user(uid):
+    """The local user the uid was last matched to, or None if it has to be matched again."""
+    user_pk = cache.get(_uid_key(uid))
+    if user_pk is None:
+        return None
+    user = cache.get(_user_key(user_pk))
+    if user is None:
+        user = get_user_model().objects.filter(pk=user_pk).first()
+        if user is None:
+            forget_uid(uid)
+            return None
+        cache.set(_user_key(user_pk), user, settings.FIREBASE_UID_USER_CACHE_TIMEOUT)
+    return user
+
+
+def remember_user(uid, user):
+    # one key per uid and one per user, so concurrent first sign-ins can't overwrite each other's entries
+    cache.set(_uid_key(uid), user.pk, settings.FIREBASE_UID_CACHE_TIMEOUT)
+    cache.set(_user_key(user.pk), user, settings.FIREBASE_UID_USER_CACHE_TIMEOUT)
+
+
+def forget_user(user_pk):
+    cache.delete(_user_key(user_pk))
+
+
+def forget_uid(uid):
+    cache.delete(_uid_key(uid))
+
+
+# WRITE-BEHIND LAST_LOGIN
+class LastLoginBuffer:
+    """
+    Collects last_login updates and writes them in one bulk UPDATE, instead of saving the user on every request.
+    Each user is touched at most once per LAST_LOGIN_UPDATE_INTERVAL (across all workers, through the shared cache),
+    and pending updates are flushed after a request finishes once the oldest has waited LAST_LOGIN_FLUSH_INTERVAL
+    seconds or LAST_LOGIN_FLUSH_SIZE have built up. last_login is advisory, so anything still pending when a worker
+    dies is simply lost.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._oldest = None
+        self._touched = {}
+
+    def touch(self, user):
+        now = time.monotonic()
+        interval = settings.LAST_LOGIN_UPDATE_INTERVAL
+        with self._lock:
+            if now - self._touched.get(user.pk, -interval) < interval:
+                return
+            self._touched[user.pk] = now
+        # False means another worker touched this user recently; None means the cache is unreachable, so go ahead
+        if cache.add(f'users:last-login:{user.pk}', True, interval) is False:
+            return
+        user.last_login = timezone.now()
+        with self._lock:
+            self._pending[user.pk] = user.last_login
+            if self._oldest is None:
+                self._oldest = now
+
+    def flush_if_due(self):
+        with self._lock:
+            if not self._pending:
+                return
+            due = time.monotonic() - self._oldest >= settings.LAST_LOGIN_FLUSH_INTERVAL
+            due = due or len(self._pending) >= settings.LAST_LOGIN_FLUSH_SIZE
+        if due:
+            self.flush()
+
+    def flush(self):
+        expired = time.monotonic() - settings.LAST_LOGIN_UPDATE_INTERVAL
+        with self._lock:
+            pending, self._pending, self._oldest = self._pending, {}, None
+            self._touched = {pk: at for pk, at in self._touched.items() if at > expired}
+        if pending:
+            User = get_user_model()
+            User.objects.bulk_update(
+                [User(pk=pk, last_login=last_login) for pk, last_login in pending.items()], ['last_login']
+            )
+
+    def reset(self):
+        with self._lock:
+            self._pending, self._oldest, self._touched = {}, None, {}
+
+
+last_logins = LastLoginBuffer()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        last_logins.flush()
+    except DatabaseError:
+        pass
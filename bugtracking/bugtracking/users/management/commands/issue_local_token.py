@@ -0,0 +1,34 @@
+# stdlib imports
+
+# core django imports
+from django.core.management.base import BaseCommand
+
+# third party imports
+
+# my internal imports
+from bugtracking.users.firebase import LocalTokenIssuer
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints an ID token signed by a local stand-in for Firebase, for testing and benchmarking offline. "
+        "Run the server with FIREBASE_TOKEN_VERIFICATION=local, FIREBASE_USER_RECORDS_FROM_TOKEN=True and "
+        "FIREBASE_PUBLIC_KEYS_URL=file://<certificates file>."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('uid')
+        parser.add_argument('--email')
+        parser.add_argument('--name')
+        parser.add_argument('--lifetime', type=int, default=3600, help='Seconds until the token expires.')
+        parser.add_argument('--key', default='local_token_issuer.pem', help='Signing key; created if missing.')
+        parser.add_argument(
+            '--certificates', default='local_token_issuer.json', help='Where to write the public certificate.',
+        )
+
+    def handle(self, *args, **options):
+        issuer = LocalTokenIssuer.from_key_file(options['key'])
+        issuer.write_certificates(options['certificates'])
+        self.stdout.write(issuer.issue(
+            options['uid'], email=options['email'], name=options['name'], lifetime=options['lifetime']
+        ))
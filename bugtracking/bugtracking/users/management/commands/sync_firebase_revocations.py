@@ -0,0 +1,38 @@
+# stdlib imports
+import time
+
+# core django imports
+from django.core.management.base import BaseCommand
+
+# third party imports
+from firebase_admin import auth as firebase_auth
+
+# my internal imports
+from bugtracking.users import firebase
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies every Firebase user's token revocation time (and disabled flag) into the shared revocation list "
+        "used by local token verification. Run it from cron, or with --interval to keep it running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0, help='Seconds between syncs; 0 syncs once and exits.')
+
+    def sync(self):
+        valid_after = {}
+        for firebase_user in firebase_auth.list_users().iterate_all():
+            revoked_before = firebase.revocation_time(firebase_user)
+            if revoked_before:
+                valid_after[firebase_user.uid] = revoked_before
+        firebase.revocations.publish(valid_after)
+        return len(valid_after)
+
+    def handle(self, *args, **options):
+        while True:
+            count = self.sync()
+            self.stdout.write(self.style.SUCCESS(f'Synced revocation times for {count} Firebase users.'))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
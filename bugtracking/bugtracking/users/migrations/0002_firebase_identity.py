@@ -0,0 +1,49 @@
+# Generated by Django 3.0.11 on 2026-10-16 20:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_firebase_users(apps, schema_editor):
+    """Seeds the mapping from drf_firebase_auth's (unindexed) FirebaseUser table; the newest row wins for a uid."""
+    FirebaseUser = apps.get_model('drf_firebase_auth', 'FirebaseUser')
+    FirebaseIdentity = apps.get_model('users', 'FirebaseIdentity')
+    identities = {}
+    for uid, user_id in FirebaseUser.objects.order_by('pk').values_list('uid', 'user_id'):
+        identities[uid] = user_id
+    FirebaseIdentity.objects.bulk_create(
+        [FirebaseIdentity(uid=uid, user_id=user_id) for uid, user_id in identities.items()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('drf_firebase_auth', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FirebaseIdentity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.CharField(max_length=128, unique=True, verbose_name='Firebase uid')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Firebase identities',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='users_user_email_idx'),
+        ),
+        migrations.AddField(
+            model_name='firebaseidentity',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='firebase_identities', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copy_firebase_users, migrations.RunPython.noop),
+    ]
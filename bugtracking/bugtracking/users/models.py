@@ -1,5 +1,5 @@
 from django.contrib.auth.models import AbstractUser
-from django.db.models import CharField
+from django.db.models import CASCADE, CharField, DateTimeField, ForeignKey, Index, Model
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
@@ -10,6 +10,13 @@ class User(AbstractUser):
     #: First and last name do not cover name patterns around the globe
     name = CharField(_("Name of User"), blank=True, max_length=255)
 
+    class Meta(AbstractUser.Meta):
+        swappable = "AUTH_USER_MODEL"
+        indexes = [
+            # first sign-ins are matched to existing accounts by email
+            Index(fields=["email"], name="users_user_email_idx"),
+        ]
+
     def get_absolute_url(self):
         """Get url for user's detail view.
 
@@ -18,3 +25,17 @@ class User(AbstractUser):
 
         """
         return reverse("users:detail", kwargs={"username": self.username})
+
+
+class FirebaseIdentity(Model):
+    """Which local user a Firebase uid signs in as. Looked up on every uncached authentication, so uid is unique."""
+
+    uid = CharField(_("Firebase uid"), max_length=128, unique=True)
+    user = ForeignKey(User, on_delete=CASCADE, related_name="firebase_identities")
+    created = DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = _("Firebase identities")
+
+    def __str__(self):
+        return f"{self.uid} ({self.user})"
@@ -0,0 +1,32 @@
+# std lib imports
+
+# django imports
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+# third party imports
+
+# my internal imports
+from .identity import forget_user, forget_uid, last_logins
+from .models import FirebaseIdentity
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Drops the user from the uid cache, so the next request sees the change (e.g. a deactivated account)."""
+    forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=FirebaseIdentity)
+def identity_deleted(sender, instance, **kwargs):
+    forget_uid(instance.uid)
+
+
+@receiver(request_finished)
+def flush_last_logins(sender, **kwargs):
+    # after the response has gone out, and outside the request's transaction
+    last_logins.flush_if_due()
@@ -0,0 +1,194 @@
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.test import APIRequestFactory
+
+from bugtracking.users import firebase
+from bugtracking.users.auth import CustomFirebaseAuthentication
+from bugtracking.users.identity import last_logins
+from bugtracking.users.models import FirebaseIdentity, User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def issuer(settings, tmpdir):
+    issuer = firebase.LocalTokenIssuer(project_id='test-project')
+    path = tmpdir.join('certificates.json').strpath
+    issuer.write_certificates(path)
+    settings.FIREBASE_PROJECT_ID = 'test-project'
+    settings.FIREBASE_PUBLIC_KEYS_URL = f'file://{path}'
+    settings.FIREBASE_TOKEN_VERIFICATION = 'local'
+    firebase.public_keys.clear()
+    firebase.revocations.reset()
+    last_logins.reset()
+    yield issuer
+    firebase.public_keys.clear()
+    firebase.revocations.reset()
+    last_logins.reset()
+
+
+def firebase_user(uid, email, tokens_valid_after_timestamp=None, disabled=False):
+    return SimpleNamespace(
+        uid=uid, email=email, email_verified=True, display_name=None, disabled=disabled,
+        tokens_valid_after_timestamp=tokens_valid_after_timestamp,
+        provider_data=[SimpleNamespace(provider_id='password', uid=email, email=email)],
+    )
+
+
+def authenticate(token):
+    request = APIRequestFactory().get('/api/teams/', HTTP_AUTHORIZATION=f'JWT {token}')
+    return CustomFirebaseAuthentication().authenticate(request)
+
+
+class TestVerifyIdToken:
+    def test_valid_token(self, issuer):
+        claims = firebase.verify_id_token(issuer.issue('uid-1', email='one@example.com'))
+        assert claims['uid'] == 'uid-1'
+        assert claims['email'] == 'one@example.com'
+
+    def test_keys_fetched_once(self, issuer):
+        with mock.patch.object(firebase, '_fetch_certificates', wraps=firebase._fetch_certificates) as fetch:
+            for uid in ['uid-1', 'uid-2', 'uid-3']:
+                firebase.verify_id_token(issuer.issue(uid))
+        assert fetch.call_count == 1
+
+    @pytest.mark.parametrize('make_token', [
+        lambda issuer: issuer.issue('uid-1', issued_at=time.time() - 7200),  # expired
+        lambda issuer: issuer.issue('uid-1', aud='another-project'),
+        lambda issuer: issuer.issue('uid-1', iss='https://securetoken.google.com/another-project'),
+        lambda issuer: issuer.issue('uid-1', sub=''),
+        lambda issuer: firebase.LocalTokenIssuer(project_id='test-project', kid=issuer.kid).issue('uid-1'),  # wrong key
+        lambda issuer: firebase.LocalTokenIssuer(project_id='test-project').issue('uid-1'),  # unknown kid
+        lambda issuer: 'not.a.token',
+    ])
+    def test_invalid_tokens(self, issuer, make_token):
+        with pytest.raises(firebase.TokenError):
+            firebase.verify_id_token(make_token(issuer))
+
+    def test_revoked_token(self, issuer):
+        token = issuer.issue('uid-1', issued_at=time.time() - 60)
+        firebase.revocations.publish({'uid-1': time.time() - 30})
+        with pytest.raises(firebase.TokenError) as exc:
+            firebase.verify_id_token(token)
+        assert exc.value.revoked
+        # tokens issued after the revocation are fine
+        assert firebase.verify_id_token(issuer.issue('uid-1'))['uid'] == 'uid-1'
+
+    def test_revocations_kept_when_the_shared_list_goes_missing(self, issuer, settings):
+        settings.FIREBASE_REVOCATIONS_REFRESH_INTERVAL = 0  # re-read on every check
+        token = issuer.issue('uid-1', issued_at=time.time() - 60)
+        firebase.revocations.publish({'uid-1': time.time() - 30})
+        assert firebase.revocations.is_revoked('uid-1', time.time() - 60)
+        cache.delete(firebase.REVOCATIONS_CACHE_KEY)  # evicted, or Redis unreachable
+        with pytest.raises(firebase.TokenError):
+            firebase.verify_id_token(token)
+
+
+class TestLocalAuthentication:
+    def test_user_record_fetched_on_first_sight_only(self, issuer):
+        record = firebase_user('uid-1', 'one@example.com')
+        with mock.patch('firebase_admin.auth.get_user', return_value=record) as get_user:
+            for _ in range(3):
+                user, claims = authenticate(issuer.issue('uid-1', email='one@example.com'))
+        assert get_user.call_count == 1
+        assert user.email == 'one@example.com'
+        assert User.objects.filter(email='one@example.com').count() == 1
+
+    def test_revocation_found_on_first_sight(self, issuer):
+        record = firebase_user('uid-1', 'one@example.com', tokens_valid_after_timestamp=(time.time() - 30) * 1000)
+        with mock.patch('firebase_admin.auth.get_user', return_value=record):
+            with pytest.raises(exceptions.AuthenticationFailed):
+                authenticate(issuer.issue('uid-1', issued_at=time.time() - 60))
+
+    def test_disabled_user_rejected(self, issuer):
+        record = firebase_user('uid-1', 'one@example.com', disabled=True)
+        with mock.patch('firebase_admin.auth.get_user', return_value=record):
+            with pytest.raises(exceptions.AuthenticationFailed):
+                authenticate(issuer.issue('uid-1'))
+
+    def test_user_records_from_token(self, issuer, settings):
+        settings.FIREBASE_USER_RECORDS_FROM_TOKEN = True
+        with mock.patch('firebase_admin.auth.get_user') as get_user:
+            user, claims = authenticate(issuer.issue('uid-1', email='one@example.com'))
+        get_user.assert_not_called()
+        assert user.email == 'one@example.com'
+
+
+class TestLocalUserResolution:
+    @pytest.fixture(autouse=True)
+    def records_from_token(self, settings):
+        settings.FIREBASE_USER_RECORDS_FROM_TOKEN = True
+
+    def test_known_uid_costs_no_queries(self, issuer, django_assert_num_queries):
+        authenticate(issuer.issue('uid-1', email='one@example.com'))
+        with django_assert_num_queries(0):
+            user, claims = authenticate(issuer.issue('uid-1', email='one@example.com'))
+        assert user.email == 'one@example.com'
+
+    def test_existing_account_matched_by_email_once(self, issuer, user):
+        authenticated, claims = authenticate(issuer.issue('uid-1', email=user.email))
+        assert authenticated.pk == user.pk
+        assert FirebaseIdentity.objects.get(uid='uid-1').user == user
+        # from then on the uid decides, whatever the email says
+        User.objects.filter(pk=user.pk).update(email='changed@example.com')
+        firebase.forget_user_record('uid-1')
+        authenticated, claims = authenticate(issuer.issue('uid-1', email='another@example.com'))
+        assert authenticated.pk == user.pk
+
+    def test_deactivated_user_rejected(self, issuer, user):
+        authenticate(issuer.issue('uid-1', email=user.email))
+        user.is_active = False
+        user.save()
+        with pytest.raises(exceptions.AuthenticationFailed):
+            authenticate(issuer.issue('uid-1', email=user.email))
+
+    def test_bulk_deactivation_seen_once_the_cached_user_expires(self, issuer, user, settings):
+        settings.FIREBASE_UID_USER_CACHE_TIMEOUT = 0  # expired straight away
+        authenticate(issuer.issue('uid-1', email=user.email))
+        User.objects.filter(pk=user.pk).update(is_active=False)  # no signals
+        with pytest.raises(exceptions.AuthenticationFailed):
+            authenticate(issuer.issue('uid-1', email=user.email))
+
+    def test_saving_user_refreshes_every_uid(self, issuer, user, django_assert_num_queries):
+        authenticate(issuer.issue('uid-1', email=user.email))
+        FirebaseIdentity.objects.create(uid='uid-2', user=user)
+        authenticate(issuer.issue('uid-2', email=user.email))
+        user.name = 'Renamed'
+        user.save()
+        # the user is re-read once, after the save dropped it, and then shared by both uids
+        for uid, queries in [('uid-1', 1), ('uid-2', 0)]:
+            with django_assert_num_queries(queries):
+                authenticated, claims = authenticate(issuer.issue(uid, email=user.email))
+            assert authenticated.name == 'Renamed'
+
+    def test_last_login_throttled_and_written_behind(self, issuer, user, django_assert_num_queries):
+        authenticate(issuer.issue('uid-1', email=user.email))
+        user.refresh_from_db()
+        assert user.last_login is None  # not written yet
+        with django_assert_num_queries(1):
+            last_logins.flush()
+        user.refresh_from_db()
+        first_login = user.last_login
+        assert first_login is not None
+        authenticate(issuer.issue('uid-1', email=user.email))
+        with django_assert_num_queries(0):
+            last_logins.flush()
+        user.refresh_from_db()
+        assert user.last_login == first_login
+
+
+class TestAuthTiming:
+    def test_auth_phase_in_server_timing(self, issuer, client, settings):
+        settings.FIREBASE_USER_RECORDS_FROM_TOKEN = True
+        token = issuer.issue('uid-1', email='one@example.com')
+        client.get('/api/teams/', HTTP_AUTHORIZATION=f'JWT {token}')
+        User.objects.filter(email='one@example.com').update(is_staff=True)
+        User.objects.get(email='one@example.com').save()  # drops the cached user
+        response = client.get('/api/teams/', HTTP_AUTHORIZATION=f'JWT {token}')
+        assert response.status_code == 200
+        assert 'auth;dur=' in response['Server-Timing']
@@ -0,0 +1,114 @@
+# stdlib imports
+import os
+
+# core django imports
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+# third party imports
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:  # metrics are optional: without the client every recording call below does nothing
+    prometheus_client = None
+
+# my internal imports
+
+
+# METRICS
+# Prometheus metrics for the API, served at /metrics. Request latency and query counts are labelled by view
+# ("TicketViewSet.list"), as recorded by RequestTimingMiddleware, so they line up with REQUEST_BUDGETS.
+# Under gunicorn each worker is its own process with its own counters; with `prometheus_multiproc_dir` set (see
+# config/gunicorn.py) every worker writes its values to memory-mapped files in that directory and /metrics adds
+# them up across workers at scrape time. Recording is a dict lookup and an addition either way.
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 12, 20, 30, 50, 100, 200)
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = prometheus_client.Histogram(
+        'bugtracking_request_duration_seconds', 'Time taken to handle a request, by view.', ['view'],
+        buckets=LATENCY_BUCKETS,
+    )
+    REQUEST_QUERIES = prometheus_client.Histogram(
+        'bugtracking_request_queries', 'Database queries run while handling a request, by view.', ['view'],
+        buckets=QUERY_BUCKETS,
+    )
+    REQUEST_ERRORS = prometheus_client.Counter(
+        'bugtracking_request_errors_total', 'Requests answered with a 4xx or 5xx status, by view and status.',
+        ['view', 'status'],
+    )
+    FIREBASE_VERIFICATIONS = prometheus_client.Counter(
+        'bugtracking_firebase_verifications_total',
+        'Firebase ID tokens verified, by mode (local or remote) and result.', ['mode', 'result'],
+    )
+    FIREBASE_CALLS = prometheus_client.Counter(
+        'bugtracking_firebase_calls_total', 'Requests made to Firebase and Google, by call.', ['call'],
+    )
+    EMAILS = prometheus_client.Counter(
+        'bugtracking_emails_total', 'Emails handed to the mail backend from the outbox, by result.', ['result'],
+    )
+    CACHE_LOOKUPS = prometheus_client.Counter(
+        'bugtracking_cache_lookups_total', 'Lookups in the shared caches, by cache and result (hit or miss).',
+        ['cache', 'result'],
+    )
+
+
+def _recording():
+    return prometheus_client is not None and settings.METRICS_ENABLED
+
+
+def observe_request(view, status, seconds, queries):
+    if not _recording():
+        return
+    view = view or 'unresolved'  # 404s for unknown paths and the like; not labelled by path, to keep the series few
+    REQUEST_LATENCY.labels(view).observe(seconds)
+    REQUEST_QUERIES.labels(view).observe(queries)
+    if status >= 400:
+        REQUEST_ERRORS.labels(view, str(status)).inc()
+
+
+def count_firebase_verification(mode, result):
+    if _recording():
+        FIREBASE_VERIFICATIONS.labels(mode, result).inc()
+
+
+def count_firebase_call(call):
+    if _recording():
+        FIREBASE_CALLS.labels(call).inc()
+
+
+def count_emails(result, count=1):
+    if _recording() and count:
+        EMAILS.labels(result).inc(count)
+
+
+def count_cache_lookup(cache_name, hit):
+    if _recording():
+        CACHE_LOOKUPS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+def multiprocess_dir():
+    return os.environ.get('prometheus_multiproc_dir') or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+
+def metrics_view(request):
+    """
+    The metrics in Prometheus' text format. Requires `Authorization: Bearer <METRICS_TOKEN>`, and doesn't exist at
+    all when metrics are off, prometheus_client isn't installed, or no token is set outside DEBUG (metrics are still
+    recorded then, just not served to anyone who asks).
+    """
+    if not _recording():
+        raise Http404
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        raise Http404
+    if token and not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return HttpResponse('Invalid metrics token.', status=403, content_type='text/plain')
+    if multiprocess_dir():
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return HttpResponse(prometheus_client.generate_latest(registry), content_type=prometheus_client.CONTENT_TYPE_LATEST)
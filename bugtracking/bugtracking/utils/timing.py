@@ -0,0 +1,176 @@
+# stdlib imports
+import contextvars
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+# core django imports
+from django.conf import settings
+from django.db import connections
+
+# third party imports
+from rest_framework import serializers
+
+# my internal imports
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# the timings of the request being handled in this thread (or task), if timing is on
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Where one request's time went: queries run and time spent in the database, plus named phases (auth, serialize).
+    """
+    __slots__ = ('view', 'queries', 'db', 'phases', 'serializing')
+
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.db = 0.0
+        self.phases = {}
+        self.serializing = False
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+def current_timings():
+    return _current.get()
+
+
+@contextmanager
+def timed(phase):
+    """Adds the time spent in the block to `phase` of the current request. Does nothing outside a timed request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+
+
+def _count_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db += time.perf_counter() - start
+
+
+def _timed_data(data_property):
+    """Wraps a serializer's `data` property so the outermost access is counted as serialization time."""
+    def data(self):
+        timings = _current.get()
+        if timings is None or timings.serializing:  # nested serializers are part of their parent's time
+            return data_property.fget(self)
+        timings.serializing = True
+        start = time.perf_counter()
+        try:
+            return data_property.fget(self)
+        finally:
+            timings.serializing = False
+            timings.add('serialize', time.perf_counter() - start)
+    data.timed = True
+    return property(data)
+
+
+def instrument_serializers():
+    """
+    Times DRF serialization. Serializers turn instances into data inside the view, so there's no hook around it;
+    `Serializer.data` and `ListSerializer.data` are wrapped instead (once per process).
+    """
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, 'timed', False):
+            cls.data = _timed_data(cls.data)
+
+
+def view_label(view_func, method):
+    """'TicketViewSet.list', 'TeamViewSet.accept_invitation' and so on for viewsets; the function's name otherwise."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(method.lower(), method.lower())}'
+
+
+def get_budget(label):
+    """The budget for a view label: its own entry in REQUEST_BUDGETS, else its viewset's, else the default."""
+    budgets = settings.REQUEST_BUDGETS
+    default = budgets.get('default', {})
+    if label is None:
+        return default
+    return budgets.get(label) or budgets.get(label.split('.')[0]) or default
+
+
+class RequestTimingMiddleware:
+    """
+    Records each request's query count, database time, authentication time and serialization time.
+    Requests that go over their budget in REQUEST_BUDGETS (queries, or total milliseconds) are logged as warnings,
+    labelled by viewset and action, and staff users get the numbers back in a Server-Timing header.
+    The same numbers feed the per-view latency, query count and error metrics (see `metrics.py`).
+    The cost is a clock read around each query and each top-level serialization, so it can stay on in production;
+    REQUEST_TIMING_ENABLED turns it off entirely.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.REQUEST_TIMING_ENABLED:
+            instrument_serializers()
+
+    def __call__(self, request):
+        if not settings.REQUEST_TIMING_ENABLED:
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_count_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+        self.check_budget(request, timings, total)
+        metrics.observe_request(timings.view, response.status_code, total, timings.queries)
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            response['Server-Timing'] = self.server_timing(timings, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _current.get()
+        if timings is not None:
+            timings.view = view_label(view_func, request.method)
+
+    def check_budget(self, request, timings, total):
+        budget = get_budget(timings.view)
+        over_queries = budget.get('queries') is not None and timings.queries > budget['queries']
+        over_time = budget.get('ms') is not None and total * 1000 > budget['ms']
+        if over_queries or over_time:
+            logger.warning(
+                'Request over budget: %s %s (%s) ran %d queries in %.1fms, %.1fms total',
+                request.method, request.path, timings.view or 'unresolved', timings.queries, timings.db * 1000,
+                total * 1000,
+                extra={
+                    'view': timings.view, 'queries': timings.queries, 'db_ms': timings.db * 1000,
+                    'total_ms': total * 1000,
+                },
+            )
+
+    @staticmethod
+    def server_timing(timings, total):
+        metrics = [f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries"']
+        metrics += [f'{phase};dur={seconds * 1000:.1f}' for phase, seconds in timings.phases.items()]
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
@@ -4,7 +4,9 @@ from rest_framework.routers import DefaultRouter, SimpleRouter
 from rest_framework_nested.routers import NestedSimpleRouter
 
 from bugtracking.users.api.views import UserViewSet
-from bugtracking.tracker.api.viewsets import TeamViewSet, TeamMembershipViewSet, ProjectViewSet, TicketViewSet, TeamInvitationViewSet
+from bugtracking.tracker.api.viewsets import (
+    TeamViewSet, TeamMembershipViewSet, ProjectViewSet, TicketViewSet, TeamInvitationViewSet, CommentViewSet
+)
 
 if settings.DEBUG:
     router = DefaultRouter()
@@ -22,6 +24,8 @@ team_router.register(r'projects', ProjectViewSet, basename='projects')
 team_router.register(r'invitations', TeamInvitationViewSet, basename='invitations')
 project_router = NestedSimpleRouter(team_router, r'projects', lookup='project')
 project_router.register(r'tickets', TicketViewSet, basename='tickets')
+ticket_router = NestedSimpleRouter(project_router, r'tickets', lookup='ticket')
+ticket_router.register(r'comments', CommentViewSet, basename='comments')
 
 
 app_name = "api"
@@ -31,5 +35,6 @@ urlpatterns = [
 
     path(r'', include(router.urls)),
     path(r'', include(team_router.urls)),
-    path(r'', include(project_router.urls))
+    path(r'', include(project_router.urls)),
+    path(r'', include(ticket_router.urls)),
 ]
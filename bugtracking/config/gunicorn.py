@@ -0,0 +1,19 @@
+"""
+gunicorn settings for production (see compose/production/django/start).
+
+Workers share their Prometheus metrics through files in `prometheus_multiproc_dir` (see
+bugtracking/utils/metrics.py). The start script empties the directory before gunicorn starts, and a worker's files
+are marked dead when it exits so its gauges don't linger; its counters and histograms keep counting.
+"""
+import os
+
+bind = "0.0.0.0:5000"
+chdir = "/app"
+
+# must be set before prometheus_client is first imported, i.e. before the workers load the app
+os.environ.setdefault("prometheus_multiproc_dir", "/tmp/prometheus")
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
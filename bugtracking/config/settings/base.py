@@ -82,7 +82,7 @@ THIRD_PARTY_APPS = [
 
 LOCAL_APPS = [
     "bugtracking.users.apps.UsersConfig",
-    "bugtracking.tracker",
+    "bugtracking.tracker.apps.TrackerConfig",
 ]
 # https://docs.djangoproject.com/en/dev/ref/settings/#installed-apps
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -134,6 +134,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "bugtracking.utils.timing.RequestTimingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
@@ -265,6 +266,35 @@ LOGGING = {
 }
 
 
+# Request timing
+# ------------------------------------------------------------------------------
+# records queries, database time, auth time and serialization time per request (see bugtracking/utils/timing.py);
+# staff users get them in a Server-Timing header
+REQUEST_TIMING_ENABLED = env.bool("REQUEST_TIMING_ENABLED", default=True)
+# requests going over these are logged as warnings; keys are "ViewSet.action", "ViewSet" or "default", and each
+# budget may set "queries" and/or "ms" (total request time). The query budgets are checked against every benchmark
+# scenario (bugtracking/tracker/benchmarks), so a view that starts querying per row fails the tests
+REQUEST_BUDGETS = {
+    "default": {
+        "queries": env.int("REQUEST_QUERY_BUDGET", default=30),
+        "ms": env.int("REQUEST_TIME_BUDGET_MS", default=1000),
+    },
+    "TicketViewSet.list": {"queries": 8},
+    "ProjectViewSet.list": {"queries": 9},
+    "TeamViewSet.list": {"queries": 9},
+    "TeamInvitationViewSet.list": {"queries": 7},
+    "CommentViewSet.list": {"queries": 6},
+}
+
+
+# Metrics
+# ------------------------------------------------------------------------------
+# Prometheus metrics at /metrics (see bugtracking/utils/metrics.py); needs prometheus_client installed
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=True)
+# scrapers must send "Authorization: Bearer <token>"; without a token /metrics is only served when DEBUG is on
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+
 # django-allauth
 # ------------------------------------------------------------------------------
 ACCOUNT_ALLOW_REGISTRATION = env.bool("DJANGO_ACCOUNT_ALLOW_REGISTRATION", True)
@@ -339,3 +369,72 @@ DRF_FIREBASE_AUTH = {
     # require that firebase user.email_verified is True
     'FIREBASE_AUTH_EMAIL_VERIFICATION': False
 }
+
+# Tracker
+# ------------------------------------------------------------------------------
+# page size for the cursor-paginated tickets endpoint; clients may request up to TICKETS_MAX_PAGE_SIZE with ?page_size=
+TICKETS_PAGE_SIZE = env.int("TICKETS_PAGE_SIZE", default=50)
+TICKETS_MAX_PAGE_SIZE = env.int("TICKETS_MAX_PAGE_SIZE", default=200)
+# page size for a ticket's comments endpoint
+COMMENTS_PAGE_SIZE = env.int("COMMENTS_PAGE_SIZE", default=50)
+# how many of the newest comments are embedded in each ticket's representation
+TICKET_RECENT_COMMENTS = env.int("TICKET_RECENT_COMMENTS", default=3)
+# how long (seconds) a user's role map for a team is kept in the shared cache; entries are also invalidated
+# whenever the team's memberships or projects change, so this only bounds how long idle entries hang around
+TRACKER_ACCESS_CACHE_TIMEOUT = env.int("TRACKER_ACCESS_CACHE_TIMEOUT", default=600)
+# rows per INSERT for the bulk endpoints
+BULK_INSERT_BATCH_SIZE = env.int("BULK_INSERT_BATCH_SIZE", default=500)
+# most addresses accepted by one bulk team invitation request
+TEAM_BULK_INVITE_MAX = env.int("TEAM_BULK_INVITE_MAX", default=1000)
+# most tickets changed by one bulk ticket update request
+TICKETS_BULK_UPDATE_MAX = env.int("TICKETS_BULK_UPDATE_MAX", default=500)
+# how long (seconds) a rendered list response is kept in the shared cache; entries are keyed by their team's change
+# version, so this only bounds how long stale entries hang around
+TRACKER_LIST_CACHE_TIMEOUT = env.int("TRACKER_LIST_CACHE_TIMEOUT", default=300)
+# Postgres text search configuration used to build and query the tickets' search vectors
+TICKET_SEARCH_CONFIG = env("TICKET_SEARCH_CONFIG", default="english")
+# page size for a team's ticket search results
+TICKET_SEARCH_PAGE_SIZE = env.int("TICKET_SEARCH_PAGE_SIZE", default=25)
+
+# Firebase token verification
+# ------------------------------------------------------------------------------
+# "remote" asks Firebase to verify every token (drf_firebase_auth's default); "local" checks signatures against
+# cached public keys and a locally synced revocation list (see bugtracking/users/firebase.py)
+FIREBASE_TOKEN_VERIFICATION = env("FIREBASE_TOKEN_VERIFICATION", default="remote")
+# defaults to the project of FIREBASE_SERVICE_ACCOUNT_KEY
+FIREBASE_PROJECT_ID = env("FIREBASE_PROJECT_ID", default="")
+# Google's signing certificates for ID tokens; a file:// url (e.g. from LocalTokenIssuer) works too
+FIREBASE_PUBLIC_KEYS_URL = env(
+    "FIREBASE_PUBLIC_KEYS_URL",
+    default="https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com",
+)
+# keys are kept for as long as Google's Cache-Control allows, but never re-fetched more often than this (seconds)
+FIREBASE_PUBLIC_KEYS_MIN_CACHE = env.int("FIREBASE_PUBLIC_KEYS_MIN_CACHE", default=60)
+# how often each process re-reads the revocation list written by `manage.py sync_firebase_revocations` (seconds)
+FIREBASE_REVOCATIONS_REFRESH_INTERVAL = env.int("FIREBASE_REVOCATIONS_REFRESH_INTERVAL", default=60)
+# how long a fetched Firebase user record is reused before being fetched again (seconds)
+FIREBASE_USER_RECORD_CACHE_TIMEOUT = env.int("FIREBASE_USER_RECORD_CACHE_TIMEOUT", default=3600)
+# build user records from the token's claims instead of fetching them; only for running offline against LocalTokenIssuer
+FIREBASE_USER_RECORDS_FROM_TOKEN = env.bool("FIREBASE_USER_RECORDS_FROM_TOKEN", default=False)
+# how long an authenticated uid's local user id is kept in the shared cache (seconds)...
+FIREBASE_UID_CACHE_TIMEOUT = env.int("FIREBASE_UID_CACHE_TIMEOUT", default=3600)
+# ...and the user itself, i.e. how long changes that skip the user's signals (bulk deactivations) can go unseen
+FIREBASE_UID_USER_CACHE_TIMEOUT = env.int("FIREBASE_UID_USER_CACHE_TIMEOUT", default=60)
+# last_login is updated at most once per interval per user (seconds)...
+LAST_LOGIN_UPDATE_INTERVAL = env.int("LAST_LOGIN_UPDATE_INTERVAL", default=300)
+# ...and written in bulk once the oldest pending update has waited this long (seconds) or this many have built up
+LAST_LOGIN_FLUSH_INTERVAL = env.int("LAST_LOGIN_FLUSH_INTERVAL", default=10)
+LAST_LOGIN_FLUSH_SIZE = env.int("LAST_LOGIN_FLUSH_SIZE", default=100)
+
+# Email outbox
+# ------------------------------------------------------------------------------
+# backend `manage.py send_queued_email` sends through; defaults to EMAIL_BACKEND. For running the worker locally
+# without Mailgun, "django.core.mail.backends.filebased.EmailBackend" (with EMAIL_FILE_PATH) or the console backend
+EMAIL_OUTBOX_BACKEND = env("EMAIL_OUTBOX_BACKEND", default=None)
+# a failed email is retried after EMAIL_OUTBOX_RETRY_BASE seconds, doubling each time up to EMAIL_OUTBOX_RETRY_MAX,
+# and marked dead after EMAIL_OUTBOX_MAX_ATTEMPTS tries
+EMAIL_OUTBOX_MAX_ATTEMPTS = env.int("EMAIL_OUTBOX_MAX_ATTEMPTS", default=8)
+EMAIL_OUTBOX_RETRY_BASE = env.int("EMAIL_OUTBOX_RETRY_BASE", default=30)
+EMAIL_OUTBOX_RETRY_MAX = env.int("EMAIL_OUTBOX_RETRY_MAX", default=3600)
+# how long a worker has to send a batch it claimed before other workers may pick it up again (seconds)
+EMAIL_OUTBOX_LEASE = env.int("EMAIL_OUTBOX_LEASE", default=300)
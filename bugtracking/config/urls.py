@@ -7,6 +7,7 @@ from django.views.generic import TemplateView
 from rest_framework.authtoken.views import obtain_auth_token
 
 from rest_auth import views as rest_auth_views
+from bugtracking.utils.metrics import metrics_view
 from rest_framework_social_oauth2.views import TokenView as token_login_view
 
 # Frontend
@@ -28,6 +29,8 @@ urlpatterns = [
 urlpatterns += [
     # API base url
     path("api/", include("config.api_router")),
+    # Prometheus metrics
+    path("metrics", metrics_view, name="metrics"),
     # DRF auth token
     path("auth-token/", obtain_auth_token),
     # OAuth https://github.com/RealmTeam/django-rest-framework-social-oauth2
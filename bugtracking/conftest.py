@@ -1,10 +1,18 @@
 import pytest
+from django.core.cache import cache
 from model_bakery import baker
 
 @pytest.fixture(autouse=True)
 def enable_db_access_for_all_tests(db):
     pass
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # the tracker's role and slug caches outlive each test's rolled-back database
+    cache.clear()
+    yield
+    cache.clear()
+
 @pytest.fixture
 def admin():
     return baker.make_recipe('bugtracking.tracker.admin')